@@ -1,29 +1,138 @@
+import os
+import time
 import asyncio
-import requests
 import threading
 from aioesphomeapi import APIClient
+import ha_http
+import ha_state_hub
+import metrics
+import shared_loop
+from ha_websocket import attribute_value
+
+# How long a service call waits for its entities' state_changed before
+# falling back to a plain refetch.
+SERVICE_CONFIRM_TIMEOUT = float(os.environ.get('HA_SERVICE_CONFIRM_TIMEOUT', '3'))
+CONFIRM_POLL_START = 0.1  # first refetch delay while polling; doubles up to 1s
+
+# Unchanged states are not resent to the emulator; with a non-zero interval
+# an unchanged value is still resent once it is this many seconds old.
+STATE_RESYNC_INTERVAL = float(os.environ.get('HA_STATE_RESYNC_INTERVAL', '0'))
+
+_delivery_lock = threading.Lock()
+_delivery_stats = {'sent': 0, 'suppressed': 0}
+
+# Tap (service call received from the emulator) to new state forwarded.
+tap_latency = metrics.Histogram((0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+_confirm_stats = {'push': 0, 'poll': 0, 'timeout': 0}
+
+def confirm_stats():
+    """Service-call confirmations by how the new state arrived, plus the latency histogram."""
+    with _delivery_lock:
+        st = dict(_confirm_stats)
+    return {**st, 'tap_to_state_seconds': tap_latency.snapshot()}
+
+def _count_delivery(key):
+    with _delivery_lock:
+        _delivery_stats[key] += 1
+
+def delivery_stats():
+    """Process-wide counts of states sent to emulators vs. suppressed as unchanged."""
+    with _delivery_lock:
+        st = dict(_delivery_stats)
+    total = st['sent'] + st['suppressed']
+    st['suppression_ratio'] = st['suppressed'] / total if total else 0.0
+    return st
+
+class SessionState:
+    """Session liveness, set by the server and read by the proxy on the shared
+    loop.  Plain attributes, so the loop never waits on the server's locks."""
+
+    def __init__(self):
+        self.alive = True
+        # True while the emulator is hibernated (process group stopped): no
+        # polling, and no connection attempts counted against max_retries.
+        self.hibernated = False
 
 class HAProxy:
-    def __init__(self, session_id, port, ha_url, ha_token, supervisor_token, check_session_callback):
+    def __init__(self, session_id, port, ha_url, ha_token, supervisor_token, state=None):
         self.session_id = session_id
         self.port = port
         self.ha_url = ha_url
         self.ha_token = ha_token
         self.supervisor_token = supervisor_token
-        self.check_session_callback = check_session_callback
+        self.state = state or SessionState()
         self.default_ha_url = "http://supervisor/core"
         
         self.log_prefix = f"API PROXY [{self.session_id}]:"
         self.subscribed_entities = set() # (entity_id, attribute) pairs
+        self.hub = None  # shared ha_state_hub.HAStateHub for this HA instance
+        self._deliver = None
+        self._last_sent = {}  # (entity_id, attribute) -> (value, sent_at); event loop thread only
+        self._service_tasks = set()
+
+    def _ha_base(self):
+        """(base_url, token) of the Home Assistant instance to talk to."""
+        if self.ha_url and self.ha_url.strip():
+            return self.ha_url.rstrip('/'), self.ha_token
+        return self.default_ha_url, self.supervisor_token
 
     def log(self, message):
         print(f"{self.log_prefix} {message}", flush=True)
 
+    def is_paused(self):
+        return self.state.hibernated
+
+    def deliver_state(self, entity_id, state, attributes):
+        """Hub callback (any thread): forward a state change to the emulator."""
+        if self._deliver and not self.state.hibernated:
+            self._deliver(entity_id, state, attributes)
+
+    async def _confirm_states(self, watches, tapped_at):
+        """Wait until every watched entity reports a new state.
+
+        Pushed state_changed events resolve the watches directly; without
+        the websocket feed the entities are refetched with backoff until
+        they change.  Whatever is still unconfirmed at the timeout is
+        refetched once more.
+        """
+        pending = set(watches.values())
+        deadline = tapped_at + SERVICE_CONFIRM_TIMEOUT
+        delay = CONFIRM_POLL_START
+        pushed = bool(self.hub.feed and self.hub.feed.connected)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not pushed:
+                await asyncio.gather(*(self.hub.refresh(eid) for eid, f in watches.items() if f in pending))
+            _, pending = await asyncio.wait(pending, timeout=remaining if pushed else min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+
+        for eid, future in watches.items():
+            if future.done():
+                tap_latency.observe(future.result() - tapped_at)
+                outcome = 'push' if pushed else 'poll'
+            else:
+                outcome = 'timeout'
+                self.log(f"No state change for {eid} within {SERVICE_CONFIRM_TIMEOUT}s, refetching")
+                await self.hub.refresh(eid)
+            with _delivery_lock:
+                _confirm_stats[outcome] += 1
+
     async def run(self):
         """
         Connects to the emulator's API port and listens for Home Assistant service calls.
         When a call is received, it's forwarded to the actual Home Assistant instance.
+        Entity states come from the process-wide state hub for that instance.
         """
+        self.hub = ha_state_hub.acquire(*self._ha_base())
+        try:
+            await self._run()
+        finally:
+            self.hub.unsubscribe_all(self)
+            ha_state_hub.release(self.hub)
+
+    async def _run(self):
         self.log(f"Starting proxy (target port {self.port})...")
         
         # Wait for the emulator to start and listen on the port
@@ -40,76 +149,53 @@ class HAProxy:
             # Should not happen as we are in async run
             main_loop = asyncio.new_event_loop()
 
-        def fetch_and_send_ha_state_wrapped(entity_id, attribute):
-            """Fetch state from HA and send to emulator. Runs in executor thread."""
+        def send_state(entity_id, attribute, state):
+            """Send one state to the emulator if it changed. Runs on the event loop thread."""
+            key = (entity_id, attribute)
+            now = time.monotonic()
+            last = self._last_sent.get(key)
+            if last is not None and last[0] == state and not (
+                    STATE_RESYNC_INTERVAL and now - last[1] >= STATE_RESYNC_INTERVAL):
+                _count_delivery('suppressed')
+                return
+            self._last_sent[key] = (state, now)
+            _count_delivery('sent')
             try:
-                # Determine URL/Header
-                if self.ha_url and self.ha_url.strip():
-                    url = f"{self.ha_url.rstrip('/')}/api/states/{entity_id}"
-                    headers = {"Content-Type": "application/json"}
-                    if self.ha_token:
-                        headers["Authorization"] = f"Bearer {self.ha_token}"
-                else:
-                    if not self.supervisor_token:
-                        return
-                    url = f"{self.default_ha_url}/api/states/{entity_id}"
-                    headers = {
-                        "Authorization": f"Bearer {self.supervisor_token}",
-                        "Content-Type": "application/json",
-                    }
+                client.send_home_assistant_state(entity_id, attribute, state)
+                self.log(f"State sent successfully: {entity_id} = {state}")
+            except Exception as ex:
+                self.log(f"Error sending state update via client: {ex}")
 
-                # self.log(f"Fetching state for {entity_id}")
-                try:
-                    res = requests.get(url, headers=headers, timeout=5)
-                except requests.exceptions.RequestException:
-                    # Silent fail on connection error to avoid log spam? or log it?
-                    return
+        def send_states(entity_id, state, attributes):
+            """Send a state to each of its (entity, attribute) subscriptions."""
+            for eid, attr in list(self.subscribed_entities):
+                if eid == entity_id:
+                    send_state(eid, attr, attribute_value(state, attributes, attr))
 
-                if res.status_code == 200:
-                    data = res.json()
-                    state = data.get("state", "")
-                    
-                    # If specific attribute requested
-                    if attribute:
-                        val = data.get("attributes", {}).get(attribute, "")
-                        state = str(val) if val is not None else ""
-                    
-                    self.log(f"Sending state {entity_id} = {state} (attr: {attribute})")
-                    
-                    # Capture variables for the closure
-                    eid, attr, st = entity_id, attribute, state
-                    
-                    # Schedule sending on main loop - send_home_assistant_state is sync but needs to run on the event loop thread
-                    def send_state():
-                        try:
-                            client.send_home_assistant_state(eid, attr, st)
-                            self.log(f"State sent successfully: {eid} = {st}")
-                        except Exception as ex:
-                            self.log(f"Error sending state update via client: {ex}")
-                    
-                    # Schedule the sync call on the main event loop
-                    main_loop.call_soon_threadsafe(send_state)
-                    
-                else:
-                    self.log(f"Failed to fetch state {entity_id}: {res.status_code}")
-                    
-            except Exception as e:
-                self.log(f"Error fetching state {entity_id}: {e}")
+        # The hub calls deliver_state() from the subscribing thread as well as the loop.
+        self._deliver = lambda *args: main_loop.call_soon_threadsafe(send_states, *args)
+
+        def resend_cached_states():
+            """Send every subscribed state the hub already knows."""
+            for eid in {eid for eid, _ in self.subscribed_entities}:
+                cached = self.hub.cached(eid)
+                if cached is not None:
+                    send_states(eid, *cached)
 
         def handle_state_sub(entity_id, attribute):
             """Callback when device subscribes to a state."""
             self.log(f"Subscription request for {entity_id} (attr: {attribute})")
-            # Track this entity for periodic updates
             self.subscribed_entities.add((entity_id, attribute))
-            # Run fetch in background thread so we don't block the async loop
-            if main_loop:
-                 main_loop.run_in_executor(None, lambda: fetch_and_send_ha_state_wrapped(entity_id, attribute))
+            # The device asked explicitly, so the next value is sent even if unchanged.
+            self._last_sent.pop((entity_id, attribute), None)
+            # Cached states are delivered at once; otherwise the hub fetches it.
+            self.hub.subscribe(self, entity_id)
 
         def on_device_state(state):
             # Just log device states
             pass
 
-        def handle_service_call(call):
+        async def handle_service_call(call):
             """
             Handle the service call. 
             Note: call is a HomeassistantServiceCall object.
@@ -146,58 +232,80 @@ class HAProxy:
                     "Content-Type": "application/json",
                 }
 
+            # Merge data, data_template and variables
+            payload = {**call.data, **call.data_template, **call.variables}
+            entity_ids = payload.get('entity_id') or []
+            if isinstance(entity_ids, str):
+                entity_ids = [eid.strip() for eid in entity_ids.split(',')]
+            # Watch the targeted entities this emulator shows before the call
+            # goes out, so even an immediate state_changed is not missed.
+            shown = {eid for eid, _ in self.subscribed_entities}
+            watches = self.hub.watch([eid for eid in entity_ids if eid in shown])
+            tapped_at = time.monotonic()
             try:
-                # Merge data, data_template and variables
-                payload = {**call.data, **call.data_template, **call.variables}
-                
                 self.log(f"Forwarding to {url} with payload: {payload}")
                 
-                res = requests.post(url, headers=headers, json=payload, timeout=10)
+                res = await ha_http.async_post(url, headers=headers, json=payload, timeout=10)
                 
                 self.log(f"HA Response [{res.status_code}]: {res.text}")
                 
                 if res.status_code not in [200, 201]:
                      self.log("WARNING - HA rejected the call!")
-                else:
-                    # After successful service call, fetch and send updated state
-                    # Extract entity_id from the payload
-                    entity_id = payload.get('entity_id')
-                    if entity_id:
-                        # Handle both single entity_id and list of entity_ids
-                        if isinstance(entity_id, list):
-                            entity_ids = entity_id
-                        else:
-                            entity_ids = [entity_id]
-                        
-                        # Small delay to let HA process the state change
-                        import time
-                        time.sleep(0.3)
-                        
-                        # Fetch and send updated state for each entity
-                        for eid in entity_ids:
-                            self.log(f"Fetching updated state for {eid} after service call")
-                            fetch_and_send_ha_state_wrapped(eid, "")
+                elif watches:
+                    # The new states reach the emulator through the hub's
+                    # fan-out as soon as they arrive; wait for confirmation.
+                    await self._confirm_states(watches, tapped_at)
                      
             except Exception as e:
                 self.log(f"Error forwarding service call: {str(e)}")
+            finally:
+                self.hub.unwatch(watches)
 
-        # Wrap the sync handler to be called from the event loop using an executor
+        # Run each forwarded call as its own task so a slow HA does not block the API client
         def on_service_call_callback(call):
-            if main_loop:
-                 main_loop.run_in_executor(None, handle_service_call, call)
+            task = main_loop.create_task(handle_service_call(call))
+            self._service_tasks.add(task)
+            task.add_done_callback(self._service_tasks.discard)
+
+        try:
+            await self._connect_loop(client, resend_cached_states, handle_state_sub,
+                                     on_device_state, on_service_call_callback)
+        finally:
+            # Reached on return and on cancellation (stop_proxy): leave no
+            # tasks or connections behind on the shared loop.
+            self._deliver = None
+            for task in list(self._service_tasks):
+                task.cancel()
+            try:
+                await client.disconnect()
+            except Exception:
+                pass
+
+    async def _connect_loop(self, client, resend_cached_states, handle_state_sub,
+                            on_device_state, on_service_call_callback):
 
         max_retries = 120 # Try for 10 minutes total (5s * 120)
         retry_count = 0
         
         while retry_count < max_retries:
             try:
-                if not self.check_session_callback():
+                if not self.state.alive:
                     self.log("Session removed, stopping proxy")
                     return
+                if self.state.hibernated:
+                    await asyncio.sleep(5)
+                    continue
 
                 self.log(f"Attempting connection (Attempt {retry_count + 1}/{max_retries})...")
-                await client.connect(login=True)
+                disconnected = asyncio.Event()
+
+                async def on_stop(expected_disconnect):
+                    disconnected.set()
+
+                await client.connect(on_stop=on_stop, login=True)
                 self.log("Connected to emulator API")
+                # A (re)connected emulator has none of the states sent before.
+                self._last_sent.clear()
                 
                 # Wait for tiles to initialize (they are delayed 2 seconds after startup)
                 # This ensures we get all entity subscriptions, not just the static ones
@@ -216,30 +324,20 @@ class HAProxy:
                 # Reset retry count once connected
                 retry_count = 0
                 
-                # Start periodic update task
-                async def periodic_updates():
-                    self.log("Starting 5s periodic state update loop")
-                    while True:
-                        if not self.check_session_callback():
-                            break
-                        
-                        entities = list(self.subscribed_entities)
-                        if entities:
-                            # self.log(f"Periodic update: fetching {len(entities)} entities")
-                            for eid, attr in entities:
-                                # Fetch in executor thread
-                                main_loop.run_in_executor(None, fetch_and_send_ha_state_wrapped, eid, attr)
-                        
-                        await asyncio.sleep(5)
-                
-                # Run the periodic update task in the background
-                update_task = asyncio.create_task(periodic_updates())
-                
-                # Keep the proxy running as long as the session checks out
+                # States are polled/pushed by the shared hub; keep the proxy
+                # running as long as the session checks out.
+                was_paused = False
                 while True:
-                    if not self.check_session_callback():
-                        update_task.cancel()
+                    if not self.state.alive:
                         return
+                    if disconnected.is_set():
+                        # e.g. keepalive lost while the emulator was hibernated
+                        raise ConnectionError("emulator API connection closed")
+                    paused = self.state.hibernated
+                    if was_paused and not paused:
+                        # Catch up on the changes dropped while hibernated.
+                        resend_cached_states()
+                    was_paused = paused
                     await asyncio.sleep(5)
                     
             except Exception as e:
@@ -253,14 +351,34 @@ class HAProxy:
                 
         self.log(f"Failed to connect after {max_retries} attempts. Giving up.")
 
-def run_proxy_thread(session_id, port, ha_url, ha_token, supervisor_token, check_session_callback):
-    """Entry point for the proxy thread."""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    proxy = HAProxy(session_id, port, ha_url, ha_token, supervisor_token, check_session_callback)
-    try:
-        loop.run_until_complete(proxy.run())
-    except Exception as e:
-        print(f"API PROXY [{session_id}]: Thread error: {str(e)}", flush=True)
-    finally:
-        loop.close()
+_proxies_lock = threading.Lock()
+_proxies = {}  # session_id -> concurrent.futures.Future of HAProxy.run() on the shared loop
+
+def start_proxy(session_id, port, ha_url, ha_token, supervisor_token, state):
+    """Run a session's proxy as a task on the shared loop (replacing any previous one)."""
+    stop_proxy(session_id)
+    proxy = HAProxy(session_id, port, ha_url, ha_token, supervisor_token, state)
+    future = shared_loop.submit(proxy.run())
+
+    def done(f):
+        with _proxies_lock:
+            if _proxies.get(session_id) is f:
+                del _proxies[session_id]
+        if not f.cancelled() and f.exception():
+            print(f"API PROXY [{session_id}]: Task error: {f.exception()}", flush=True)
+
+    with _proxies_lock:
+        _proxies[session_id] = future
+    future.add_done_callback(done)
+    return future
+
+def stop_proxy(session_id):
+    """Cancel a session's proxy task; it disconnects from the emulator on the way out."""
+    with _proxies_lock:
+        future = _proxies.pop(session_id, None)
+    if future:
+        future.cancel()
+
+def proxy_count():
+    with _proxies_lock:
+        return len(_proxies)
@@ -0,0 +1,204 @@
+"""Queue and concurrency limit for firmware builds (compile and OTA install).
+
+Each `esphome compile` / `esphome run` is a multi-minute, CPU- and
+memory-heavy build.  Without a limit, several users compiling at once push a
+Raspberry Pi into swap or get Gunicorn OOM-killed.  Installs used to get by
+with at most one process, but only because a new install killed everyone
+else's.  Every build now goes through one BuildScheduler:
+
+  - At most max_concurrent builds run at once.  BUILD_CONCURRENCY overrides
+    it; otherwise it is derived from the machine: one build per two cores,
+    no more than MemTotal / BUILD_JOB_MEMORY_MB allows, and 1 on arm64 (the
+    same cap maybe_warm_cache() uses there).
+  - Waiting jobs start in priority order ('high', 'normal', 'low'), first
+    come first served within a priority.  Two jobs for the same config file
+    share ESPHome's build directory, so they never run at the same time.
+  - position() reports a queued job's place in line and an ETA.  The ETA
+    replays the queue against the remaining time of the running builds,
+    using the running average duration of recent builds of each kind.
+  - cancel() drops a queued job, or terminates that one job's process if it
+    is already running.  Other jobs are never touched.
+
+A job's start callback launches the process and returns the Popen.  Whoever
+reads the process output calls finished() when it exits, which frees the
+slot for the next job.
+"""
+import os
+import time
+import uuid
+import platform
+import threading
+import subprocess
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+JOB_MEMORY_MB = int(os.environ.get('BUILD_JOB_MEMORY_MB', '1024'))
+# Starting guesses for the ETA until real builds have been timed.
+DEFAULT_DURATION = {'compile': 180.0, 'install': 240.0}  # seconds
+DURATION_SMOOTHING = 0.3  # weight of the newest build in the running average
+
+
+def _mem_total_mb():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def default_concurrency():
+    """Concurrent build limit for this machine (BUILD_CONCURRENCY wins)."""
+    override = os.environ.get('BUILD_CONCURRENCY')
+    if override:
+        return max(1, int(override))
+    if platform.machine().lower() in ('aarch64', 'arm64'):
+        return 1
+    limit = max(1, (os.cpu_count() or 2) // 2)
+    mem = _mem_total_mb()
+    if mem:
+        limit = min(limit, max(1, mem // JOB_MEMORY_MB))
+    return limit
+
+
+class BuildJob:
+    def __init__(self, kind, session_id, label, start, priority='normal'):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind  # 'compile' | 'install'
+        self.session_id = session_id
+        self.label = label
+        self.priority = priority if priority in PRIORITIES else 'normal'
+        self._start = start  # callable(job) -> subprocess.Popen; sets job.process first
+        self.process = None
+        self.state = 'queued'  # queued | running | done | cancelled | failed
+        self.error = None  # why the start callback failed
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'session_id': self.session_id,
+            'label': self.label,
+            'priority': self.priority,
+            'state': self.state,
+            'waited': round((self.started_at or time.time()) - self.submitted_at, 1),
+            'running_for': round(time.time() - self.started_at, 1) if self.state == 'running' else None,
+        }
+
+
+class BuildScheduler:
+    def __init__(self, max_concurrent=None):
+        self.max_concurrent = max_concurrent or default_concurrency()
+        self._lock = threading.Lock()
+        self._queue = []  # waiting BuildJobs, in start order
+        self._running = []
+        self._seq = 0
+        self._avg = dict(DEFAULT_DURATION)
+        self._stats = {'submitted': 0, 'started': 0, 'finished': 0, 'cancelled': 0, 'start_errors': 0}
+
+    def submit(self, job):
+        """Queue *job*; it starts right away if a slot is free."""
+        with self._lock:
+            self._seq += 1
+            job._order = (PRIORITIES[job.priority], self._seq)
+            self._queue.append(job)
+            self._queue.sort(key=lambda j: j._order)
+            self._stats['submitted'] += 1
+        self._dispatch()
+        return job
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if len(self._running) >= self.max_concurrent:
+                    return
+                busy = {j.label for j in self._running}
+                job = next((j for j in self._queue if j.label not in busy), None)
+                if job is None:
+                    return
+                self._queue.remove(job)
+                job.state = 'running'
+                job.started_at = time.time()
+                self._running.append(job)
+                self._stats['started'] += 1
+            try:
+                job.process = job._start(job)
+            except Exception as e:
+                print(f"[builds] Failed to start {job.kind} of {job.label}: {e}", flush=True)
+                with self._lock:
+                    job.state = 'failed'
+                    job.error = str(e)
+                    self._stats['start_errors'] += 1
+                self.finished(job, record=False)
+
+    def finished(self, job, record=True):
+        """Mark *job* as exited and start the next one in line."""
+        with self._lock:
+            if job not in self._running:
+                return
+            self._running.remove(job)
+            job.finished_at = time.time()
+            if job.state == 'running':
+                job.state = 'done'
+                if record:
+                    took = job.finished_at - job.started_at
+                    avg = self._avg.get(job.kind, took)
+                    self._avg[job.kind] = avg + DURATION_SMOOTHING * (took - avg)
+            self._stats['finished'] += 1
+        self._dispatch()
+
+    def cancel(self, job):
+        """Cancel one job: drop it from the queue, or stop its process. True if it was live."""
+        with self._lock:
+            if job in self._queue:
+                self._queue.remove(job)
+                job.state = 'cancelled'
+                self._stats['cancelled'] += 1
+                return True
+            if job not in self._running:
+                return False
+            job.state = 'cancelled'
+            self._stats['cancelled'] += 1
+            process = job.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        # The output reader calls finished() once the process is gone.
+        return True
+
+    def position(self, job):
+        """(1-based queue position, seconds until it should start) for a queued job, else None."""
+        with self._lock:
+            if job not in self._queue:
+                return None
+            now = time.time()
+            # When each slot frees up, replaying the queue in start order.
+            slots = sorted(max(0.0, self._avg.get(j.kind, 0) - (now - j.started_at)) for j in self._running)
+            slots += [0.0] * (self.max_concurrent - len(slots))
+            for i, queued in enumerate(self._queue):
+                slots.sort()
+                start = slots[0]
+                if queued is job:
+                    return i + 1, round(start)
+                slots[0] = start + self._avg.get(queued.kind, 0)
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'running': [j.to_dict() for j in self._running],
+                'queued': [j.to_dict() for j in self._queue],
+                'avg_duration': {k: round(v, 1) for k, v in self._avg.items()},
+                **self._stats,
+            }
+
+
+scheduler = BuildScheduler()
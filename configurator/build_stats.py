@@ -0,0 +1,136 @@
+"""Where build time goes: per-phase timings and ccache effectiveness.
+
+Every install/compile job gets a BuildRecord.  begin() snapshots the ccache
+counters (``ccache --print-stats``, run with the job's environment so it
+reads the same CCACHE_DIR) before the build starts.  finish() snapshots them
+again after it exits and takes:
+
+  - the phase timings from the job's JobLog (job_log.phase_times: config,
+    codegen, configure, compile, link, image, upload, ... in seconds)
+  - the ccache hits and misses in between, i.e. the hit rate of this build.
+    ccache only keeps global counters, so builds running at the same time
+    count each other's lookups too; with one build at a time (the
+    build_scheduler default on arm64) the numbers are exact.
+
+Builds where tile_ui's precompiled header was in use (the job log has its
+'pch' marker) are totalled separately as '<kind>+pch', so the compile phase of
+edits with and without it can be compared directly.
+
+The last HISTORY builds and running totals per kind are kept in memory and
+served by /api/esphome/build_stats, together with the CCACHE_* settings the
+builds ran with, so a change to them can be checked against the hit rate.
+"""
+import os
+import time
+import shutil
+import threading
+import subprocess
+import collections
+
+HISTORY = int(os.environ.get('BUILD_STATS_HISTORY', '50'))
+CCACHE_TIMEOUT = 10  # seconds for one ccache --print-stats
+# ccache --print-stats counters that count as a hit / a miss
+HIT_COUNTERS = ('direct_cache_hit', 'preprocessed_cache_hit')
+MISS_COUNTERS = ('cache_miss',)
+
+_lock = threading.Lock()
+_recent = collections.deque(maxlen=HISTORY)
+_totals = {}  # kind or kind+pch -> {'builds', 'failed', 'seconds', 'phases': {phase: seconds}, 'ccache_hits', 'ccache_misses'}
+_settings = {}  # CCACHE_* of the most recent build
+
+
+def ccache_stats(env):
+    """ccache's counters as {name: int}, or None if ccache is unavailable."""
+    ccache = shutil.which('ccache', path=env.get('PATH'))
+    if not ccache or not env.get('CCACHE_DIR'):
+        return None
+    try:
+        out = subprocess.run([ccache, '--print-stats'], env=env, capture_output=True,
+                             text=True, timeout=CCACHE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if out.returncode != 0:
+        return None
+    counters = {}
+    for line in out.stdout.splitlines():
+        name, _, value = line.partition('\t')
+        if value.strip().isdigit():
+            counters[name.strip()] = int(value)
+    return counters
+
+
+def _hits_misses(before, after):
+    if before is None or after is None:
+        return None, None
+    delta = {k: after.get(k, 0) - before.get(k, 0) for k in HIT_COUNTERS + MISS_COUNTERS}
+    return sum(delta[k] for k in HIT_COUNTERS), sum(delta[k] for k in MISS_COUNTERS)
+
+
+class BuildRecord:
+    def __init__(self, kind, label, env):
+        self.kind = kind  # 'compile' | 'install'
+        self.label = label
+        self.env = env
+        self.started_at = time.time()
+        self.ccache_before = ccache_stats(env)
+
+
+def begin(kind, label, env):
+    """Start timing a build; call right before launching its process."""
+    return BuildRecord(kind, label, env)
+
+
+def finish(record, log, status):
+    """Record a finished build: its JobLog's phase times and the ccache delta."""
+    if record is None:
+        return None
+    hits, misses = _hits_misses(record.ccache_before, ccache_stats(record.env))
+    phases = log.phase_times()
+    entry = {
+        'kind': record.kind,
+        'label': record.label,
+        'status': status,
+        'started_at': record.started_at,
+        'seconds': round(time.time() - record.started_at, 2),
+        'phases': phases,
+        'pch': 'pch' in phases,
+        'ccache_hits': hits,
+        'ccache_misses': misses,
+        'ccache_hit_rate': round(hits / (hits + misses), 3) if hits is not None and hits + misses else None,
+    }
+    with _lock:
+        _recent.append(entry)
+        key = f'{record.kind}+pch' if entry['pch'] else record.kind
+        total = _totals.setdefault(key, {'builds': 0, 'failed': 0, 'seconds': 0.0, 'phases': {},
+                                         'ccache_hits': 0, 'ccache_misses': 0})
+        total['builds'] += 1
+        if status != 'success':
+            total['failed'] += 1
+        total['seconds'] += entry['seconds']
+        for phase, seconds in phases.items():
+            total['phases'][phase] = total['phases'].get(phase, 0.0) + seconds
+        if hits is not None:
+            total['ccache_hits'] += hits
+            total['ccache_misses'] += misses
+        _settings.clear()
+        _settings.update({k: v for k, v in record.env.items() if k.startswith('CCACHE_')})
+    print(f"[build_stats] {record.kind} {record.label}: {entry['seconds']}s {phases} "
+          f"ccache {hits} hit / {misses} miss", flush=True)
+    return entry
+
+
+def stats():
+    """Recent builds plus per-kind totals and averages."""
+    with _lock:
+        recent = list(_recent)
+        totals = {kind: {**t, 'phases': dict(t['phases'])} for kind, t in _totals.items()}
+        settings = dict(_settings)
+    for t in totals.values():
+        n = t['builds']
+        t['seconds'] = round(t['seconds'], 2)
+        t['phases'] = {p: round(s, 2) for p, s in t['phases'].items()}
+        t['avg_seconds'] = round(t['seconds'] / n, 2)
+        t['avg_phases'] = {p: round(s / n, 2) for p, s in t['phases'].items()}
+        looked_up = t['ccache_hits'] + t['ccache_misses']
+        t['ccache_hit_rate'] = round(t['ccache_hits'] / looked_up, 3) if looked_up else None
+    return {'totals': totals, 'recent': recent, 'ccache_settings': settings}
@@ -0,0 +1,182 @@
+"""Start a device's first build from a warm per-screen seed build.
+
+The emulator has run_session.sh copy a pre-compiled build into every new
+session.  A device's first ``esphome compile`` used to start from an empty
+.esphome/build/<name> instead: PlatformIO resolving and scanning its
+libraries and the whole framework compiled, with only ccache to help.
+
+toolchain_setup.maybe_build_device_seeds() now compiles one device config
+per lib/<screen>_base.yaml (esphome.name ``seed-<screen>``) into the same
+data dir as the emulator seed.  When a device config has no build dir yet,
+seed() clones the seed of its screen type into it:
+
+  - every file and directory named after the seed is renamed for the device
+    (.pioenvs/<name>, sdkconfig.<name>, ...);
+  - text files (platformio.ini, CMake caches, ninja files, dependency files)
+    have the seed's build path and name rewritten, keeping their mtimes;
+  - the build tools' binary dependency databases (SCons .sconsign*.dblite,
+    .ninja_deps) hold the seed's absolute paths and cannot be rewritten, so
+    they are deleted.  SCons and ninja then recompile every object instead
+    of trusting ones built against the seed's generated headers (defines.h
+    differs as soon as a device adds a component); those recompiles are
+    ccache hits wherever the preprocessed source is unchanged;
+  - storage/<config>.json is written from the seed's with the device's name
+    and build path.  Without it ESPHome sees no previous build and cleans
+    the directory before compiling.
+
+A seed built by another ESPHome version is not used (ESPHome would clean the
+build anyway).  Seeding never fails a build: on any problem the compile just
+starts cold, as before.
+"""
+import os
+import json
+import time
+import shutil
+import threading
+
+import emulator_cache
+import fleet_install
+
+# Must match DEVICE_SEED_NAME / DEVICE_SEED_CONFIG in container/toolchain_setup.py.
+SEED_NAME = 'seed-{screen}'
+SEED_CONFIG = 'device_seed_{screen}.yaml'
+# Never rewritten (binary outputs).
+BINARY_SUFFIXES = ('.o', '.a', '.obj', '.bin', '.elf', '.map', '.gch', '.pyc', '.png', '.ttf')
+# Binary dependency databases with the seed's paths: deleted from the clone.
+DEPENDENCY_DB_PREFIXES = ('.sconsign', '.ninja_deps')
+REWRITE_MAX_BYTES = 8 * 1024 * 1024
+
+_stats_lock = threading.Lock()
+_stats = {'seeded': 0, 'no_seed': 0, 'errors': 0, 'seconds': 0.0}
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def screen_type(config):
+    """The <screen> of the lib/<screen>_base.yaml package a device config includes."""
+    packages = config.get('packages')
+    if not isinstance(packages, dict):
+        return None
+    for value in packages.values():
+        if isinstance(value, fleet_install._Tagged) and value.tag == '!include' and isinstance(value.value, str):
+            name = os.path.basename(value.value)
+            if name.endswith('_base.yaml'):
+                return name[:-len('_base.yaml')]
+    return None
+
+
+def device_name(config):
+    """esphome.name of a device config, substitutions expanded."""
+    subs = fleet_install.substitutions(config)
+    name = (config.get('esphome') or {}).get('name') or subs.get('device_name')
+    return str(fleet_install._substitute(str(name), subs)) if name else None
+
+
+def _rewrite(path, replacements):
+    """Apply *replacements* to a text file in place, keeping its mtime."""
+    st = os.stat(path)
+    if st.st_size > REWRITE_MAX_BYTES:
+        return False
+    with open(path, 'rb') as f:
+        data = f.read()
+    if b'\0' in data[:8192]:
+        return False
+    new = data
+    for old, repl in replacements:
+        new = new.replace(old, repl)
+    if new == data:
+        return False
+    with open(path, 'wb') as f:
+        f.write(new)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return True
+
+
+def _clone(seed_build, target, seed, name):
+    """Copy *seed_build* to *target* as the build dir of device *name*; returns files rewritten.
+
+    Objects keep their seed mtimes and the dependency databases are dropped,
+    so the device's first build recompiles (through ccache) rather than
+    reusing objects whose headers may differ."""
+    tmp = f'{target}.seeding.{os.getpid()}.{threading.get_ident()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        shutil.copytree(seed_build, tmp, symlinks=True)
+        for root, dirs, files in os.walk(tmp, topdown=False):
+            for entry in dirs + files:
+                if seed in entry:
+                    os.rename(os.path.join(root, entry), os.path.join(root, entry.replace(seed, name)))
+        replacements = [(os.path.abspath(seed_build).encode(), target.encode()), (seed.encode(), name.encode())]
+        rewritten = 0
+        for root, _, files in os.walk(tmp):
+            for fname in files:
+                path = os.path.join(root, fname)
+                if os.path.islink(path):
+                    continue
+                if fname.startswith(DEPENDENCY_DB_PREFIXES):
+                    os.remove(path)
+                elif not fname.endswith(BINARY_SUFFIXES) and _rewrite(path, replacements):
+                    rewritten += 1
+        os.rename(tmp, target)
+        return rewritten
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def seed(config_path, data_dir, seed_data_dir, log=print):
+    """Seed the build dir of the device config at *config_path* (an ESPHome
+    data dir *data_dir*) from *seed_data_dir*, if it has none yet.  True if seeded."""
+    try:
+        config = fleet_install.load_config(config_path)
+        screen, name = screen_type(config), device_name(config)
+        if not screen or not name:
+            return False
+        target = os.path.abspath(os.path.join(data_dir, 'build', name))
+        if os.path.exists(target):
+            return False
+        seed_name = SEED_NAME.format(screen=screen)
+        seed_build = os.path.join(seed_data_dir, 'build', seed_name)
+        seed_storage = os.path.join(seed_data_dir, 'storage', SEED_CONFIG.format(screen=screen) + '.json')
+        try:
+            with open(seed_storage) as f:
+                storage = json.load(f)
+        except (OSError, ValueError):
+            storage = None
+        if (storage is None or not os.path.isdir(seed_build)
+                or storage.get('esphome_version') != emulator_cache.esphome_version()):
+            _count('no_seed')
+            return False
+
+        started = time.time()
+        log(f'Seeding build directory for {name} from the {screen} seed build...')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        rewritten = _clone(seed_build, target, seed_name, name)
+
+        text = json.dumps(storage).replace(json.dumps(os.path.abspath(seed_build))[1:-1],
+                                           json.dumps(target)[1:-1])
+        storage = json.loads(text.replace(seed_name, name))
+        storage['name'] = name
+        storage['build_path'] = target
+        storage_dir = os.path.join(data_dir, 'storage')
+        os.makedirs(storage_dir, exist_ok=True)
+        with open(os.path.join(storage_dir, os.path.basename(config_path) + '.json'), 'w') as f:
+            json.dump(storage, f, indent=2)
+
+        took = time.time() - started
+        _count('seeded')
+        _count('seconds', took)
+        log(f'Seeded build directory in {took:.1f}s ({rewritten} files rewritten)')
+        return True
+    except Exception as e:
+        _count('errors')
+        log(f'Could not seed build directory, building from scratch: {e}')
+        return False
+
+
+def stats():
+    with _stats_lock:
+        return {**_stats, 'seconds': round(_stats['seconds'], 1)}
@@ -0,0 +1,204 @@
+"""Cache of linked emulator executables, keyed by a hash of the resolved config.
+
+Starting the emulator normally runs ``esphome run lib/emulator.yaml``, which
+goes through validation, C++ codegen, compilation and linking even when the
+tiles file is byte-identical to one a previous session already built (the
+default test_device tiles, a re-opened saved config, ...).
+
+The host-platform build produces a single self-contained ``program`` binary
+(fonts, images and the tile lambdas are all compiled in), so it can be reused
+as-is whenever every input that went into it is unchanged:
+
+  * the tiles file content
+  * the screen-type substitutions (dimensions, font sizes, border width) and
+    the API port, which ESPHome bakes into the binary
+  * the lib/ files and the tile_ui component sources
+  * the installed ESPHome version
+
+server.py computes the key and looks it up before launching run_session.sh.
+On a hit the script launches the cached binary directly; on a miss it builds
+as usual and stores the linked program via ``python3 emulator_cache.py store``.
+The cache is bounded by total size with least-recently-used eviction (the
+entry mtime is bumped on every hit).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+CACHE_DIR = os.environ.get('EMULATOR_BIN_CACHE_DIR', '/tmp/emulator_bin_cache')
+CACHE_MAX_MB = int(os.environ.get('EMULATOR_BIN_CACHE_MB', '512'))
+PROGRAM_NAME = 'program'
+
+# Files under lib/ that never influence the emulator binary: per-session tile
+# configs (hashed separately as the tiles content), generated debug PNGs and
+# build output.
+_SKIP_DIRS = {'.esphome', '__pycache__', 'images', 'tests'}
+_SKIP_PREFIXES = ('user_config', 'test_device_tiles')
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+
+def esphome_version():
+    """Return the installed ESPHome version, or 'unknown'."""
+    try:
+        from importlib.metadata import version
+        return version('esphome')
+    except Exception:
+        pass
+    try:
+        with open('/app/esphome_version.txt') as f:
+            return f.read().strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+
+def hash_tree(h, root):
+    """Feed every relevant file under *root* into *h* in a deterministic order."""
+    if not os.path.isdir(root):
+        h.update(f'missing:{root}'.encode())
+        return
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d not in _SKIP_DIRS)
+        for fname in sorted(files):
+            if fname.startswith('.') or fname.startswith(_SKIP_PREFIXES) or fname.endswith('.pyc'):
+                continue
+            path = os.path.join(dirpath, fname)
+            rel = os.path.relpath(path, root).replace('\\', '/')
+            try:
+                with open(path, 'rb') as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                continue
+            h.update(f'{rel}\0{digest}\n'.encode())
+
+
+def config_key(tiles_yaml, substitutions, lib_dir, components_dir, version=None):
+    """Return the cache key for an emulator build.
+
+    *substitutions* holds every ``-s`` value passed to ESPHome except the
+    tiles file name, which only says where to read *tiles_yaml* from.
+    """
+    h = hashlib.sha256()
+    h.update(f'esphome={version or esphome_version()}\n'.encode())
+    for k in sorted(substitutions):
+        h.update(f'sub:{k}={substitutions[k]}\n'.encode())
+    h.update(b'tiles\0')
+    h.update(tiles_yaml.encode() if isinstance(tiles_yaml, str) else tiles_yaml)
+    h.update(b'\0lib\0')
+    hash_tree(h, lib_dir)
+    h.update(b'\0components\0')
+    hash_tree(h, components_dir)
+    return h.hexdigest()[:24]
+
+
+def _entry_dir(key):
+    return os.path.join(CACHE_DIR, key)
+
+
+def lookup(key):
+    """Return the path of the cached program for *key*, or None on a miss."""
+    program = os.path.join(_entry_dir(key), PROGRAM_NAME)
+    if os.path.isfile(program) and os.access(program, os.X_OK):
+        try:
+            now = time.time()
+            os.utime(_entry_dir(key), (now, now))
+        except OSError:
+            pass
+        with _stats_lock:
+            _stats['hits'] += 1
+        return program
+    with _stats_lock:
+        _stats['misses'] += 1
+    return None
+
+
+def store(key, program_path, max_mb=None):
+    """Copy a freshly linked *program_path* into the cache under *key*."""
+    if not os.path.isfile(program_path):
+        raise FileNotFoundError(program_path)
+    entry = _entry_dir(key)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Copy into a private temp dir and rename so a concurrent lookup never
+    # sees a half-written binary.
+    tmp = f'{entry}.tmp.{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    shutil.copy2(program_path, os.path.join(tmp, PROGRAM_NAME))
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'key': key, 'stored_at': time.time(), 'source': program_path}, f)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+    with _stats_lock:
+        _stats['stores'] += 1
+    evict(max_mb)
+    return os.path.join(entry, PROGRAM_NAME)
+
+
+def _entries():
+    """Return [(mtime, size_bytes, path)] for every cache entry."""
+    result = []
+    if not os.path.isdir(CACHE_DIR):
+        return result
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        if not os.path.isdir(path) or '.tmp.' in name:
+            continue
+        size = 0
+        for fname in os.listdir(path):
+            try:
+                size += os.path.getsize(os.path.join(path, fname))
+            except OSError:
+                pass
+        try:
+            result.append((os.path.getmtime(path), size, path))
+        except OSError:
+            pass
+    return result
+
+
+def evict(max_mb=None):
+    """Delete least-recently-used entries until the cache fits in *max_mb*."""
+    budget = (CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= budget:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        with _stats_lock:
+            _stats['evictions'] += 1
+        print(f"[emulator_cache] Evicted {os.path.basename(path)} ({size // 1024} KB)", flush=True)
+
+
+def stats():
+    """Return hit/miss counters and the current cache footprint."""
+    entries = _entries()
+    with _stats_lock:
+        counters = dict(_stats)
+    return {
+        **counters,
+        'entries': len(entries),
+        'bytes': sum(size for _, size, _ in entries),
+        'max_bytes': CACHE_MAX_MB * 1024 * 1024,
+    }
+
+
+if __name__ == '__main__':
+    # Called by run_session.sh after a successful link:
+    #   python3 emulator_cache.py store <key> <program>
+    if len(sys.argv) == 4 and sys.argv[1] == 'store':
+        try:
+            path = store(sys.argv[2], sys.argv[3])
+            print(f"[emulator_cache] Stored {sys.argv[2]} -> {path}", flush=True)
+        except Exception as e:
+            print(f"[emulator_cache] Store failed: {e}", flush=True)
+            sys.exit(1)
+    else:
+        print('Usage: emulator_cache.py store <key> <program>', file=sys.stderr)
+        sys.exit(2)
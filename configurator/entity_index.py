@@ -0,0 +1,199 @@
+"""Server-side entity search for the configurator's entity pickers.
+
+One EntityIndex is kept per (Home Assistant, token), holding just what a
+picker shows for each entity: entity_id, friendly_name, domain and
+device_class.  It is loaded with a single GET /api/states when first searched
+and reloaded once it is HA_ENTITY_INDEX_TTL seconds old (entities come and
+go rarely).  Between reloads, every state the shared state hub
+(ha_state_hub) receives is passed to note_state(), so a renamed entity
+shows up under its new name without waiting for the next reload.
+
+search() matches every whitespace-separated query term against the entity_id
+and the friendly name, best match first:
+
+  exact entity_id > entity_id / object_id / name prefix > word prefix
+  > substring > fuzzy (the term's characters in order, e.g. "lvrm" finds
+  light.living_room; the closer together they are, the higher it scores)
+
+and returns one page of results plus the total number of matches.
+"""
+import os
+import time
+import hashlib
+import threading
+
+INDEX_TTL = float(os.environ.get('HA_ENTITY_INDEX_TTL', '60'))  # seconds
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 200
+
+_indexes_lock = threading.Lock()
+_indexes = {}  # (base_url, token hash) -> EntityIndex
+_stats_lock = threading.Lock()
+_stats = {'searches': 0, 'loads': 0, 'load_errors': 0, 'updates': 0}
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _key(base_url, token):
+    return (base_url.rstrip('/'), hashlib.sha256((token or '').encode()).hexdigest()[:16])
+
+
+class _Entry:
+    __slots__ = ('entity_id', 'friendly_name', 'domain', 'device_class',
+                 '_eid', '_object_id', '_name', '_words')
+
+    def __init__(self, entity_id, attributes):
+        self.entity_id = entity_id
+        self.domain = entity_id.split('.', 1)[0]
+        self.friendly_name = attributes.get('friendly_name') or ''
+        self.device_class = attributes.get('device_class') or ''
+        self._eid = entity_id.lower()
+        self._object_id = self._eid.split('.', 1)[-1]
+        self._name = self.friendly_name.lower()
+        self._words = tuple(w for w in self._object_id.replace('_', ' ').split() + self._name.split() if w)
+
+    def same(self, attributes):
+        return (self.friendly_name == (attributes.get('friendly_name') or '')
+                and self.device_class == (attributes.get('device_class') or ''))
+
+    def score(self, term):
+        """How well *term* (lowercase) matches this entity; 0 for no match."""
+        if term == self._eid:
+            return 100
+        if self._eid.startswith(term) or self._object_id.startswith(term) or self._name.startswith(term):
+            return 80
+        if any(w.startswith(term) for w in self._words):
+            return 60
+        if term in self._eid or term in self._name:
+            return 45
+        return max(_fuzzy(term, self._eid), _fuzzy(term, self._name))
+
+    def to_dict(self):
+        return {'entity_id': self.entity_id, 'friendly_name': self.friendly_name,
+                'domain': self.domain, 'device_class': self.device_class}
+
+
+def _fuzzy(term, text):
+    """Score (up to 40) for *term*'s characters appearing in order in *text*."""
+    pos = start = -1
+    for ch in term:
+        pos = text.find(ch, pos + 1)
+        if pos < 0:
+            return 0
+        if start < 0:
+            start = pos
+    span = pos - start + 1
+    return max(1, int(40 * len(term) / span))
+
+
+class EntityIndex:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.entries = {}  # entity_id -> _Entry
+        self.loaded_at = None  # time.monotonic() of the last full load
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= INDEX_TTL
+
+    def load(self, states):
+        """Replace the index with a /api/states list."""
+        entries = {}
+        for s in states:
+            eid = s.get('entity_id') if isinstance(s, dict) else None
+            if eid:
+                entries[eid] = _Entry(eid, s.get('attributes') or {})
+        with self._lock:
+            self.entries = entries
+            self.loaded_at = time.monotonic()
+        _count('loads')
+
+    def ensure_loaded(self, fetch_states):
+        """Reload from ``fetch_states()`` if stale.  Concurrent callers share one load;
+        if it fails, a previously loaded index keeps being served."""
+        if not self.stale():
+            return
+        with self._load_lock:
+            if not self.stale():
+                return
+            try:
+                states = fetch_states()
+            except Exception:
+                _count('load_errors')
+                if self.loaded_at is None:
+                    raise
+                return
+            self.load(states)
+
+    def note_state(self, entity_id, attributes):
+        with self._lock:
+            entry = self.entries.get(entity_id)
+            # Removals arrive with no attributes: keep the indexed name.
+            if entry is not None and (not attributes or entry.same(attributes)):
+                return
+            self.entries[entity_id] = _Entry(entity_id, attributes)
+        _count('updates')
+
+    def search(self, query, domain=None, device_class=None, limit=DEFAULT_LIMIT, offset=0):
+        """(total matches, one page of result dicts), best match first."""
+        terms = query.lower().split()
+        domains = set(domain.split(',')) if domain else None
+        classes = set(device_class.split(',')) if device_class else None
+        with self._lock:
+            entries = list(self.entries.values())
+        scored = []
+        for e in entries:
+            if domains and e.domain not in domains:
+                continue
+            if classes and e.device_class not in classes:
+                continue
+            total = 0
+            for term in terms:
+                s = e.score(term)
+                if not s:
+                    break
+                total += s
+            else:
+                scored.append((-total, e.entity_id, e))
+        scored.sort(key=lambda t: t[:2])
+        _count('searches')
+        limit = max(1, min(int(limit), MAX_LIMIT))
+        offset = max(0, int(offset))
+        return len(scored), [e.to_dict() for _, _, e in scored[offset:offset + limit]]
+
+
+def get(base_url, token):
+    """The index for one Home Assistant and token, created empty on first use."""
+    key = _key(base_url, token)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = EntityIndex(key[0])
+        return index
+
+
+def note_state(base_url, token, entity_id, attributes):
+    """Feed one state from the shared hub into that HA's index, if there is one."""
+    with _indexes_lock:
+        index = _indexes.get(_key(base_url, token))
+    if index is not None and index.loaded_at is not None:
+        index.note_state(entity_id, attributes)
+
+
+def stats():
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    with _stats_lock:
+        st = dict(_stats)
+    return {
+        **st,
+        'indexes': [{
+            'base_url': i.base_url,
+            'entities': len(i.entries),
+            'age': None if i.loaded_at is None else round(time.monotonic() - i.loaded_at, 1),
+        } for i in indexes],
+    }
@@ -0,0 +1,181 @@
+"""Cache of compiled device firmware, keyed by a hash of every build input.
+
+/api/esphome/compile used to run ``esphome compile`` even when nothing had
+changed since the last successful build of that config, e.g. when the USB
+flash dialog is reopened or a second panel is flashed from the same file.
+After a successful compile the flashable outputs (FIRMWARE_FILES: app,
+factory image, bootloader, partition table) are copied here together with
+their flash manifest, under a key covering:
+
+  * the device config as the fleet installer sees it (fleet_install
+    .firmware_key: substitutions expanded, upload address dropped, included
+    and referenced files such as packages and the tiles file hashed by
+    content)
+  * the lib/ files, the tile_ui component sources and the images directory
+  * secrets.yaml (Wi-Fi credentials are compiled in; only its hash is kept)
+  * the installed ESPHome version
+
+A compile whose key is already cached finishes immediately and the firmware
+is served from the entry.  Retention is bounded by entry count and by total
+size, least recently used first (lookups bump the entry mtime).
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+import emulator_cache
+import fleet_install
+
+CACHE_DIR = os.environ.get('FIRMWARE_CACHE_DIR', '/tmp/firmware_cache')
+CACHE_MAX_MB = int(os.environ.get('FIRMWARE_CACHE_MB', '256'))
+CACHE_MAX_ENTRIES = int(os.environ.get('FIRMWARE_CACHE_MAX_ENTRIES', '20'))
+MANIFEST_NAME = 'manifest.json'
+
+# (file in .pioenvs/<name>, flash offset when flashing the parts separately)
+FIRMWARE_FILES = (
+    ('firmware.factory.bin', 0),
+    ('bootloader.bin', 0x1000),
+    ('partitions.bin', 0x8000),
+    ('boot_app0.bin', 0xE000),
+    ('firmware.bin', 0x10000),
+)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+
+def config_key(filepath, base_dir, version=None):
+    """Return the cache key for compiling the device config at *filepath*."""
+    h = hashlib.sha256()
+    h.update(f'esphome={version or emulator_cache.esphome_version()}\n'.encode())
+    h.update(f'config={fleet_install.firmware_key(filepath)}\n'.encode())
+    for sub in ('lib', 'external_components', 'images'):
+        h.update(f'\0{sub}\0'.encode())
+        emulator_cache.hash_tree(h, os.path.join(base_dir, sub))
+    try:
+        with open(os.path.join(base_dir, 'secrets.yaml'), 'rb') as f:
+            h.update(b'\0secrets\0' + hashlib.sha256(f.read()).digest())
+    except OSError:
+        h.update(b'\0no-secrets\0')
+    return h.hexdigest()[:24]
+
+
+def manifest_parts(directory):
+    """[(file, offset)] to flash from *directory*: the factory image alone if
+    there is one, else the separate parts."""
+    if os.path.isfile(os.path.join(directory, 'firmware.factory.bin')):
+        return [('firmware.factory.bin', 0)]
+    if not os.path.isfile(os.path.join(directory, 'firmware.bin')):
+        return []
+    return [(name, offset) for name, offset in FIRMWARE_FILES
+            if name != 'firmware.factory.bin' and os.path.isfile(os.path.join(directory, name))]
+
+
+def entry_dir(key):
+    return os.path.join(CACHE_DIR, key)
+
+
+def lookup(key):
+    """Return the cached manifest dict for *key*, or None on a miss."""
+    path = os.path.join(entry_dir(key), MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+        now = time.time()
+        os.utime(entry_dir(key), (now, now))
+    except (OSError, ValueError):
+        with _stats_lock:
+            _stats['misses'] += 1
+        return None
+    with _stats_lock:
+        _stats['hits'] += 1
+    return manifest
+
+
+def store(key, build_dir, device_name):
+    """Copy the flashable outputs of a successful build into the cache under *key*."""
+    parts = manifest_parts(build_dir)
+    if not parts:
+        raise FileNotFoundError(f'No firmware binaries in {build_dir}')
+    entry = entry_dir(key)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Copy into a private temp dir and rename so a concurrent lookup never
+    # sees a half-written entry.
+    tmp = f'{entry}.tmp.{os.getpid()}.{threading.get_ident()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, _ in FIRMWARE_FILES:
+        src = os.path.join(build_dir, name)
+        if os.path.isfile(src):
+            shutil.copy2(src, os.path.join(tmp, name))
+    manifest = {
+        'key': key,
+        'device_name': device_name,
+        'stored_at': time.time(),
+        'parts': [{'file': name, 'offset': offset} for name, offset in parts],
+    }
+    with open(os.path.join(tmp, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+    with _stats_lock:
+        _stats['stores'] += 1
+    evict()
+    return manifest
+
+
+def _entries():
+    """Return [(mtime, size_bytes, path)] for every cache entry."""
+    result = []
+    if not os.path.isdir(CACHE_DIR):
+        return result
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        if not os.path.isdir(path) or '.tmp.' in name:
+            continue
+        size = 0
+        for fname in os.listdir(path):
+            try:
+                size += os.path.getsize(os.path.join(path, fname))
+            except OSError:
+                pass
+        try:
+            result.append((os.path.getmtime(path), size, path))
+        except OSError:
+            pass
+    return result
+
+
+def evict(max_mb=None, max_entries=None):
+    """Delete least-recently-used entries until both the size and count limits hold."""
+    budget = (CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    limit = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    count = len(entries)
+    for _, size, path in entries:
+        if total <= budget and count <= limit:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        count -= 1
+        with _stats_lock:
+            _stats['evictions'] += 1
+        print(f"[firmware_cache] Evicted {os.path.basename(path)} ({size // 1024} KB)", flush=True)
+
+
+def stats():
+    """Return hit/miss counters and the current cache footprint."""
+    entries = _entries()
+    with _stats_lock:
+        counters = dict(_stats)
+    return {
+        **counters,
+        'entries': len(entries),
+        'bytes': sum(size for _, size, _ in entries),
+        'max_entries': CACHE_MAX_ENTRIES,
+        'max_bytes': CACHE_MAX_MB * 1024 * 1024,
+    }
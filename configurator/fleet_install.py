@@ -0,0 +1,369 @@
+"""Compile once, upload many: OTA installs to a fleet of devices.
+
+A plain install runs a full ``esphome run`` per device even when a dozen
+panels share one configuration.  A FleetInstall instead:
+
+  1. Computes each device's firmware key (firmware_key()).  This is a hash
+     of its config with substitutions expanded, the substitutions block and
+     the firmware-neutral fields (FIRMWARE_NEUTRAL: the OTA target address)
+     removed, plus the content of every file it includes or references
+     (packages, glyph lists, the tiles file).  A substitution that is only
+     used for a neutral field, or not used at all, does not split devices.
+     One that ends up in the firmware does: ESPHome compiles esphome.name
+     (usually $device_name) and the API key into the binary, so panels with
+     different names get separate builds.
+  2. Groups devices by that key and compiles each group once with
+     ``esphome compile <first device>``, through build_scheduler like any
+     other build.  A fleet's groups compile one after another, so every
+     build after the first finds the shared ccache warm.
+  3. As soon as a group's firmware is ready, uploads it to every device in
+     the group with ``esphome upload <first device> --device <address>``,
+     at most FLEET_UPLOAD_CONCURRENCY uploads at a time.
+
+All output goes into one line buffer, each line prefixed with the build or
+device address it came from, next to a per-device phase (queued, compiling,
+uploading, success, error, cancelled).  /api/esphome/fleet/status polls it
+with an offset like the single-device install status; /api/esphome/fleet/stream
+pushes it as server-sent events (job_log).
+"""
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import threading
+import subprocess
+import concurrent.futures
+
+import yaml
+
+import build_scheduler
+import job_log
+
+UPLOAD_CONCURRENCY = int(os.environ.get('FLEET_UPLOAD_CONCURRENCY', '4'))
+# Config fields that only tell ESPHome where to upload, not what to build.
+FIRMWARE_NEUTRAL = (('wifi', 'use_address'),)
+
+_ANSI_RE = re.compile(r'\x1b\[[0-9;?]*[a-zA-Z]')
+_LINE_SPLIT_RE = re.compile(r'\r\n|\n|\r')
+_SUBST_RE = re.compile(r'\$\{(\w+)\}|\$(\w+)')
+_INCLUDE_RE = re.compile(r'!include\s+([^\s#]+)')
+
+
+class _Tagged:
+    """A custom-tagged YAML node (!include, !secret, !extend, ...) kept as data."""
+
+    def __init__(self, tag, value):
+        self.tag = tag
+        self.value = value
+
+
+class _Loader(yaml.SafeLoader):
+    pass
+
+
+def _construct_tagged(loader, tag_suffix, node):
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep=True)
+    else:
+        value = loader.construct_mapping(node, deep=True)
+    return _Tagged('!' + tag_suffix, value)
+
+
+_Loader.add_multi_constructor('!', _construct_tagged)
+
+
+def load_config(filepath):
+    with open(filepath, 'r') as f:
+        data = yaml.load(f, Loader=_Loader)
+    return data if isinstance(data, dict) else {}
+
+
+def _substitute(value, subs):
+    if isinstance(value, str):
+        return _SUBST_RE.sub(lambda m: str(subs.get(m.group(1) or m.group(2), m.group(0))), value)
+    if isinstance(value, dict):
+        return {k: _substitute(v, subs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, subs) for v in value]
+    if isinstance(value, _Tagged):
+        return _Tagged(value.tag, _substitute(value.value, subs))
+    return value
+
+
+def substitutions(config):
+    subs = config.get('substitutions')
+    return {str(k): v for k, v in subs.items()} if isinstance(subs, dict) else {}
+
+
+def ota_address(config):
+    """OTA target for a loaded device config: wifi.use_address, else <name>.local."""
+    subs = substitutions(config)
+    wifi = config.get('wifi')
+    if isinstance(wifi, dict) and wifi.get('use_address'):
+        return str(_substitute(wifi['use_address'], subs))
+    name = subs.get('device_name') or (config.get('esphome') or {}).get('name')
+    if name:
+        return f"{_substitute(str(name), subs)}.local"
+    return None
+
+
+def _hash_file(h, path, subs, seen):
+    """Hash a referenced file, the substitutions it uses and, recursively, its includes."""
+    path = os.path.normpath(path)
+    if path in seen:
+        return
+    seen.add(path)
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    except OSError:
+        h.update(f'missing:{path}\n'.encode())
+        return
+    h.update(f'file:{os.path.basename(path)}\0{hashlib.sha256(content).hexdigest()}\n'.encode())
+    text = content.decode('utf-8', 'replace')
+    for m in _SUBST_RE.finditer(text):
+        name = m.group(1) or m.group(2)
+        h.update(f'subst:{name}={subs.get(name)}\n'.encode())
+    for m in _INCLUDE_RE.finditer(text):
+        _hash_file(h, os.path.join(os.path.dirname(path), m.group(1)), subs, seen)
+
+
+def firmware_key(filepath):
+    """Hash identifying the firmware a device config builds (see module docstring)."""
+    config = load_config(filepath)
+    subs = substitutions(config)
+    config.pop('substitutions', None)
+    for section, field in FIRMWARE_NEUTRAL:
+        if isinstance(config.get(section), dict):
+            config[section].pop(field, None)
+    config = _substitute(config, subs)
+    base = os.path.dirname(os.path.abspath(filepath))
+    h = hashlib.sha256()
+    seen = set()
+
+    def encode(value):
+        if isinstance(value, _Tagged):
+            if value.tag == '!include' and isinstance(value.value, str):
+                _hash_file(h, os.path.join(base, value.value), subs, seen)
+            return {value.tag: encode(value.value)}
+        if isinstance(value, dict):
+            return {str(k): encode(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [encode(v) for v in value]
+        if isinstance(value, str) and value.endswith(('.yaml', '.yml', '.h')) and '..' not in value:
+            candidate = os.path.join(base, value)
+            if os.path.isfile(candidate):
+                _hash_file(h, candidate, subs, seen)
+        return value
+
+    h.update(json.dumps(encode(config), sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+
+class FleetInstall:
+    def __init__(self, session_id, base_dir, filenames, env, scheduler=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.base_dir = base_dir
+        self.env = env
+        self.scheduler = scheduler or build_scheduler.scheduler
+        self.lines = job_log.JobLog()
+        self.status = 'running'  # running | success | error
+        self.message = ''
+        self.devices = {}  # filename -> {name, address, group, phase, message}
+        self.groups = []  # [{key, leader, members, phase, job}]
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._procs = set()
+        self._uploads = concurrent.futures.ThreadPoolExecutor(
+            max_workers=UPLOAD_CONCURRENCY, thread_name_prefix='fleet-upload')
+        self._plan(filenames)
+
+    # ---- planning ------------------------------------------------------
+
+    def _plan(self, filenames):
+        by_key = {}
+        for filename in filenames:
+            path = os.path.join(self.base_dir, filename.lstrip('/'))
+            config = load_config(path)
+            address = ota_address(config)
+            if not address:
+                raise ValueError(f'No OTA address for {filename} (set wifi.use_address or device_name)')
+            key = firmware_key(path)
+            self.devices[filename] = {
+                'name': str(substitutions(config).get('device_name')
+                            or os.path.splitext(os.path.basename(filename))[0]),
+                'address': address,
+                'group': key,
+                'phase': 'queued',
+                'message': '',
+            }
+            by_key.setdefault(key, []).append(filename)
+        self.groups = [{'key': key, 'leader': members[0], 'members': members, 'phase': 'queued', 'job': None}
+                       for key, members in by_key.items()]
+        self.message = (f'{len(self.devices)} device(s) in {len(self.groups)} build group(s)')
+        self._log('fleet', self.message)
+        for g in self.groups:
+            self._log('fleet', f"Group {g['key']}: {', '.join(g['members'])}")
+
+    # ---- output --------------------------------------------------------
+
+    def _log(self, source, line):
+        self.lines.append(f'[{source}] {line}')
+
+    def _run(self, source, cmd):
+        """Run *cmd*, copying its output into the fleet log; returns the exit code."""
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, cwd=self.base_dir, text=True,
+                                bufsize=1, env=self.env)
+        return self._follow(source, proc)
+
+    def _follow(self, source, proc):
+        with self._lock:
+            self._procs.add(proc)
+        try:
+            for line in iter(proc.stdout.readline, ''):
+                for part in _LINE_SPLIT_RE.split(line):
+                    clean = _ANSI_RE.sub('', part.rstrip())
+                    if clean.strip():
+                        self._log(source, clean)
+            return proc.wait()
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+
+    def _set_phase(self, filenames, phase, message=''):
+        for f in filenames:
+            if self.devices[f]['phase'] not in ('success', 'error', 'cancelled'):
+                self.devices[f]['phase'] = phase
+                self.devices[f]['message'] = message
+
+    # ---- compile -------------------------------------------------------
+
+    def start(self):
+        self._submit_group(0)
+        return self
+
+    def _submit_group(self, index):
+        if self._cancelled or index >= len(self.groups):
+            return
+        group = self.groups[index]
+
+        def _start(job):
+            proc = subprocess.Popen(['esphome', 'compile', group['leader']],
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    stdin=subprocess.DEVNULL, cwd=self.base_dir, text=True,
+                                    bufsize=1, env=self.env)
+            job.process = proc
+            group['phase'] = 'compiling'
+            self._set_phase(group['members'], 'compiling')
+            threading.Thread(target=self._compile_done, args=(index, job, proc), daemon=True).start()
+            return proc
+
+        group['job'] = build_scheduler.BuildJob('compile', self.session_id, group['leader'], _start)
+        self.scheduler.submit(group['job'])
+
+    def _compile_done(self, index, job, proc):
+        group = self.groups[index]
+        try:
+            code = self._follow(f"build {group['key']}", proc)
+        finally:
+            self.scheduler.finished(job)
+        if code == 0 and not self._cancelled:
+            group['phase'] = 'uploading'
+            self._log('fleet', f"Firmware for group {group['key']} built, uploading to {len(group['members'])} device(s)")
+            for filename in group['members']:
+                self.devices[filename]['phase'] = 'waiting_upload'
+                self._uploads.submit(self._upload, group, filename)
+        else:
+            group['phase'] = 'error'
+            reason = 'cancelled' if self._cancelled else f'compile failed (exit code {code})'
+            self._set_phase(group['members'], 'cancelled' if self._cancelled else 'error', reason)
+            self._log('fleet', f"Group {group['key']}: {reason}")
+        self._submit_group(index + 1)
+        self._check_done()
+
+    # ---- upload --------------------------------------------------------
+
+    def _upload(self, group, filename):
+        device = self.devices[filename]
+        if self._cancelled:
+            self._set_phase([filename], 'cancelled', 'cancelled')
+            self._check_done()
+            return
+        device['phase'] = 'uploading'
+        try:
+            code = self._run(device['address'], ['esphome', 'upload', group['leader'],
+                                               '--device', device['address']])
+        except Exception as e:
+            code = None
+            device['message'] = str(e)
+        if code == 0:
+            device['phase'] = 'success'
+            device['message'] = 'Uploaded'
+        elif self._cancelled:
+            self._set_phase([filename], 'cancelled', 'cancelled')
+        else:
+            device['phase'] = 'error'
+            device['message'] = device['message'] or f'Upload failed (exit code {code})'
+        self._log(device['address'], device['message'])
+        self._check_done()
+
+    # ---- lifecycle -----------------------------------------------------
+
+    def _check_done(self):
+        with self._lock:
+            phases = [d['phase'] for d in self.devices.values()]
+            if self.status != 'running' or any(p not in ('success', 'error', 'cancelled') for p in phases):
+                return
+            ok = phases.count('success')
+            self.status = 'success' if ok == len(phases) else 'error'
+            self.message = f'{ok}/{len(phases)} device(s) installed in {round(time.time() - self.started_at)}s'
+        self._log('fleet', self.message)
+        self.lines.close()
+        self._uploads.shutdown(wait=False)
+
+    def cancel(self):
+        """Stop this fleet only: its queued/running build and its uploads."""
+        self._cancelled = True
+        for group in self.groups:
+            if group['job'] is not None and group['job'].state in ('queued', 'running'):
+                self.scheduler.cancel(group['job'])
+            if group['phase'] == 'queued':
+                group['phase'] = 'cancelled'
+                self._set_phase(group['members'], 'cancelled', 'cancelled')
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+        self._log('fleet', 'Cancelled by user')
+        self._check_done()
+
+    def snapshot(self, offset=0):
+        offset = max(0, min(offset, len(self.lines)))
+        lines = self.lines.since(offset, job_log.READ_LIMIT)
+        queue = None
+        for group in self.groups:
+            job = group['job']
+            if job is not None and job.state == 'queued':
+                queue = self.scheduler.position(job)
+                break
+        return {
+            'fleet_id': self.id,
+            # Still 'running' while lines remain unsent: clients stop at a final status.
+            'status': self.status if offset + len(lines) >= len(self.lines) else 'running',
+            'message': self.message,
+            'lines': lines,
+            'offset': offset + len(lines),
+            'log_id': self.lines.id,
+            'devices': self.devices,
+            'groups': [{k: g[k] for k in ('key', 'leader', 'members', 'phase')} for g in self.groups],
+            'queue_position': queue[0] if queue else None,
+            'eta_seconds': queue[1] if queue else None,
+        }
@@ -169,6 +169,7 @@ try:
     from tile_ui import generate_init_tiles_cpp
     from tile_ui.validation import validate_tiles_config
     from tile_ui.data_collection import collect_available_scripts, collect_available_globals
+    from tile_ui.tile_data import DataBlobUnsupported, serialize_screens
 except ImportError as e:
     print(json.dumps({"error": f"Failed to import tile_ui: {e}"}))
     sys.exit(1)
@@ -356,9 +357,20 @@ def generate_cpp_from_yaml(input_data, user_lib_dir=None, images_dir=None, scree
                 except Exception as _e:
                     print(f"Warning: failed to write screen image '{_sid}': {_e}")
 
+        # Data-driven blob for emulator sessions (tile_ui data_driven: true).
+        # Images are compiled into the program per config, so configs that use
+        # them always take the regular rebuild path.
+        data_blob = None
+        if not images and not screen_images:
+            try:
+                data_blob = serialize_screens(screens, available_scripts, available_globals)
+            except DataBlobUnsupported as e:
+                print(f"Data blob unavailable: {e}")
+
         return {
             "success": True,
             "cpp": cpp_lambdas,
+            "data_blob": data_blob,
             "message": f"Successfully generated {len(cpp_lambdas)} initialization blocks."
         }
 
@@ -0,0 +1,111 @@
+"""Coalescing, concurrency-bounded REST state fetcher for the HA state hub.
+
+Entity fetches are queued rather than handed to an unbounded executor:
+
+  - a request for an entity that is already pending or in flight joins that
+    fetch instead of issuing another one (``fresh=True`` — used right after a
+    service call — waits for the in-flight fetch to finish and then fetches
+    again, so it cannot return the pre-call state);
+  - fetches are coroutines run as tasks on the hub's loop (the shared proxy
+    loop) with the pooled aiohttp client, and at most FETCH_CONCURRENCY run
+    at a time, so no threads are involved however slow Home Assistant is;
+  - when BATCH_MIN or more entities are waiting they are fetched with one
+    ``GET /api/states`` instead of one request each.
+
+The queue holds each entity at most once, so it is bounded by the number of
+subscribed entities: a slow upstream makes poll rounds coalesce, not pile up.
+"""
+import os
+import asyncio
+import threading
+import concurrent.futures
+
+FETCH_CONCURRENCY = int(os.environ.get('HA_FETCH_CONCURRENCY', '4'))
+BATCH_MIN = int(os.environ.get('HA_FETCH_BATCH_MIN', '8'))
+
+
+class FetchScheduler:
+    def __init__(self, loop, fetch_one, fetch_many, log, max_workers=None, batch_min=None):
+        self._loop = loop
+        self._fetch_one = fetch_one  # async fetch_one(entity_id)
+        self._fetch_many = fetch_many  # async fetch_many(set_of_entity_ids)
+        self.log = log
+        self.max_workers = max_workers or FETCH_CONCURRENCY
+        self.batch_min = batch_min or BATCH_MIN
+        self._lock = threading.Lock()
+        self._pending = {}  # entity_id -> [Future]
+        self._in_flight = {}  # entity_id -> [Future]
+        self._busy = 0
+        self._tasks = set()
+        self._closed = False
+        self._stats = {'requested': 0, 'coalesced': 0, 'single': 0, 'batched': 0, 'errors': 0}
+
+    def request(self, entity_id, fresh=False):
+        """Queue a fetch of *entity_id*; returns a Future resolved when it is done.
+
+        Thread-safe.
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._stats['requested'] += 1
+            if entity_id in self._pending:
+                self._pending[entity_id].append(future)
+                self._stats['coalesced'] += 1
+                return future
+            if not fresh and entity_id in self._in_flight:
+                self._in_flight[entity_id].append(future)
+                self._stats['coalesced'] += 1
+                return future
+            self._pending[entity_id] = [future]
+        self._loop.call_soon_threadsafe(self._drain)
+        return future
+
+    def _drain(self):
+        if self._closed:
+            return
+        with self._lock:
+            while self._busy < self.max_workers:
+                ready = [eid for eid in self._pending if eid not in self._in_flight]
+                if not ready:
+                    break
+                batch = ready if len(ready) >= self.batch_min else ready[:1]
+                jobs = {eid: self._pending.pop(eid) for eid in batch}
+                self._in_flight.update(jobs)
+                self._busy += 1
+                task = self._loop.create_task(self._run(jobs))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, jobs):
+        kind = 'batched' if len(jobs) > 1 else 'single'
+        with self._lock:
+            self._stats[kind] += 1
+        try:
+            if len(jobs) > 1:
+                await self._fetch_many(set(jobs))
+            else:
+                await self._fetch_one(next(iter(jobs)))
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            self.log(f"Fetch of {len(jobs)} entities failed: {e}")
+        finally:
+            with self._lock:
+                waiters = [f for eid in jobs for f in self._in_flight.pop(eid, ())]
+                self._busy -= 1
+            for future in waiters:
+                if not future.done():
+                    future.set_result(None)
+            self._drain()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'pending': len(self._pending),
+                    'in_flight': len(self._in_flight), 'busy': self._busy}
+
+    async def shutdown(self):
+        """Cancel running fetches; call on the hub's loop."""
+        self._closed = True
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
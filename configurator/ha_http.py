@@ -0,0 +1,237 @@
+"""Pooled keep-alive HTTP clients for Home Assistant traffic.
+
+Every HA call (the /api/ha proxy, timezone lookup, state hub fetches and
+forwarded service calls) goes through get()/post() here instead of bare
+requests.get/post, which opened a new TCP connection — and TLS handshake for
+a remote HA — per call.  One client is kept per origin (scheme://host:port)
+and shared by all threads:
+
+  - requests.Session with an HTTPAdapter capped at HA_HTTP_POOL_SIZE
+    keep-alive connections (pool_block: callers wait up to
+    HA_HTTP_POOL_TIMEOUT seconds for a free connection rather than opening
+    throwaway ones, then get PoolTimeout);
+  - or, with HA_HTTP2=1 and httpx[http2] installed, an httpx.Client with
+    HTTP/2 multiplexing.  httpx errors are re-raised as
+    requests.exceptions.RequestException so callers handle both alike.
+
+async_get()/async_post() are the coroutine equivalents for code on the
+shared proxy loop (shared_loop): one aiohttp.ClientSession per origin, its
+connector capped at the same pool size.
+
+stats() reports requests vs. connections opened per origin, which shows
+whether connections are actually being reused.
+"""
+import os
+import json
+import asyncio
+import functools
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+POOL_SIZE = int(os.environ.get('HA_HTTP_POOL_SIZE', '10'))
+HTTP2 = os.environ.get('HA_HTTP2', '') == '1'
+DEFAULT_TIMEOUT = 10  # seconds
+POOL_TIMEOUT = float(os.environ.get('HA_HTTP_POOL_TIMEOUT', '5'))
+
+_clients_lock = threading.Lock()
+_clients = {}  # origin -> _Client
+
+
+class AsyncResponse:
+    """The parts of a response the proxy code reads, already fully received."""
+
+    def __init__(self, status_code, text, headers):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class PoolTimeout(requests.exceptions.ConnectionError):
+    """No pooled connection became free within HA_HTTP_POOL_TIMEOUT."""
+
+
+class _BoundedHTTPPool(HTTPConnectionPool):
+    def urlopen(self, *args, pool_timeout=None, **kwargs):
+        return super().urlopen(*args, pool_timeout=POOL_TIMEOUT if pool_timeout is None else pool_timeout,
+                               **kwargs)
+
+
+class _BoundedHTTPSPool(HTTPSConnectionPool):
+    urlopen = _BoundedHTTPPool.urlopen
+
+
+class _BoundedAdapter(HTTPAdapter):
+    """HTTPAdapter whose blocking pool waits at most POOL_TIMEOUT for a connection
+    (requests has no pool_timeout setting; urllib3 would wait forever)."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _BoundedHTTPPool, 'https': _BoundedHTTPSPool}
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class _Client:
+    def __init__(self, origin):
+        self.origin = origin
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'async_requests': 0, 'errors': 0, 'http_versions': {}}
+        self._httpx = None
+        self._aio = None  # aiohttp.ClientSession, created on the shared loop
+        if HTTP2 and httpx is not None:
+            try:
+                self._httpx = httpx.Client(
+                    http2=True, timeout=DEFAULT_TIMEOUT,
+                    limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE))
+            except ImportError:  # http2 extra (h2) missing
+                self._httpx = None
+        if self._httpx is None:
+            self._session = requests.Session()
+            self._adapter = _BoundedAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=True)
+            self._session.mount(origin + '/', self._adapter)
+
+    def _count(self, key, version=None):
+        with self._lock:
+            self._stats[key] += 1
+            if version:
+                versions = self._stats['http_versions']
+                versions[version] = versions.get(version, 0) + 1
+
+    def request(self, method, url, stream=False, **kwargs):
+        """Send a request; with stream=True the body is left unread (see iter_body())."""
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+        if self._httpx is not None:
+            try:
+                if stream:
+                    res = self._httpx.send(self._httpx.build_request(method, url, **kwargs), stream=True)
+                else:
+                    res = self._httpx.request(method, url, **kwargs)
+            except httpx.PoolTimeout as e:
+                self._count('errors')
+                raise PoolTimeout(str(e)) from e
+            except httpx.HTTPError as e:
+                self._count('errors')
+                raise requests.exceptions.ConnectionError(str(e)) from e
+            self._count('requests', res.http_version)
+            return res
+        try:
+            res = self._session.request(method, url, stream=stream, **kwargs)
+        except EmptyPoolError as e:
+            self._count('errors')
+            raise PoolTimeout(f"no free connection to {self.origin} within {POOL_TIMEOUT}s") from e
+        except requests.exceptions.RequestException:
+            self._count('errors')
+            raise
+        self._count('requests', 'HTTP/1.1')
+        return res
+
+    async def request_async(self, method, url, timeout=DEFAULT_TIMEOUT, **kwargs):
+        """request() for the shared loop; returns an AsyncResponse."""
+        if aiohttp is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, functools.partial(self.request, method, url, timeout=timeout, **kwargs))
+        if self._aio is None:
+            self._aio = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=POOL_SIZE))
+        try:
+            async with self._aio.request(method, url, timeout=aiohttp.ClientTimeout(total=timeout),
+                                         **kwargs) as res:
+                text = await res.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._count('errors')
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        self._count('async_requests', f"HTTP/{res.version.major}.{res.version.minor}")
+        return AsyncResponse(res.status, text, dict(res.headers))
+
+    def _connections_opened(self):
+        if self._httpx is not None:
+            return None
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def stats(self):
+        with self._lock:
+            st = {**self._stats, 'http_versions': dict(self._stats['http_versions'])}
+        opened = self._connections_opened()
+        return {
+            'origin': self.origin,
+            'transport': 'httpx-h2' if self._httpx is not None else 'requests',
+            'pool_size': POOL_SIZE,
+            'connections_opened': opened,
+            'connections_reused': None if opened is None else max(0, st['requests'] - opened),
+            **st,
+        }
+
+
+def client(url):
+    """Shared pooled client for *url*'s origin."""
+    origin = _origin(url)
+    with _clients_lock:
+        c = _clients.get(origin)
+        if c is None:
+            c = _clients[origin] = _Client(origin)
+        return c
+
+
+def get(url, **kwargs):
+    return client(url).request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return client(url).request('POST', url, **kwargs)
+
+
+def iter_body(res, chunk_size=64 * 1024):
+    """Yield the (decoded) body of a stream=True response, then release its connection."""
+    try:
+        if hasattr(res, 'iter_content'):
+            yield from res.iter_content(chunk_size)
+        else:
+            yield from res.iter_bytes(chunk_size)
+    finally:
+        res.close()
+
+
+async def async_get(url, **kwargs):
+    return await client(url).request_async('GET', url, **kwargs)
+
+
+async def async_post(url, **kwargs):
+    return await client(url).request_async('POST', url, **kwargs)
+
+
+async def close():
+    """Close the aiohttp sessions (on the loop that created them)."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for c in clients:
+        if c._aio is not None:
+            await c._aio.close()
+            c._aio = None
+
+
+def stats():
+    with _clients_lock:
+        clients = list(_clients.values())
+    return [c.stats() for c in clients]
@@ -0,0 +1,232 @@
+"""Load-test driver for the configurator's Home Assistant paths.
+
+Usually run against ha_simulator.py:
+
+  rest  Hammer a REST endpoint with --concurrency clients for --duration
+        seconds: the simulator directly, or the configurator's /api/ha proxy
+        (--url http://127.0.0.1:8099/api/ha --ha-url http://127.0.0.1:8124).
+  hub   Run --sessions in-process subscribers (what each HAProxy does) on the
+        shared state hub, each watching --entities-per-session entities, and
+        measure change-to-delivery latency from the simulator's
+        sim_changed_at attribute.  --taps-per-second also fires toggle
+        service calls and times them until the new state is delivered.
+
+Both report throughput and p50/p99/max latency.
+
+    python configurator/ha_loadtest.py rest --url http://127.0.0.1:8124 --concurrency 32
+    python configurator/ha_loadtest.py hub --ha-url http://127.0.0.1:8124 --sessions 20 --feed poll
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import aiohttp
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def report(title, count, elapsed, latencies, errors=0, extra=None):
+    ms = lambda v: 'n/a' if v is None else f"{v * 1000:.1f}ms"
+    result = {
+        'count': count,
+        'per_second': round(count / elapsed, 1) if elapsed else None,
+        'errors': errors,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'max': max(latencies) if latencies else None,
+        **(extra or {}),
+    }
+    print(f"{title}: {count} in {elapsed:.1f}s ({result['per_second']}/s), errors {errors}, "
+          f"p50 {ms(result['p50'])}, p99 {ms(result['p99'])}, max {ms(result['max'])}", flush=True)
+    return result
+
+
+async def _entity_ids(http, ha_url, token, limit):
+    headers = {'Authorization': f"Bearer {token}"} if token else {}
+    async with http.get(f"{ha_url.rstrip('/')}/api/states", headers=headers) as res:
+        states = await res.json()
+    return [s['entity_id'] for s in states][:limit]
+
+
+async def run_rest(args):
+    headers = {'Content-Type': 'application/json'}
+    if args.ha_url:
+        # Through the configurator's /api/ha proxy
+        headers['x-ha-url'] = args.ha_url
+        if args.token:
+            headers['x-ha-token'] = args.token
+        api = args.url.rstrip('/')
+    else:
+        if args.token:
+            headers['Authorization'] = f"Bearer {args.token}"
+        api = args.url.rstrip('/') + '/api'
+    latencies, errors = [], 0
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.concurrency)) as http:
+        ids = await _entity_ids(http, args.ha_url or args.url, args.token, args.entities)
+        deadline = time.monotonic() + args.duration
+
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                path = 'states' if random.random() < args.list_ratio else f"states/{random.choice(ids)}"
+                start = time.monotonic()
+                try:
+                    async with http.get(f"{api}/{path}", headers=headers,
+                                        timeout=aiohttp.ClientTimeout(total=30)) as res:
+                        await res.read()
+                        if res.status != 200:
+                            errors += 1
+                            continue
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                latencies.append(time.monotonic() - start)
+
+        start = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        return report('rest', len(latencies), time.monotonic() - start, latencies, errors)
+
+
+class _Subscriber:
+    """Stands in for one session's HAProxy on the hub."""
+
+    def __init__(self, latencies):
+        self.latencies = latencies
+        self.seen = {}  # entity_id -> sim_changed_at last delivered
+
+    def is_paused(self):
+        return False
+
+    def deliver_state(self, entity_id, state, attributes):
+        changed_at = (attributes or {}).get('sim_changed_at')
+        previous = self.seen.get(entity_id)
+        self.seen[entity_id] = changed_at
+        # Only new changes count; the first delivery and unchanged refetches don't.
+        if changed_at and previous is not None and changed_at != previous:
+            self.latencies.append(max(0.0, time.time() - changed_at))
+
+
+def run_hub(args):
+    os.environ['HA_STATE_FEED'] = args.feed
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import api_proxy
+    import ha_http
+    import ha_state_hub
+    import shared_loop
+
+    async def setup():
+        async with aiohttp.ClientSession() as http:
+            return await _entity_ids(http, args.ha_url, args.token, args.entities)
+
+    ids = shared_loop.submit(setup()).result()
+    hub = ha_state_hub.acquire(args.ha_url, args.token)
+    deliveries = []
+    subscribers = []
+    for _ in range(args.sessions):
+        sub = _Subscriber(deliveries)
+        subscribers.append(sub)
+        for eid in random.sample(ids, min(args.entities_per_session, len(ids))):
+            hub.subscribe(sub, eid)
+    time.sleep(args.warmup)
+    deliveries.clear()
+
+    tap_latencies, tap_errors = [], 0
+    # Taps are confirmed exactly like a session's service calls.
+    proxy = api_proxy.HAProxy('loadtest', 0, args.ha_url, args.token, None)
+    proxy.hub = hub
+
+    async def taps():
+        nonlocal tap_errors
+        if args.taps_per_second <= 0:
+            return
+        watched = [eid for eid in hub.cache if eid.split('.', 1)[0] in ('light', 'switch')]
+        headers = {'Authorization': f"Bearer {args.token}"} if args.token else {}
+        deadline = time.monotonic() + args.duration
+        pending = set()
+
+        async def tap(eid):
+            nonlocal tap_errors
+            watches = hub.watch([eid])
+            start = time.monotonic()
+            try:
+                domain = eid.split('.', 1)[0]
+                res = await ha_http.async_post(f"{args.ha_url.rstrip('/')}/api/services/{domain}/toggle",
+                                               headers=headers, json={'entity_id': eid})
+                if res.status_code != 200:
+                    tap_errors += 1
+                    return
+                await proxy._confirm_states(watches, start)
+                if watches[eid].done():
+                    tap_latencies.append(time.monotonic() - start)
+                else:
+                    tap_errors += 1
+            except Exception:
+                tap_errors += 1
+            finally:
+                hub.unwatch(watches)
+
+        while watched and time.monotonic() < deadline:
+            pending.add(asyncio.ensure_future(tap(random.choice(watched))))
+            await asyncio.sleep(1 / args.taps_per_second)
+        if pending:
+            await asyncio.wait(pending)
+        await ha_http.close()
+
+    start = time.monotonic()
+    tap_future = shared_loop.submit(taps())
+    time.sleep(args.duration)
+    tap_future.result()
+    elapsed = time.monotonic() - start
+    results = {'deliveries': report('hub deliveries', len(deliveries), elapsed, list(deliveries),
+                                    extra={'hub': ha_state_hub.stats()})}
+    if args.taps_per_second > 0:
+        results['taps'] = report('tap-to-state', len(tap_latencies), elapsed, tap_latencies, tap_errors,
+                                 extra=api_proxy.confirm_stats())
+    print(json.dumps({'hub': ha_state_hub.stats(), 'http': ha_http.stats()}, indent=2), flush=True)
+    for sub in subscribers:
+        hub.unsubscribe_all(sub)
+    ha_state_hub.release(hub)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    sub = parser.add_subparsers(dest='mode', required=True)
+
+    rest = sub.add_parser('rest', help='REST throughput/latency')
+    rest.add_argument('--url', default='http://127.0.0.1:8124',
+                      help='simulator base URL, or the configurator /api/ha URL together with --ha-url')
+    rest.add_argument('--ha-url', default='', help='HA URL passed to the configurator proxy as x-ha-url')
+    rest.add_argument('--concurrency', type=int, default=16)
+    rest.add_argument('--list-ratio', type=float, default=0.05, help='fraction of requests for the full /states list')
+
+    hub = sub.add_parser('hub', help='state hub fan-out latency')
+    hub.add_argument('--ha-url', default='http://127.0.0.1:8124')
+    hub.add_argument('--feed', choices=('websocket', 'poll'), default='websocket')
+    hub.add_argument('--sessions', type=int, default=10)
+    hub.add_argument('--entities-per-session', type=int, default=80)
+    hub.add_argument('--taps-per-second', type=float, default=0)
+    hub.add_argument('--warmup', type=float, default=3, help='seconds before measuring')
+
+    for p in (rest, hub):
+        p.add_argument('--token', default='sim', help='HA token (the simulator accepts any by default)')
+        p.add_argument('--entities', type=int, default=1000, help='entity pool to draw from')
+        p.add_argument('--duration', type=float, default=10)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.mode == 'rest':
+        asyncio.run(run_rest(args))
+    else:
+        run_hub(args)
@@ -0,0 +1,212 @@
+"""Short-TTL response cache and state filtering for the /api/ha proxy.
+
+Every tab asks the proxy for /api/ha/states when it loads and on each
+"refresh entities"; with a few thousand entities that is a multi-megabyte
+document fetched from Home Assistant and sent to the browser in full, though
+the editor only reads each entity's id and friendly name.
+
+  - Cache: successful GET bodies are kept for HA_PROXY_CACHE_TTL seconds,
+    keyed by (url, query, filter, token).  The token is only stored as a
+    hash, and two users of the same HA with different tokens never share
+    entries.  Every cached body carries a strong ETag, so a browser
+    revalidating with If-None-Match gets a 304 with no body.  Bodies over
+    HA_PROXY_CACHE_MAX_BODY_KB are never cached, and the cache as a whole is
+    capped at HA_PROXY_CACHE_MAX_ENTRIES (least recently used entries go
+    first).  A POST through the proxy (a service call) drops every entry for
+    that HA and token, since the states it changes may be cached.
+
+  - Filter: ``domain=light,switch``, ``prefix=light.kitchen`` and
+    ``fields=friendly_name,unit_of_measurement`` on a states request are
+    applied here instead of being forwarded.  They select entities by domain
+    or entity_id prefix and keep only the listed attributes (entity_id and
+    state are always kept).
+
+Large unfiltered bodies are streamed to the browser as they arrive instead of
+being read into memory first (server.py, proxy_ha); stream_and_store() tees
+such a stream into the cache when it turns out small enough.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+import collections
+
+TTL = float(os.environ.get('HA_PROXY_CACHE_TTL', '2'))  # seconds; 0 disables caching
+MAX_ENTRIES = int(os.environ.get('HA_PROXY_CACHE_MAX_ENTRIES', '64'))
+MAX_BODY_BYTES = int(os.environ.get('HA_PROXY_CACHE_MAX_BODY_KB', '16384')) * 1024
+STREAM_MIN_BYTES = int(os.environ.get('HA_PROXY_STREAM_MIN_KB', '256')) * 1024
+FILTER_PARAMS = ('domain', 'prefix', 'fields')
+
+_lock = threading.Lock()
+_entries = collections.OrderedDict()  # key -> Entry, least recently used first
+_stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'stores': 0, 'evictions': 0,
+          'invalidations': 0, 'streamed': 0, 'filtered': 0, 'filtered_bytes_saved': 0}
+
+
+class Entry:
+    def __init__(self, status, body, content_type):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.stored_at = time.monotonic()
+
+    def fresh(self):
+        return time.monotonic() - self.stored_at < TTL
+
+
+def _count(key, n=1):
+    with _lock:
+        _stats[key] += n
+
+
+def _token_hash(token):
+    return hashlib.sha256((token or '').encode()).hexdigest()[:16]
+
+
+def make_key(api_base, path, params, token, filters):
+    """Cache key for a GET of *path* under *api_base* (…/api)."""
+    query = tuple(sorted((k, v) for k, v in params))
+    filt = tuple(sorted((k, v) for k, v in filters.items() if v))
+    return (api_base, _token_hash(token), path, query, filt)
+
+
+def lookup(key):
+    """The fresh entry for *key*, or None."""
+    if TTL <= 0:
+        return None
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry.fresh():
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+            return entry
+        if entry is not None:
+            del _entries[key]
+        _stats['misses'] += 1
+        return None
+
+
+def store(key, status, body, content_type):
+    """Build the Entry for a response body, caching it if it qualifies."""
+    entry = Entry(status, body, content_type)
+    if TTL <= 0 or status != 200 or len(body) > MAX_BODY_BYTES:
+        return entry
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        _stats['stores'] += 1
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats['evictions'] += 1
+    return entry
+
+
+def stream_and_store(key, status, chunks, content_type):
+    """Yield *chunks* through unchanged, caching the body if it completes small enough."""
+    _count('streamed')
+    kept, size = [], 0
+    for chunk in chunks:
+        if kept is not None:
+            size += len(chunk)
+            if size <= MAX_BODY_BYTES:
+                kept.append(chunk)
+            else:
+                kept = None
+        yield chunk
+    if kept is not None:
+        store(key, status, b''.join(kept), content_type)
+
+
+def invalidate(api_base, token):
+    """Drop every entry for one Home Assistant and token."""
+    th = _token_hash(token)
+    with _lock:
+        stale = [k for k in _entries if k[0] == api_base and k[1] == th]
+        for k in stale:
+            del _entries[k]
+        if stale:
+            _stats['invalidations'] += 1
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value covers *etag*."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+# ---- filtering ---------------------------------------------------------
+
+def split_filters(path, args):
+    """Separate the proxy's own filter params from those forwarded to HA.
+
+    Only states requests are filtered; for any other path every param is
+    forwarded untouched.  Returns (forwarded [(k, v)], {name: [values]}).
+    """
+    items = list(args.items(multi=True)) if hasattr(args, 'items') else list(args)
+    if path != 'states' and not path.startswith('states/'):
+        return items, {}
+    forwarded, filters = [], {}
+    for k, v in items:
+        if k in FILTER_PARAMS:
+            values = [p.strip() for p in v.split(',') if p.strip()]
+            filters.setdefault(k, []).extend(values)
+        else:
+            forwarded.append((k, v))
+    return forwarded, {k: ','.join(v) for k, v in filters.items() if v}
+
+
+def _keep(state, domains, prefixes):
+    eid = state.get('entity_id', '')
+    if domains and eid.split('.', 1)[0] not in domains:
+        return False
+    return not prefixes or eid.startswith(prefixes)
+
+
+def _slim(state, fields):
+    if fields is None or not isinstance(state, dict):
+        return state
+    attrs = state.get('attributes') or {}
+    return {'entity_id': state.get('entity_id'), 'state': state.get('state'),
+            'attributes': {k: attrs[k] for k in fields if k in attrs}}
+
+
+def apply_filters(body, filters):
+    """Filter a states body (a list, or one state) as requested; returns bytes.
+
+    A body that is not JSON is returned as is.
+    """
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    domains = set(filters['domain'].split(',')) if filters.get('domain') else None
+    prefixes = tuple(filters['prefix'].split(',')) if filters.get('prefix') else None
+    fields = filters['fields'].split(',') if filters.get('fields') else None
+    if isinstance(data, list):
+        data = [_slim(s, fields) for s in data if isinstance(s, dict) and _keep(s, domains, prefixes)]
+    else:
+        data = _slim(data, fields)
+    out = json.dumps(data, separators=(',', ':')).encode()
+    with _lock:
+        _stats['filtered'] += 1
+        _stats['filtered_bytes_saved'] += max(0, len(body) - len(out))
+    return out
+
+
+def stats():
+    with _lock:
+        st = dict(_stats)
+        st['entries'] = len(_entries)
+        st['bytes'] = sum(len(e.body) for e in _entries.values())
+    lookups = st['hits'] + st['misses']
+    st['hit_ratio'] = round(st['hits'] / lookups, 3) if lookups else 0.0
+    st['ttl'] = TTL
+    return st
+
+
+def record_not_modified():
+    _count('not_modified')
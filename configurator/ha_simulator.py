@@ -0,0 +1,264 @@
+"""Local Home Assistant stand-in for load and latency testing.
+
+Serves the parts of the Home Assistant API the configurator uses:
+
+  GET  /api/config                       time_zone / version
+  GET  /api/states, /api/states/<id>     generated entities
+  POST /api/services/<domain>/<service>  turn_on / turn_off / toggle / set_value
+  GET  /api/websocket                    auth, subscribe_entities, subscribe_events
+  GET  /sim/stats                        request counters (not part of HA)
+
+Entities are generated per domain (light.sim_0000, sensor.sim_0001, ...) and a
+background task changes random ones at --change-rate per second, pushing
+each change to websocket subscribers.  Every state carries a
+``sim_changed_at`` attribute (epoch seconds) so clients can measure
+change-to-delivery latency.  --latency-ms/--jitter-ms delay every REST
+response and --error-rate answers that fraction of REST requests with 500.
+
+    python configurator/ha_simulator.py --entities 5000 --change-rate 50 --port 8124
+
+then point the configurator (x-ha-url / "Remote HA URL") or ha_loadtest.py
+at http://127.0.0.1:8124 with any token (or the one given by --token).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from aiohttp import web
+
+DOMAINS = ('light', 'switch', 'sensor', 'binary_sensor', 'climate', 'cover', 'media_player')
+
+
+def make_entities(count):
+    entities = {}
+    for i in range(count):
+        domain = DOMAINS[i % len(DOMAINS)]
+        eid = f"{domain}.sim_{i:04d}"
+        attributes = {'friendly_name': f"Sim {domain.replace('_', ' ')} {i}"}
+        if domain == 'sensor':
+            state = f"{random.uniform(15, 30):.1f}"
+            attributes['unit_of_measurement'] = '°C'
+        elif domain == 'light':
+            state = random.choice(('on', 'off'))
+            attributes['brightness'] = random.randint(0, 255)
+        elif domain == 'climate':
+            state = random.choice(('heat', 'cool', 'off'))
+            attributes['temperature'] = 21
+        elif domain == 'cover':
+            state = random.choice(('open', 'closed'))
+        elif domain == 'media_player':
+            state = random.choice(('playing', 'paused', 'off'))
+        else:
+            state = random.choice(('on', 'off'))
+        attributes['sim_changed_at'] = time.time()
+        entities[eid] = {'entity_id': eid, 'state': state, 'attributes': attributes,
+                         'last_changed': '', 'last_updated': ''}
+    return entities
+
+
+class Simulator:
+    def __init__(self, args):
+        self.args = args
+        self.entities = make_entities(args.entities)
+        self.subscribers = set()  # (ws, msg_id, entity_ids or None, compressed)
+        self.stats = {'rest_requests': 0, 'rest_errors': 0, 'service_calls': 0,
+                      'state_changes': 0, 'ws_clients': 0, 'ws_messages': 0}
+
+    # ---- state changes -------------------------------------------------
+
+    def _next_state(self, entity, service=None):
+        domain = entity['entity_id'].split('.', 1)[0]
+        state = entity['state']
+        if service == 'turn_on':
+            return 'on'
+        if service == 'turn_off':
+            return 'off'
+        if domain == 'sensor':
+            return f"{float(state) + random.uniform(-0.5, 0.5):.1f}"
+        flips = {'on': 'off', 'off': 'on', 'open': 'closed', 'closed': 'open',
+                 'playing': 'paused', 'paused': 'playing', 'heat': 'off', 'cool': 'off'}
+        return flips.get(state, 'on')
+
+    async def change(self, eid, state=None, attributes=None):
+        entity = self.entities[eid]
+        old = {'state': entity['state'], 'attributes': dict(entity['attributes'])}
+        entity['state'] = state if state is not None else self._next_state(entity)
+        entity['attributes'].update(attributes or {})
+        entity['attributes']['sim_changed_at'] = time.time()
+        self.stats['state_changes'] += 1
+        await self._broadcast(eid, old, entity)
+
+    async def _broadcast(self, eid, old, entity):
+        for ws, msg_id, entity_ids, compressed in list(self.subscribers):
+            if entity_ids is not None and eid not in entity_ids:
+                continue
+            if compressed:
+                event = {'c': {eid: {'+': {'s': entity['state'], 'a': dict(entity['attributes'])}}}}
+            else:
+                event = {'event_type': 'state_changed',
+                         'data': {'entity_id': eid, 'old_state': {'entity_id': eid, **old},
+                                  'new_state': dict(entity)}}
+            try:
+                await ws.send_str(json.dumps({'id': msg_id, 'type': 'event', 'event': event}))
+                self.stats['ws_messages'] += 1
+            except ConnectionResetError:
+                self.subscribers.discard((ws, msg_id, entity_ids, compressed))
+
+    async def churn(self):
+        if self.args.change_rate <= 0:
+            return
+        interval = 1.0 / self.args.change_rate
+        ids = list(self.entities)
+        while True:
+            await asyncio.sleep(interval)
+            await self.change(random.choice(ids))
+
+    # ---- REST ----------------------------------------------------------
+
+    @web.middleware
+    async def rest_middleware(self, request, handler):
+        if not request.path.startswith('/api/') or request.path == '/api/websocket':
+            return await handler(request)
+        self.stats['rest_requests'] += 1
+        if self.args.token and request.headers.get('Authorization') != f"Bearer {self.args.token}":
+            return web.json_response({'message': 'Unauthorized'}, status=401)
+        delay = self.args.latency_ms + random.uniform(0, self.args.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if random.random() < self.args.error_rate:
+            self.stats['rest_errors'] += 1
+            return web.json_response({'message': 'Simulated error'}, status=500)
+        return await handler(request)
+
+    async def config(self, request):
+        return web.json_response({'time_zone': 'UTC', 'version': '2024.1.0-sim', 'location_name': 'Simulator'})
+
+    async def states(self, request):
+        return web.json_response(list(self.entities.values()))
+
+    async def state(self, request):
+        entity = self.entities.get(request.match_info['entity_id'])
+        if entity is None:
+            return web.json_response({'message': 'Entity not found.'}, status=404)
+        return web.json_response(entity)
+
+    async def service(self, request):
+        self.stats['service_calls'] += 1
+        service = request.match_info['service']
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            data = {}
+        entity_ids = data.get('entity_id') or []
+        if isinstance(entity_ids, str):
+            entity_ids = [e.strip() for e in entity_ids.split(',')]
+        entity_ids = [e for e in entity_ids if e in self.entities]
+
+        async def apply():
+            if self.args.service_delay_ms:
+                await asyncio.sleep(self.args.service_delay_ms / 1000)
+            for eid in entity_ids:
+                if service == 'set_value' and 'value' in data:
+                    await self.change(eid, str(data['value']))
+                elif service in ('turn_on', 'turn_off'):
+                    await self.change(eid, service[len('turn_'):])
+                else:
+                    await self.change(eid)
+
+        # Like HA, the state change may land after the service call returns.
+        asyncio.get_running_loop().create_task(apply())
+        return web.json_response([])
+
+    async def sim_stats(self, request):
+        return web.json_response({**self.stats, 'entities': len(self.entities),
+                                  'ws_subscriptions': len(self.subscribers)})
+
+    # ---- websocket -----------------------------------------------------
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self.stats['ws_clients'] += 1
+        mine = set()
+        try:
+            await ws.send_json({'type': 'auth_required', 'ha_version': '2024.1.0-sim'})
+            auth = await ws.receive_json()
+            if self.args.token and auth.get('access_token') != self.args.token:
+                await ws.send_json({'type': 'auth_invalid', 'message': 'Invalid access token'})
+                return ws
+            await ws.send_json({'type': 'auth_ok', 'ha_version': '2024.1.0-sim'})
+            async for msg in ws:
+                if msg.type != web.WSMsgType.TEXT:
+                    break
+                cmd = json.loads(msg.data)
+                msg_id, kind = cmd.get('id'), cmd.get('type')
+                if kind == 'subscribe_entities' and not self.args.legacy_ws:
+                    ids = frozenset(cmd.get('entity_ids') or self.entities)
+                    sub = (ws, msg_id, ids, True)
+                    await ws.send_json({'id': msg_id, 'type': 'result', 'success': True, 'result': None})
+                    added = {eid: {'s': self.entities[eid]['state'], 'a': self.entities[eid]['attributes']}
+                             for eid in ids if eid in self.entities}
+                    await ws.send_json({'id': msg_id, 'type': 'event', 'event': {'a': added}})
+                elif kind == 'subscribe_events' and cmd.get('event_type') in (None, 'state_changed'):
+                    sub = (ws, msg_id, None, False)
+                    await ws.send_json({'id': msg_id, 'type': 'result', 'success': True, 'result': None})
+                elif kind == 'ping':
+                    await ws.send_json({'id': msg_id, 'type': 'pong'})
+                    continue
+                else:
+                    await ws.send_json({'id': msg_id, 'type': 'result', 'success': False,
+                                        'error': {'code': 'unknown_command', 'message': 'Unknown command.'}})
+                    continue
+                mine.add(sub)
+                self.subscribers.add(sub)
+        finally:
+            self.subscribers -= mine
+        return ws
+
+    def app(self):
+        app = web.Application(middlewares=[self.rest_middleware])
+        app.router.add_get('/api/config', self.config)
+        app.router.add_get('/api/states', self.states)
+        app.router.add_get('/api/states/{entity_id}', self.state)
+        app.router.add_post('/api/services/{domain}/{service}', self.service)
+        app.router.add_get('/api/websocket', self.websocket)
+        app.router.add_get('/sim/stats', self.sim_stats)
+
+        async def start_churn(app):
+            app['churn'] = asyncio.create_task(self.churn())
+
+        async def stop_churn(app):
+            app['churn'].cancel()
+
+        app.on_startup.append(start_churn)
+        app.on_cleanup.append(stop_churn)
+        return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8124)
+    parser.add_argument('--entities', type=int, default=1000, help='number of generated entities')
+    parser.add_argument('--change-rate', type=float, default=10, help='random state changes per second')
+    parser.add_argument('--latency-ms', type=float, default=0, help='delay added to every REST response')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='random extra REST delay, 0..jitter')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of REST requests answered with 500')
+    parser.add_argument('--service-delay-ms', type=float, default=50,
+                        help='time between a service call and its state change')
+    parser.add_argument('--token', default='', help='require this token (default: accept any)')
+    parser.add_argument('--legacy-ws', action='store_true',
+                        help='reject subscribe_entities like pre-2022.4 Home Assistant')
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    random.seed(args.seed)
+    sim = Simulator(args)
+    print(f"HA simulator: {len(sim.entities)} entities, {args.change_rate} changes/s, "
+          f"{args.latency_ms}ms latency, {args.error_rate:.1%} errors on http://{args.host}:{args.port}", flush=True)
+    web.run_app(sim.app(), host=args.host, port=args.port, print=None)
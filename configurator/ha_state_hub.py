@@ -0,0 +1,259 @@
+"""Process-wide Home Assistant state hub shared by all emulator sessions.
+
+One HAStateHub exists per (ha_url, token).  It owns the only upstream feed
+for that Home Assistant — the websocket subscription (ha_websocket) with a
+5 s REST poller as fallback — keeps the latest state and attributes of every
+entity any session displays, and fans each change out to the sessions
+subscribed to that entity.  A session subscribing to an entity the hub
+already knows gets the cached value immediately.  Every state received also
+refreshes that entity in the picker search index (entity_index).
+
+Hubs run as tasks on the shared proxy loop (shared_loop) and are reference
+counted: acquire() when an HAProxy starts, release() when it stops; the hub
+shuts down with its last subscriber.
+
+Subscribers implement ``deliver_state(entity_id, state, attributes)``
+(called from the shared loop, or from the subscribing thread for a cached state)
+and ``is_paused()``; entities whose subscribers are all paused are not
+polled.
+"""
+import os
+import time
+import asyncio
+import threading
+import requests
+
+import ha_http
+import entity_index
+import shared_loop
+from ha_fetch import FetchScheduler
+from ha_websocket import HAStateFeed, websocket_url
+
+# 'websocket': push state changes over the HA websocket API, polling REST
+# only while it is down.  'poll': REST polling every 5s only.
+STATE_FEED_MODE = os.environ.get('HA_STATE_FEED', 'websocket')
+POLL_INTERVAL = 5  # seconds
+REFRESH_TIMEOUT = 10  # seconds refresh() waits for its fetch
+
+_hubs_lock = threading.Lock()
+_hubs = {}  # (base_url, token) -> HAStateHub
+
+
+class HAStateHub:
+    def __init__(self, base_url, token):
+        self.base_url = base_url
+        self.token = token
+        self.refs = 0
+        self.cache = {}  # entity_id -> (state, attributes)
+        self._subs = {}  # entity_id -> set of subscribers
+        self._watchers = {}  # entity_id -> [(state at watch time, asyncio.Future)]
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._loop = None
+        self.fetcher = None
+        self.feed = None
+        if STATE_FEED_MODE == 'websocket':
+            self.feed = HAStateFeed(websocket_url(base_url), token, self._update, self.log,
+                                    on_resync=self._resync)
+
+    def log(self, message):
+        print(f"HA HUB [{self.base_url}]: {message}", flush=True)
+
+    # ---- subscriptions -------------------------------------------------
+
+    def subscribe(self, subscriber, entity_id):
+        """Subscribe to *entity_id*; delivers the cached state right away if known."""
+        with self._lock:
+            is_new = entity_id not in self._subs
+            self._subs.setdefault(entity_id, set()).add(subscriber)
+            cached = self.cache.get(entity_id)
+        if cached is not None:
+            subscriber.deliver_state(entity_id, *cached)
+            return
+        if not is_new:
+            return  # first fetch already on its way
+        if self.feed and self.feed.connected and self.feed.compressed:
+            # The subscription's initial snapshot delivers the state.
+            self._loop.call_soon_threadsafe(self.feed.add_entities, [entity_id])
+        else:
+            if self.feed:
+                self._loop.call_soon_threadsafe(self.feed.add_entities, [entity_id])
+            self.fetcher.request(entity_id)
+
+    def unsubscribe_all(self, subscriber):
+        with self._lock:
+            for eid in list(self._subs):
+                subs = self._subs[eid]
+                subs.discard(subscriber)
+                if not subs:
+                    del self._subs[eid]
+
+    def cached(self, entity_id):
+        with self._lock:
+            return self.cache.get(entity_id)
+
+    async def refresh(self, entity_id):
+        """Fetch *entity_id* over REST now and fan the result out. Runs on the shared loop."""
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(self.fetcher.request(entity_id, fresh=True)),
+                                   REFRESH_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.log(f"Refresh of {entity_id} timed out")
+
+    def watch(self, entity_ids):
+        """{entity_id: Future} resolved (with time.monotonic()) once each state differs
+        from its current value.  Call on the shared loop; unwatch() when done."""
+        futures = {}
+        with self._lock:
+            for eid in entity_ids:
+                future = self._loop.create_future()
+                self._watchers.setdefault(eid, []).append((self.cache.get(eid), future))
+                futures[eid] = future
+        return futures
+
+    def unwatch(self, futures):
+        with self._lock:
+            for eid, future in futures.items():
+                watchers = [w for w in self._watchers.get(eid, ()) if w[1] is not future]
+                if watchers:
+                    self._watchers[eid] = watchers
+                else:
+                    self._watchers.pop(eid, None)
+
+    # ---- upstream ------------------------------------------------------
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    async def _fetch(self, entity_id):
+        try:
+            res = await ha_http.async_get(f"{self.base_url}/api/states/{entity_id}",
+                                          headers=self._headers(), timeout=5)
+        except requests.exceptions.RequestException:
+            return
+        if res.status_code == 200:
+            data = res.json()
+            self._update(entity_id, data.get("state", ""), data.get("attributes") or {})
+        else:
+            self.log(f"Failed to fetch state {entity_id}: {res.status_code}")
+
+    async def _fetch_many(self, entity_ids):
+        """One GET /api/states for a batch of entities."""
+        try:
+            res = await ha_http.async_get(f"{self.base_url}/api/states", headers=self._headers(), timeout=10)
+        except requests.exceptions.RequestException:
+            return
+        if res.status_code != 200:
+            self.log(f"Failed to fetch states: {res.status_code}")
+            return
+        for data in res.json():
+            if data.get("entity_id") in entity_ids:
+                self._update(data["entity_id"], data.get("state", ""), data.get("attributes") or {})
+
+    def _update(self, entity_id, state, attributes):
+        value = (state, attributes)
+        with self._lock:
+            self.cache[entity_id] = value
+            subscribers = list(self._subs.get(entity_id, ()))
+            fired = []
+            if entity_id in self._watchers:
+                waiting = []
+                for before, future in self._watchers.pop(entity_id):
+                    (fired if before != value else waiting).append((before, future))
+                if waiting:
+                    self._watchers[entity_id] = waiting
+        entity_index.note_state(self.base_url, self.token, entity_id, attributes)
+        for subscriber in subscribers:
+            try:
+                subscriber.deliver_state(entity_id, state, attributes)
+            except Exception as e:
+                self.log(f"Error delivering {entity_id}: {e}")
+        # Resolved after the fan-out was scheduled, so a watcher wakes once
+        # the new state is already on its way to the emulators.
+        now = time.monotonic()
+        for _, future in fired:
+            self._loop.call_soon_threadsafe(_resolve, future, now)
+
+    def _polled_entities(self):
+        with self._lock:
+            return [eid for eid, subscribers in self._subs.items()
+                    if any(not s.is_paused() for s in subscribers)]
+
+    def _resync(self):
+        """The feed went live without an initial snapshot: fetch everything once over REST."""
+        for eid in self._polled_entities():
+            self.fetcher.request(eid)
+
+    async def _poll(self):
+        while not self._stopped.is_set():
+            if not (self.feed and self.feed.connected):
+                for eid in self._polled_entities():
+                    self.fetcher.request(eid)
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _main(self):
+        tasks = [asyncio.create_task(self._poll())]
+        if self.feed and self.feed.available:
+            tasks.append(asyncio.create_task(self.feed.run(lambda: not self._stopped.is_set())))
+        else:
+            self.log(f"HA websocket feed disabled, polling REST every {POLL_INTERVAL}s")
+        try:
+            while not self._stopped.is_set():
+                await asyncio.sleep(1)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.fetcher.shutdown()
+            self.log("Stopped")
+
+    def start(self):
+        self._loop = shared_loop.get_loop()
+        self.fetcher = FetchScheduler(self._loop, self._fetch, self._fetch_many, self.log)
+        shared_loop.submit(self._main())
+        self.log("Started")
+
+    def stop(self):
+        self._stopped.set()
+
+
+def _resolve(future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+def acquire(base_url, token):
+    """Return the running hub for (base_url, token), starting it if needed."""
+    key = (base_url.rstrip('/'), token or '')
+    with _hubs_lock:
+        hub = _hubs.get(key)
+        if hub is None:
+            hub = _hubs[key] = HAStateHub(*key)
+            hub.start()
+        hub.refs += 1
+        return hub
+
+
+def release(hub):
+    with _hubs_lock:
+        hub.refs -= 1
+        if hub.refs <= 0:
+            _hubs.pop((hub.base_url, hub.token), None)
+            hub.stop()
+
+
+def stats():
+    """Per-hub subscriber and cache counts."""
+    with _hubs_lock:
+        hubs = list(_hubs.values())
+    return [{
+        'base_url': hub.base_url,
+        'sessions': hub.refs,
+        'entities': len(hub._subs),
+        'cached': len(hub.cache),
+        'websocket': bool(hub.feed and hub.feed.connected),
+        'fetch': hub.fetcher.stats(),
+    } for hub in hubs]
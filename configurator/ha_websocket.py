@@ -0,0 +1,211 @@
+"""Push-based Home Assistant state feed over the websocket API.
+
+HAStateFeed keeps one websocket to Home Assistant and subscribes to the
+entities an emulator displays.  It prefers ``subscribe_entities`` (compressed
+add/change/remove diffs, filtered server-side) and falls back to
+``subscribe_events`` for ``state_changed`` on Home Assistant versions that do
+not know the command.  Every change is handed to ``on_state(entity_id,
+state, attributes)`` on the event loop the feed runs in.
+
+``connected`` is True only while the subscription is live; callers keep
+their REST polling for the time it is False (connection lost, auth failure,
+aiohttp missing) so the feed is an accelerator, never a dependency.
+
+Only ``subscribe_entities`` sends an initial snapshot.  ``compressed`` is
+False while the feed uses ``state_changed`` events instead; callers then
+fetch new entities over REST themselves, and ``on_resync()`` is called each
+time the feed falls back so they can refetch what changed while it was down.
+"""
+import asyncio
+import json
+
+try:
+    import aiohttp
+except ImportError:  # REST polling only
+    aiohttp = None
+
+RECONNECT_MIN = 5  # seconds
+RECONNECT_MAX = 60
+SUBSCRIBE_DEBOUNCE = 0.2  # coalesce the burst of subscriptions a device sends at boot
+
+
+def websocket_url(base_url):
+    """ws(s):// URL of the websocket API for an http(s):// HA base URL.
+
+    The Supervisor proxy (http://supervisor/core) serves it at /websocket,
+    a direct Home Assistant at /api/websocket.
+    """
+    base = base_url.rstrip('/')
+    if base.startswith('https://'):
+        base = 'wss://' + base[len('https://'):]
+    elif base.startswith('http://'):
+        base = 'ws://' + base[len('http://'):]
+    if base.endswith('://supervisor/core'):
+        return base + '/websocket'
+    return base + '/api/websocket'
+
+
+def attribute_value(state, attributes, attribute):
+    """Value sent to the device for an (entity, attribute) subscription."""
+    if not attribute:
+        return state
+    val = (attributes or {}).get(attribute, "")
+    return str(val) if val is not None else ""
+
+
+class HAAuthError(Exception):
+    pass
+
+
+class HAStateFeed:
+    def __init__(self, url, token, on_state, log, on_resync=None):
+        self.url = url
+        self.token = token
+        self.on_state = on_state
+        self.log = log
+        self.on_resync = on_resync
+        self.connected = False
+        self.entities = set()  # entity_ids requested by the device
+        self.states = {}  # entity_id -> (state, attributes), as last pushed
+        self._ws = None
+        self._next_id = 1
+        self._subscribed = set()
+        self._subscribe_ids = set()  # message ids of our subscribe_entities commands
+        self._compressed = True  # subscribe_entities supported
+        self._flush_task = None
+
+    @property
+    def available(self):
+        return aiohttp is not None and bool(self.token)
+
+    @property
+    def compressed(self):
+        """True while changes arrive as subscribe_entities diffs (with an initial snapshot)."""
+        return self._compressed
+
+    def add_entities(self, entity_ids):
+        """Track more entities; subscribes them on the live connection."""
+        new = set(entity_ids) - self.entities
+        if not new:
+            return
+        self.entities |= new
+        if self.connected and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(SUBSCRIBE_DEBOUNCE)
+        try:
+            await self._subscribe(self.entities - self._subscribed)
+        except Exception as e:
+            self.log(f"HA websocket subscribe failed: {e}")
+
+    async def _send(self, payload):
+        msg_id = self._next_id
+        self._next_id += 1
+        await self._ws.send_str(json.dumps({'id': msg_id, **payload}))
+        return msg_id
+
+    async def _subscribe(self, entity_ids):
+        if not entity_ids or not self._compressed:
+            return
+        entity_ids = sorted(entity_ids)
+        self._subscribed |= set(entity_ids)
+        self._subscribe_ids.add(await self._send({'type': 'subscribe_entities', 'entity_ids': entity_ids}))
+
+    def _emit(self, entity_id, state, attributes):
+        self.states[entity_id] = (state, attributes)
+        try:
+            self.on_state(entity_id, state, attributes)
+        except Exception as e:
+            self.log(f"Error delivering pushed state {entity_id}: {e}")
+
+    def _handle_compressed(self, event):
+        for eid, full in (event.get('a') or {}).items():
+            self._emit(eid, full.get('s', ''), dict(full.get('a') or {}))
+        for eid, diff in (event.get('c') or {}).items():
+            state, attributes = self.states.get(eid, ('', {}))
+            attributes = dict(attributes)
+            added = diff.get('+') or {}
+            removed = diff.get('-') or {}
+            state = added.get('s', state)
+            attributes.update(added.get('a') or {})
+            for name in removed.get('a') or []:
+                attributes.pop(name, None)
+            self._emit(eid, state, attributes)
+        for eid in event.get('r') or []:
+            self._emit(eid, 'unavailable', {})
+
+    def _handle_state_changed(self, event):
+        data = event.get('data') or {}
+        eid = data.get('entity_id')
+        if eid not in self.entities:
+            return
+        new_state = data.get('new_state')
+        if new_state is None:
+            self._emit(eid, 'unavailable', {})
+        else:
+            self._emit(eid, new_state.get('state', ''), dict(new_state.get('attributes') or {}))
+
+    async def _session(self, http):
+        async with http.ws_connect(self.url, heartbeat=30) as ws:
+            self._ws = ws
+            self._next_id = 1
+            self._subscribed = set()
+            self._subscribe_ids = set()
+            self._compressed = True
+            msg = await ws.receive_json()
+            if msg.get('type') == 'auth_required':
+                await ws.send_str(json.dumps({'type': 'auth', 'access_token': self.token}))
+                msg = await ws.receive_json()
+            if msg.get('type') != 'auth_ok':
+                raise HAAuthError(msg.get('message') or msg.get('type'))
+
+            # With no entities yet, the first add_entities() subscribes.
+            await self._subscribe(self.entities)
+            self.connected = True
+            self.log(f"HA websocket connected ({self.url}), {len(self.entities)} entities")
+
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                data = json.loads(msg.data)
+                for item in data if isinstance(data, list) else [data]:
+                    if item.get('type') == 'result' and not item.get('success'):
+                        if self._compressed and item.get('id') in self._subscribe_ids:
+                            # Pre-2022.4 Home Assistant: no subscribe_entities.
+                            self.log("HA websocket: subscribe_entities unsupported, using state_changed events")
+                            self._compressed = False
+                            await self._send({'type': 'subscribe_events', 'event_type': 'state_changed'})
+                            if self.on_resync:
+                                self.on_resync()
+                        continue
+                    if item.get('type') != 'event':
+                        continue
+                    event = item.get('event') or {}
+                    if self._compressed:
+                        self._handle_compressed(event)
+                    else:
+                        self._handle_state_changed(event)
+
+    async def run(self, check_alive):
+        """Keep the feed connected until check_alive() returns False."""
+        if not self.available:
+            return
+        delay = RECONNECT_MIN
+        async with aiohttp.ClientSession() as http:
+            while check_alive():
+                try:
+                    await self._session(http)
+                    delay = RECONNECT_MIN
+                except HAAuthError as e:
+                    self.log(f"HA websocket authentication failed ({e}); using REST polling only")
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.log(f"HA websocket error: {e}. Falling back to REST polling, reconnecting in {delay}s")
+                finally:
+                    self.connected = False
+                    self._ws = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
@@ -0,0 +1,375 @@
+"""Output of one build job (compile, install, fleet), for polling and streaming.
+
+JobLog stands in for the plain list each job state kept its log lines in:
+append(), len() and [start:stop] slicing work as before, with offsets
+counting every line since the job started.  On top of that it:
+
+  - keeps only the newest LOG_RING_LINES lines in memory.  Every line also
+    goes to a gzip file in LOG_SPILL_DIR, SPILL_CHUNK_LINES lines per gzip
+    member, with the first line and byte offset of each member indexed, so
+    older lines are read back by decompressing just the members that cover
+    them (since()).  The members concatenate into one valid .gz file, which
+    /api/esphome/logs/<id>/download serves as the full log;
+  - wakes streaming readers (wait()) as soon as a line arrives or the job
+    closes, instead of them re-polling on a timer;
+  - tracks build progress parsed from ESPHome / PlatformIO / CMake output
+    (parse_progress()): the current phase and, where the tools print one,
+    a percentage, and how long each phase took (phase_times()).
+
+Closed logs are discarded JOB_TTL (BUILD_STATE_TTL) seconds after the job
+ended, by expire() and by the server expiring the job states that hold them,
+so memory and disk stay bounded however many builds run.
+
+stream() turns a job into server-sent events for the /stream endpoints:
+
+  event: log       {"lines": [...], "offset": N}   id: N
+  event: progress  {"phase": "compile", "percent": 42}
+  event: status    the status endpoint's fields, sent when they change
+  event: done      the final status, after the last log event
+
+Lines arriving within LOG_STREAM_BATCH_SECONDS of each other go out as one
+log event (CMake prints hundreds of lines a second).  Every event id is the
+line offset, so a reconnecting EventSource resumes via Last-Event-ID without
+gaps or repeats.  A stream ends after LOG_STREAM_MAX_SECONDS, below nginx's
+proxy_read_timeout, and the browser reconnects.  Each open stream holds a
+Gunicorn thread, so at most LOG_STREAM_MAX run at once (acquire()); past
+that the endpoints answer 503 and clients keep polling.
+"""
+import os
+import re
+import gzip
+import json
+import time
+import uuid
+import itertools
+import threading
+import collections
+
+BATCH_SECONDS = float(os.environ.get('LOG_STREAM_BATCH_SECONDS', '0.3'))
+BATCH_LINES = 500  # most lines in one log event
+KEEPALIVE_SECONDS = 15
+MAX_SECONDS = float(os.environ.get('LOG_STREAM_MAX_SECONDS', '270'))
+MAX_STREAMS = int(os.environ.get('LOG_STREAM_MAX', '8'))
+RETRY_MS = 2000  # EventSource reconnect delay
+
+RING_LINES = int(os.environ.get('LOG_RING_LINES', '2000'))  # lines kept in memory per job
+SPILL_CHUNK_LINES = min(500, RING_LINES)  # lines per gzip member in the spill file
+SPILL_DIR = os.environ.get('LOG_SPILL_DIR', '/tmp/job_logs')
+READ_LIMIT = 2000  # most lines a status poll returns at once
+JOB_TTL = float(os.environ.get('BUILD_STATE_TTL', '900'))  # seconds a finished job is kept
+
+_stats_lock = threading.Lock()
+_stats = {'open': 0, 'opened': 0, 'rejected': 0, 'events': 0, 'lines': 0,
+          'spilled_lines': 0, 'spill_reads': 0}
+_logs = {}  # id -> live JobLog
+
+# (phase, pattern) checked in order against every line; first match wins.
+_PHASES = (
+    ('seed', re.compile(r'^Seeding build directory')),
+    ('config', re.compile(r'INFO Reading configuration')),
+    ('codegen', re.compile(r'INFO Generating C\+\+ source')),
+    ('configure', re.compile(r'^Processing \S+ \(board:|^-- (The \w+ compiler identification|Configuring done)')),
+    ('pch', re.compile(r'^tile_ui: main\.cpp uses precompiled header')),
+    ('compile', re.compile(r'INFO Compiling app|^Compiling \.pioenvs/|^\[\d+/\d+\] (Building|Generating)')),
+    ('link', re.compile(r'^Linking \.pioenvs/.*\.elf|^\[\d+/\d+\] Linking CXX executable')),
+    ('image', re.compile(r'^Building \.pioenvs/.*\.bin|Creating esp32\w* image|esptool.py v')),
+    ('compiled', re.compile(r'INFO Successfully compiled program')),
+    ('upload', re.compile(r'INFO Uploading|^Uploading: |INFO Connecting to')),
+    ('done', re.compile(r'INFO OTA successful|INFO Successfully uploaded program')),
+)
+_CMAKE_STEP = re.compile(r'^\[(\d+)/(\d+)\]')
+_UPLOAD_PERCENT = re.compile(r'Uploading: \[[=\s]*\]\s+(\d+)%')
+
+
+def parse_progress(line, current):
+    """Progress after *line*: a new {'phase', 'percent'} dict, or None if unchanged."""
+    phase, percent = current.get('phase'), current.get('percent')
+    for name, pattern in _PHASES:
+        if pattern.search(line):
+            if name != phase:
+                phase, percent = name, None
+            break
+    m = _CMAKE_STEP.match(line)
+    if m and int(m.group(2)):
+        percent = int(100 * int(m.group(1)) / int(m.group(2)))
+    m = _UPLOAD_PERCENT.search(line)
+    if m:
+        percent = int(m.group(1))
+    if phase in ('compiled', 'done'):
+        percent = 100
+    if (phase, percent) == (current.get('phase'), current.get('percent')):
+        return None
+    return {'phase': phase, 'percent': percent}
+
+
+class JobLog:
+    def __init__(self, lines=()):
+        self.id = uuid.uuid4().hex[:12]
+        self._cond = threading.Condition()
+        self._ring = collections.deque(maxlen=RING_LINES)
+        self._total = 0  # lines appended so far; offsets count from the first
+        self._pending = []  # lines not yet compressed into the spill file
+        self._chunks = []  # [(first line, byte offset)] of each gzip member
+        self._spill_path = os.path.join(SPILL_DIR, f'{self.id}.log.gz')
+        self._spill_bytes = 0
+        self._discarded = False
+        self.closed = False
+        self.closed_at = None
+        self.progress = {'phase': None, 'percent': None}
+        self._phase_marks = []  # [(phase, time.time() it began)]
+        with _stats_lock:
+            _logs[self.id] = self
+        for line in lines:
+            self.append(line)
+
+    def append(self, line):
+        with self._cond:
+            self._ring.append(line)
+            self._pending.append(line)
+            self._total += 1
+            if len(self._pending) >= SPILL_CHUNK_LINES:
+                self._spill()
+            if not self._phase_marks:
+                self._phase_marks.append(('startup', time.time()))
+            progress = parse_progress(line, self.progress)
+            if progress is not None:
+                if progress['phase'] != self.progress['phase']:
+                    self._phase_marks.append((progress['phase'], time.time()))
+                self.progress = progress
+            self._cond.notify_all()
+
+    def _spill(self):
+        """Append the pending lines to the spill file as one gzip member (lock held)."""
+        if not self._pending or self._discarded:
+            return
+        data = gzip.compress(('\n'.join(self._pending) + '\n').encode(), compresslevel=6)
+        try:
+            os.makedirs(SPILL_DIR, exist_ok=True)
+            with open(self._spill_path, 'ab') as f:
+                f.write(data)
+        except OSError as e:
+            print(f"[job_log] Could not spill log {self.id}: {e}", flush=True)
+        else:
+            self._chunks.append((self._total - len(self._pending), self._spill_bytes))
+            self._spill_bytes += len(data)
+            with _stats_lock:
+                _stats['spilled_lines'] += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        """The job has exited; flushes the spill file and wakes every waiting reader."""
+        with self._cond:
+            if not self.closed:
+                self._spill()
+                self.closed = True
+                self.closed_at = time.time()
+            self._cond.notify_all()
+
+    def phase_times(self):
+        """Seconds spent in each phase so far, until the log closed.  'startup'
+        runs from the first line to the first recognised phase; a phase
+        entered more than once is summed."""
+        with self._cond:
+            marks = list(self._phase_marks)
+            end = self.closed_at or time.time()
+        times = {}
+        for (phase, began), (_, ended) in zip(marks, marks[1:] + [(None, end)]):
+            times[phase] = round(times.get(phase, 0.0) + ended - began, 2)
+        return times
+
+    def expired(self, ttl=None):
+        """True once the log has been closed for longer than *ttl* seconds."""
+        return self.closed and time.time() - self.closed_at >= (JOB_TTL if ttl is None else ttl)
+
+    def discard(self):
+        """Forget the log: unregister it and delete its spill file."""
+        with self._cond:
+            self._discarded = True
+            self._pending = []
+        with _stats_lock:
+            _logs.pop(self.id, None)
+        try:
+            os.remove(self._spill_path)
+        except OSError:
+            pass
+
+    def wait(self, offset, timeout):
+        """Block until there are lines past *offset*, the log closes, or *timeout*."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._total > offset or self.closed, timeout)
+
+    def since(self, offset, limit=None):
+        """Lines from *offset* on (at most *limit*): from memory while they are
+        in the ring buffer, otherwise read back from the spill file."""
+        with self._cond:
+            offset = max(0, offset)
+            end = self._total if limit is None else min(self._total, offset + limit)
+            ring_start = self._total - len(self._ring)
+            if offset >= ring_start:
+                return list(itertools.islice(self._ring, offset - ring_start, end - ring_start))
+            chunks = list(self._chunks) + [(None, self._spill_bytes)]
+            ring_tail = list(itertools.islice(self._ring, 0, max(0, end - ring_start)))
+        return self._read_spill(chunks, offset, min(end, ring_start)) + ring_tail
+
+    def _read_spill(self, chunks, start, end):
+        """Lines [start, end) from the gzip members covering them (*chunks* ends
+        with a (None, file size) sentinel)."""
+        lines = []
+        first = max((i for i, (line, _) in enumerate(chunks[:-1]) if line <= start), default=0)
+        try:
+            with open(self._spill_path, 'rb') as f:
+                for i in range(first, len(chunks) - 1):
+                    line, pos = chunks[i]
+                    if line >= end:
+                        break
+                    f.seek(pos)
+                    member = gzip.decompress(f.read(chunks[i + 1][1] - pos)).decode().split('\n')[:-1]
+                    lines.extend(member[max(0, start - line):end - line])
+        except OSError:
+            pass  # discarded meanwhile; the caller still gets the ring buffer part
+        with _stats_lock:
+            _stats['spill_reads'] += 1
+        return lines
+
+    def spill_file(self):
+        """Path of the complete gzip log (flushed first), or None if nothing was written."""
+        with self._cond:
+            self._spill()
+            return self._spill_path if self._spill_bytes else None
+
+    def __len__(self):
+        return self._total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and index.step is None and (index.start or 0) >= 0:
+            stop = index.stop if index.stop is not None else None
+            start = index.start or 0
+            return self.since(start, None if stop is None else max(0, stop - start))
+        raise TypeError('JobLog only supports [start:stop] slices')
+
+    def __iter__(self):
+        return iter(self.since(0))
+
+
+def get(log_id):
+    """The live JobLog with *log_id*, or None."""
+    with _stats_lock:
+        return _logs.get(log_id)
+
+
+def expire(ttl=None):
+    """Discard every log closed more than *ttl* (default JOB_TTL) seconds ago."""
+    with _stats_lock:
+        logs = list(_logs.values())
+    expired = [log for log in logs if log.expired(ttl)]
+    for log in expired:
+        log.discard()
+    return len(expired)
+
+
+def clear_spill_dir():
+    """Delete spill files left behind by a previous server process."""
+    with _stats_lock:
+        live = {f'{log_id}.log.gz' for log_id in _logs}
+    try:
+        names = os.listdir(SPILL_DIR)
+    except OSError:
+        return
+    for name in names:
+        if name.endswith('.log.gz') and name not in live:
+            try:
+                os.remove(os.path.join(SPILL_DIR, name))
+            except OSError:
+                pass
+
+
+# ---- server-sent events ------------------------------------------------
+
+def acquire():
+    """Take a stream slot; False if LOG_STREAM_MAX streams are already open."""
+    with _stats_lock:
+        if _stats['open'] >= MAX_STREAMS:
+            _stats['rejected'] += 1
+            return False
+        _stats['open'] += 1
+        _stats['opened'] += 1
+        return True
+
+
+def release():
+    with _stats_lock:
+        _stats['open'] = max(0, _stats['open'] - 1)
+
+
+def event(name, data, event_id=None):
+    """One SSE event as text."""
+    with _stats_lock:
+        _stats['events'] += 1
+        if name == 'log':
+            _stats['lines'] += len(data.get('lines', ()))
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{head}event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+def start_offset(headers, args):
+    """Where a stream starts: Last-Event-ID on reconnect, else ?offset=N."""
+    for value in (headers.get('Last-Event-ID'), args.get('offset')):
+        try:
+            return max(0, int(value))
+        except (TypeError, ValueError):
+            pass
+    return 0
+
+
+def stream(log, status, offset=0):
+    """SSE text chunks for one job from line *offset* until it finishes.
+
+    *status* is called for the job's current status dict (at least
+    'status': running | success | error); the job is over once that is not
+    'running' and every line has been sent.
+    """
+    started = last_write = time.monotonic()
+    sent_status = sent_progress = None
+    yield f'retry: {RETRY_MS}\n\n'
+    while True:
+        if log.wait(offset, 1.0):
+            time.sleep(BATCH_SECONDS)  # let a burst of lines pile up
+        chunks = []
+        lines = log.since(offset, BATCH_LINES)
+        if lines:
+            offset += len(lines)
+            chunks.append(event('log', {'lines': lines, 'offset': offset}, offset))
+        if log.progress != sent_progress and log.progress['phase']:
+            sent_progress = dict(log.progress)
+            chunks.append(event('progress', sent_progress))
+        st = status()
+        compare = {k: v for k, v in st.items() if k != 'eta_seconds'}
+        if compare != sent_status:
+            sent_status = compare
+            chunks.append(event('status', st))
+        if st['status'] != 'running' and offset >= len(log):
+            chunks.append(event('done', st, offset))
+            yield ''.join(chunks)
+            return
+        now = time.monotonic()
+        if chunks:
+            last_write = now
+            yield ''.join(chunks)
+        elif now - last_write >= KEEPALIVE_SECONDS:
+            last_write = now
+            yield ': keepalive\n\n'
+        if now - started >= MAX_SECONDS:
+            return
+
+
+def stats():
+    with _stats_lock:
+        logs = list(_logs.values())
+        st = dict(_stats)
+    return {
+        **st,
+        'max_streams': MAX_STREAMS,
+        'logs': len(logs),
+        'ring_lines': sum(len(log._ring) for log in logs),
+        'spill_bytes': sum(log._spill_bytes for log in logs),
+    }
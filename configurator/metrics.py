@@ -0,0 +1,102 @@
+"""Process-wide metrics registry served by /api/metrics.
+
+Subsystems register a provider: a name plus a ``snapshot()`` callable that
+returns a JSON-serialisable dict, and optionally a ``samples()`` callable
+that yields ``(metric_name, labels, value)`` tuples for the Prometheus text
+format.  Providers are only invoked when the endpoint is scraped, and they
+are expected to return already-collected values rather than doing I/O, so
+scraping stays cheap.
+"""
+import threading
+
+PREFIX = 'cyd_'
+
+_providers = {}  # name -> (snapshot_fn, samples_fn)
+_providers_lock = threading.Lock()
+
+
+def register(name, snapshot, samples=None):
+    """Register (or replace) the provider called *name*."""
+    with _providers_lock:
+        _providers[name] = (snapshot, samples)
+
+
+def snapshot():
+    """Return {provider_name: provider_snapshot} for every provider."""
+    with _providers_lock:
+        providers = list(_providers.items())
+    result = {}
+    for name, (snap, _) in providers:
+        try:
+            result[name] = snap()
+        except Exception as e:
+            result[name] = {'error': str(e)}
+    return result
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics), safe across threads."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, le in enumerate(self.buckets):
+                if value <= le:
+                    self._counts[i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'buckets': {str(le): n for le, n in zip(self.buckets, self._counts)},
+                'sum': self._sum,
+                'count': self._count,
+            }
+
+    def samples(self, name, labels=None):
+        """Yield the _bucket/_sum/_count samples for *name*."""
+        snap = self.snapshot()
+        for le, n in snap['buckets'].items():
+            yield f'{name}_bucket', {**(labels or {}), 'le': le}, n
+        yield f'{name}_bucket', {**(labels or {}), 'le': '+Inf'}, snap['count']
+        yield f'{name}_sum', labels, snap['sum']
+        yield f'{name}_count', labels, snap['count']
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_sample(name, value, labels=None):
+    """Format one Prometheus sample line."""
+    if labels:
+        label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+        return f'{PREFIX}{name}{{{label_str}}} {value}'
+    return f'{PREFIX}{name} {value}'
+
+
+def prometheus():
+    """Render every provider's samples in the Prometheus text exposition format."""
+    with _providers_lock:
+        providers = list(_providers.values())
+    lines = []
+    for _, samples in providers:
+        if samples is None:
+            continue
+        try:
+            for name, labels, value in samples():
+                if value is None:
+                    continue
+                if isinstance(value, bool):
+                    value = int(value)
+                lines.append(format_sample(name, value, labels))
+        except Exception as e:
+            lines.append(f'# provider error: {_escape(e)}')
+    return '\n'.join(lines) + '\n'
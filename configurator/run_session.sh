@@ -9,6 +9,7 @@ VNC_PORT=$3
 WEBSOCKIFY_PORT=$4
 TILES_FILE=$5
 API_PORT=$6
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 
 # Apply defaults so the script can also be run standalone (matches 3248s035)
 SCREEN_W=${SCREEN_W:-480}
@@ -77,6 +78,14 @@ else
     cd /app/esphome
 fi
 
+# Binary cache hit: server.py found a linked emulator built from an identical
+# config (see emulator_cache.py) — launch it directly and skip ESPHome entirely.
+if [ -n "$EMULATOR_CACHED_BIN" ] && [ -x "$EMULATOR_CACHED_BIN" ]; then
+    echo "Emulator binary cache hit ($EMULATOR_CACHE_KEY) — skipping ESPHome build"
+    stdbuf -oL -eL "$EMULATOR_CACHED_BIN"
+    exit $?
+fi
+
 echo "Starting ESPHome Emulator for session $SESSION_ID..."
 
 # Use a shared cache directory to speed up builds across different session names
@@ -89,7 +98,7 @@ mkdir -p "$PLATFORMIO_CACHEDIR"
 export CCACHE_DIR="/root/.platformio/.ccache"
 export CCACHE_MAXSIZE="2G"
 export CCACHE_COMPILERCHECK="content"
-export CCACHE_SLOPPINESS="include_file_mtime,time_macros"
+export CCACHE_SLOPPINESS="include_file_mtime,pch_defines,time_macros"
 export CCACHE_NOHASHDIR="true"
 mkdir -p "$CCACHE_DIR"
 export PATH="/usr/local/lib/ccache:$PATH"
@@ -121,6 +130,10 @@ if [ ! -d "$SESSION_ESPHOME/build/emulator" ] && [ -d "/app/esphome/lib/.esphome
     # would invoke the compiler for every .o even though ccache would hit.  With
     # fresh mtimes SCons sees the .o as up-to-date and skips compilation entirely.
     find "$SESSION_ESPHOME/build/emulator/.pioenvs" -name '*.o' -exec touch {} +
+    echo "Session build cache seeded"
+elif [ -d "$SESSION_ESPHOME/build/emulator" ]; then
+    # Kept by the session artifact GC (session_artifacts.py) for warm starts.
+    echo "Reusing session build cache from a previous run"
 fi
 
 # Point ESPHome to the session-specific build directory
@@ -130,19 +143,43 @@ export ESPHOME_DATA_DIR="$SESSION_ESPHOME"
 # unchanged translation units entirely.
 export CMAKE_BUILD_PARALLEL_LEVEL=$(nproc)
 
-# Use the same device name as the pre-compiled build to maximize cache reuse
-stdbuf -oL -eL esphome \
-  -s tiles_file "$TILES_FILE" \
-  -s api_port "$API_PORT" \
-  -s screen_w "$SCREEN_W" \
-  -s screen_h "$SCREEN_H" \
-  -s font_tiny "$FONT_TINY" \
-  -s font_small "$FONT_SMALL" \
-  -s font_medium "$FONT_MEDIUM" \
-  -s font_big "$FONT_BIG" \
-  -s font_text_regular "$FONT_TEXT_REGULAR" \
-  -s font_text_bold "$FONT_TEXT_BOLD" \
-  -s font_text_big_bold "$FONT_TEXT_BIG_BOLD" \
-  -s font_text_small "$FONT_TEXT_SMALL" \
-  -s tile_border_width "$TILE_BORDER_WIDTH" \
-  run lib/emulator.yaml
+# Use the same device name as the pre-compiled build to maximize cache reuse.
+# Compile and run as separate steps (equivalent to `esphome run` on the host
+# platform) so the linked program can be stored in the emulator binary cache.
+ESPHOME_SUBS=(
+  -s tiles_file "$TILES_FILE"
+  -s api_port "$API_PORT"
+  -s screen_w "$SCREEN_W"
+  -s screen_h "$SCREEN_H"
+  -s font_tiny "$FONT_TINY"
+  -s font_small "$FONT_SMALL"
+  -s font_medium "$FONT_MEDIUM"
+  -s font_big "$FONT_BIG"
+  -s font_text_regular "$FONT_TEXT_REGULAR"
+  -s font_text_bold "$FONT_TEXT_BOLD"
+  -s font_text_big_bold "$FONT_TEXT_BIG_BOLD"
+  -s font_text_small "$FONT_TEXT_SMALL"
+  -s tile_border_width "$TILE_BORDER_WIDTH"
+)
+PROGRAM="$SESSION_ESPHOME/build/emulator/.pioenvs/emulator/program"
+
+stdbuf -oL -eL esphome "${ESPHOME_SUBS[@]}" compile lib/emulator.yaml || exit $?
+
+if [ ! -x "$PROGRAM" ]; then
+    # Unexpected build layout — let ESPHome locate and launch the program itself.
+    stdbuf -oL -eL esphome "${ESPHOME_SUBS[@]}" run lib/emulator.yaml
+    exit $?
+fi
+
+# A data-driven program serves every tiles config, but only if tile_ui really
+# built it data-driven (it falls back to generated C++ for some configs): the
+# marker is DATA_DRIVEN_MARKER in tile_ui/tile_data.py.
+STORE_KEY="$EMULATOR_CACHE_KEY"
+if [ -n "$EMULATOR_DATA_CACHE_KEY" ] && [ -f "$SESSION_ESPHOME/build/emulator/tile_ui_data_driven" ]; then
+    STORE_KEY="$EMULATOR_DATA_CACHE_KEY"
+fi
+if [ -n "$STORE_KEY" ]; then
+    python3 "$SCRIPT_DIR/emulator_cache.py" store "$STORE_KEY" "$PROGRAM" || true
+fi
+
+stdbuf -oL -eL "$PROGRAM"
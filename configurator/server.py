@@ -12,10 +12,25 @@ import time
 import threading
 import asyncio
 import concurrent.futures
+import collections
 from flask import Flask, request, send_from_directory, jsonify, Response, stream_with_context
 import requests
-from api_proxy import run_proxy_thread
+from api_proxy import SessionState, start_proxy, stop_proxy, proxy_count, delivery_stats, confirm_stats, tap_latency
 import generate_tiles_api
+import emulator_cache
+import session_artifacts
+import ha_state_hub
+import ha_http
+import ha_response_cache
+import entity_index
+import build_scheduler
+import fleet_install
+import firmware_cache
+import job_log
+import build_stats
+import device_seeds
+import metrics
+from session_metrics import SessionMetrics
 from aioesphomeapi import APIClient
 
 import logging
@@ -25,15 +40,20 @@ app = Flask(__name__, static_folder='dist')
 # Activity Monitoring
 EMULATOR_TIMEOUT = 300  # 5 minutes of inactivity
 EMULATOR_MAX_SESSION_TIME = 1800  # 30 minutes max session duration
+EMULATOR_HIBERNATE_GRACE = 30  # seconds without viewers before a session is stopped (SIGSTOP)
 last_activity_time = time.time()
 
 # Multi-session tracking
 MAX_CONCURRENT_SESSIONS = 3  # Maximum number of concurrent emulator sessions
+MAX_HIBERNATED_SESSIONS = 10  # Hibernated sessions kept beyond the concurrent limit
+SESSION_ARTIFACT_GC_INTERVAL = 300  # seconds between disk-quota sweeps of session build dirs/logs
 sessions_lock = threading.RLock()  # RLock allows re-entrant locking
 sessions = {}  # session_id -> dict
+finished_session_metrics = collections.deque(maxlen=20)  # SessionMetrics of stopped sessions
 
 def get_session_id():
-    sid = request.headers.get('X-Session-Id', 'default')
+    # EventSource (the /stream endpoints) cannot set headers, so it passes ?session_id=
+    sid = request.headers.get('X-Session-Id') or request.args.get('session_id', 'default')
     # print(f"DEBUG: Request {request.path} from session {sid}", flush=True)
     return sid
 
@@ -176,6 +196,73 @@ def serve_static(path):
         return send_from_directory(app.static_folder, path)
     return serve_index_with_env()
 
+def _ha_target():
+    """(base_url, token) of the HA this request is for, or None if there is none.
+
+    Remote HA mode when the browser sends x-ha-url / x-ha-token, otherwise
+    the local HA via the Supervisor.
+    """
+    target_url = request.headers.get('x-ha-url')
+    if target_url and target_url.strip():
+        return target_url.strip().rstrip('/'), request.headers.get('x-ha-token')
+    if not SUPERVISOR_TOKEN:
+        print("Error: SUPERVISOR_TOKEN not set", flush=True)
+        return None
+    return HA_URL, SUPERVISOR_TOKEN
+
+def _ha_headers(token):
+    headers = {
+        "Content-Type": "application/json",
+    }
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+def _fetch_ha_states(base_url, token):
+    response = ha_http.get(f"{base_url}/api/states", headers=_ha_headers(token), timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+_mock_entity_index = entity_index.EntityIndex('mock')
+_mock_entity_index.load(MOCK_ENTITIES)
+
+@app.route('/api/ha/search', methods=['GET'])
+def ha_search():
+    """Search HA entities: ?q=&domain=&device_class=&limit=&offset=
+
+    Served from entity_index instead of sending every state to the browser.
+    """
+    query = request.args.get('q', '')
+    try:
+        limit = int(request.args.get('limit', entity_index.DEFAULT_LIMIT))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+
+    if request.headers.get('x-ha-mock') == 'true':
+        index = _mock_entity_index
+    else:
+        target = _ha_target()
+        if target is None:
+            return jsonify({"error": "Supervisor token not set and no remote credentials provided"}), 500
+        index = entity_index.get(*target)
+        try:
+            index.ensure_loaded(lambda: _fetch_ha_states(*target))
+        except requests.exceptions.RequestException as e:
+            print(f"HA Search Error: {str(e)}", flush=True)
+            return jsonify({"error": f"Could not load entities from Home Assistant: {str(e)}"}), 502
+
+    total, results = index.search(query, domain=request.args.get('domain'),
+                                  device_class=request.args.get('device_class'),
+                                  limit=limit, offset=offset)
+    return jsonify({
+        "query": query,
+        "total": total,
+        "offset": max(0, offset),
+        "limit": max(1, min(limit, entity_index.MAX_LIMIT)),
+        "results": results,
+    })
+
 @app.route('/api/ha/<path:path>', methods=['GET', 'POST'])
 def proxy_ha(path):
     # Check for mock mode
@@ -184,41 +271,29 @@ def proxy_ha(path):
             return jsonify(MOCK_ENTITIES)
         return jsonify({"success": True})
 
-    # Determine target URL and Token
-    target_url = request.headers.get('x-ha-url')
-    target_token = request.headers.get('x-ha-token')
-    
-    if target_url and target_url.strip():
-        # Remote HA mode
-        url = f"{target_url.rstrip('/')}/api/{path}"
-        headers = {
-            "Content-Type": "application/json",
-        }
-        if target_token:
-            headers["Authorization"] = f"Bearer {target_token}"
-    else:
-        # Local HA mode (Supervisor)
-        if not SUPERVISOR_TOKEN:
-             print("Error: SUPERVISOR_TOKEN not set", flush=True)
-             return jsonify({"error": "Supervisor token not set and no remote credentials provided"}), 500
-             
-        url = f"{HA_URL}/api/{path}"
-        headers = {
-            "Authorization": f"Bearer {SUPERVISOR_TOKEN}",
-            "Content-Type": "application/json",
-        }
+    target = _ha_target()
+    if target is None:
+        return jsonify({"error": "Supervisor token not set and no remote credentials provided"}), 500
+    base_url, token = target
+    api_base = f"{base_url}/api"
+    url = f"{api_base}/{path}"
+    headers = _ha_headers(token)
     
     try:
         if request.method == 'GET':
-            response = requests.get(url, headers=headers, params=request.args, timeout=10)
-        else:
-            response = requests.post(url, headers=headers, json=request.json, timeout=10)
-            
+            return _proxy_ha_get(api_base, path, url, headers, token)
+
+        response = ha_http.post(url, headers=headers, json=request.json, timeout=10)
+        # A service call may change any of the states cached for this HA.
+        ha_response_cache.invalidate(api_base, token)
         if response.status_code == 401:
              print("Error: HA returned 401 Unauthorized", flush=True)
              return jsonify({"error": "Home Assistant rejected the supervisor token"}), 502
 
-        return (response.content, response.status_code, response.headers.items())
+        return (response.content, response.status_code, _proxy_headers(response.headers))
+    except ha_http.PoolTimeout as e:
+        print(f"HA Proxy busy: {str(e)}", flush=True)
+        return jsonify({"error": f"Home Assistant connection pool is busy: {str(e)}"}), 503
     except requests.exceptions.RequestException as e:
         print(f"HA Proxy Connection Error: {str(e)}")
         return jsonify({"error": f"Could not connect to Home Assistant: {str(e)}"}), 502
@@ -226,6 +301,64 @@ def proxy_ha(path):
         print(f"HA Proxy Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# Hop-by-hop headers, and those describing a body encoding the proxy undoes
+# (requests decompresses) or a length it may change (filtering).
+_PROXY_DROP_HEADERS = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+                       'te', 'trailer', 'transfer-encoding', 'upgrade',
+                       'content-encoding', 'content-length'}
+
+def _proxy_headers(upstream_headers):
+    return [(k, v) for k, v in upstream_headers.items() if k.lower() not in _PROXY_DROP_HEADERS]
+
+def _cached_ha_response(entry):
+    """Serve a cache entry, or a bodiless 304 if the browser already has it."""
+    headers = {'ETag': entry.etag, 'Cache-Control': 'no-cache'}
+    if ha_response_cache.etag_matches(request.headers.get('If-None-Match'), entry.etag):
+        ha_response_cache.record_not_modified()
+        return Response(status=304, headers=headers)
+    return Response(entry.body, status=entry.status, content_type=entry.content_type, headers=headers)
+
+def _content_length(headers):
+    """Content-Length as an int, or None when missing or unparsable (e.g. comma-joined)."""
+    try:
+        return int(headers.get('Content-Length'))
+    except (TypeError, ValueError):
+        return None
+
+def _proxy_ha_get(api_base, path, url, headers, token):
+    """GET through the short-TTL cache (ha_response_cache), filtering states on request.
+
+    Large unfiltered bodies are streamed straight through rather than
+    buffered; they are still cached if they fit.
+    """
+    params, filters = ha_response_cache.split_filters(path, request.args)
+    key = ha_response_cache.make_key(api_base, path, params, token, filters)
+    entry = ha_response_cache.lookup(key)
+    if entry is not None:
+        return _cached_ha_response(entry)
+
+    response = ha_http.get(url, headers=headers, params=params, timeout=10, stream=True)
+    if response.status_code == 401:
+        response.close()
+        print("Error: HA returned 401 Unauthorized", flush=True)
+        return jsonify({"error": "Home Assistant rejected the supervisor token"}), 502
+    content_type = response.headers.get('Content-Type', 'application/json')
+    length = _content_length(response.headers)
+    large = length is None or length >= ha_response_cache.STREAM_MIN_BYTES
+    if large and not filters and response.status_code == 200:
+        chunks = ha_response_cache.stream_and_store(
+            key, response.status_code, ha_http.iter_body(response), content_type)
+        return Response(stream_with_context(chunks), status=response.status_code,
+                        headers=_proxy_headers(response.headers))
+
+    body = b''.join(ha_http.iter_body(response))
+    if response.status_code != 200:
+        return (body, response.status_code, _proxy_headers(response.headers))
+    if filters:
+        body = ha_response_cache.apply_filters(body, filters)
+        content_type = 'application/json'
+    return _cached_ha_response(ha_response_cache.store(key, response.status_code, body, content_type))
+
 EMULATOR_PID_FILE = '/tmp/emulator.pid'
 
 def find_free_display():
@@ -256,6 +389,8 @@ def create_emulator_stream(session_id, status):
                 return
             session = sessions[session_id]
             session['connections'] = session.get('connections', 0) + 1
+            session['disconnected_at'] = None
+            _wake_session(session_id, "viewer reconnected")
             pid = session.get('pid')
             websockify_port = session.get('websockify_port')
             
@@ -289,6 +424,8 @@ def create_emulator_stream(session_id, status):
                 if session_id in sessions:
                     sessions[session_id]['connections'] -= 1
                     count = sessions[session_id]['connections']
+                    if count <= 0:
+                        sessions[session_id]['disconnected_at'] = time.time()
                     # print(f"Session {session_id} connection closed. Remaining: {count}", flush=True)
                     # We NO LONGER stop the session here. 
                     # The monitor_activity thread will clean it up after timeout if no connections.
@@ -303,20 +440,17 @@ def start_emulator():
         if session_id in sessions:
             session = sessions[session_id]
             if is_process_running(session.get('pid')):
-                 return create_emulator_stream(session_id, "running")
+                if session.get('hibernated') and not _can_wake(session_id):
+                    return _session_limit_response(_running_sessions(session_id))
+                return create_emulator_stream(session_id, "running")
             else:
                  # Clean up dead session
                  _stop_session(session_id)
         
         # Check if we're at the session limit (only count sessions that don't belong to this session_id)
-        active_sessions = sum(1 for sid, s in sessions.items() 
-                            if sid != session_id and is_process_running(s.get('pid')))
+        active_sessions = _running_sessions(session_id)
         if active_sessions >= MAX_CONCURRENT_SESSIONS:
-            return jsonify({
-                "status": "error", 
-                "message": f"Too many emulators are currently running ({active_sessions}/{MAX_CONCURRENT_SESSIONS}). Please try again later.",
-                "error_code": "session_limit_reached"
-            }), 429
+            return _session_limit_response(active_sessions)
 
     # Validate and Save Configuration
     try:
@@ -356,6 +490,7 @@ def start_emulator():
         result = _run_generate_subprocess(yaml_str, lib_dir=_lib_dir, images_dir=_images_dir, screen_w=_dev_cfg['screen_w'], screen_h=_dev_cfg['screen_h'])
         if "error" in result:
              return jsonify({"status": "error", "message": f"Configuration invalid: {result['error']}"}), 400
+        data_blob = result.get('data_blob')
 
     except Exception as e:
         print(f"Config processing error: {e}")
@@ -377,6 +512,53 @@ def start_emulator():
     websockify_port = 6000 + display
     api_port = 6050 + display
     
+    # Look up a previously linked emulator built from this exact config.
+    # Every -s substitution except tiles_file is part of the key (api_port is
+    # baked into the binary); tiles_file only names where yaml_str lives.
+    session_env = {k.upper(): str(v) for k, v in _dev_cfg.items()}
+
+    # Data-driven sessions (tile_ui data_driven: true) load their tiles from
+    # TILE_UI_DATA_FILE at startup, so the linked program does not depend on
+    # the tiles config and a single cached binary serves every config.  The
+    # component can still fall back to generated C++, so run_session.sh only
+    # stores a program under the config-independent key when the build left
+    # tile_ui's data-driven marker; otherwise it is keyed on yaml_str.
+    data_file = None
+    if data_blob:
+        data_file = f'/tmp/tile_ui_data_{session_id}.txt'
+        try:
+            with open(data_file, 'w') as f:
+                f.write(data_blob)
+            session_env['TILE_UI_DATA_FILE'] = data_file
+        except OSError as e:
+            print(f"Session {session_id}: could not write tile data file: {e}", flush=True)
+            data_file = None
+    try:
+        def _cache_key(config):
+            return emulator_cache.config_key(
+                config,
+                {**{k: str(v) for k, v in _dev_cfg.items()}, 'api_port': str(api_port)},
+                _lib_dir,
+                os.path.join(os.path.dirname(_lib_dir), 'external_components', 'tile_ui'),
+            )
+        cache_key = _cache_key(yaml_str)
+        session_env['EMULATOR_CACHE_KEY'] = cache_key
+        cached_bin = None
+        if data_file:
+            data_cache_key = _cache_key('tile_ui:data_driven')
+            session_env['EMULATOR_DATA_CACHE_KEY'] = data_cache_key
+            cached_bin = emulator_cache.lookup(data_cache_key)
+            if cached_bin:
+                cache_key = data_cache_key
+        if not cached_bin:
+            cached_bin = emulator_cache.lookup(cache_key)
+        if cached_bin:
+            session_env['EMULATOR_CACHED_BIN'] = cached_bin
+            print(f"Session {session_id}: emulator binary cache hit ({cache_key})", flush=True)
+    except Exception as e:
+        cached_bin = None
+        print(f"Session {session_id}: emulator cache lookup failed: {e}", flush=True)
+
     # Get HA credentials for the proxy
     ha_url = request.headers.get('x-ha-url')
     ha_token = request.headers.get('x-ha-token')
@@ -386,24 +568,34 @@ def start_emulator():
         os.chmod(script_path, 0o755)
         print(f"Starting session {session_id}: display={display}, vnc={vnc_port}, ws={websockify_port}, api={api_port}", flush=True)
         
+        session_artifacts.touch(session_id)
         with open(log_path, 'w', buffering=1) as log_file:
             log_file.write(f"--- Starting Session {session_id} ---\n")
             log_file.flush()
-            # Usage: ./run_session.sh <session_id> <display_num> <vnc_port> <websockify_port> <tiles_file> <api_port>
-            # Device config (screen dims, font sizes) is passed via environment variables.
-            proc = subprocess.Popen(
-                ['/bin/bash', script_path, session_id, str(display), str(vnc_port), str(websockify_port), user_config_filename, str(api_port)],
-                stdout=log_file,
-                stderr=subprocess.STDOUT,
-                cwd=os.path.dirname(__file__),
-                start_new_session=True,
-                env={**os.environ, **{k.upper(): str(v) for k, v in _dev_cfg.items()}},
-            )
+        session_metrics = SessionMetrics(session_id, screen_type)
+        # Usage: ./run_session.sh <session_id> <display_num> <vnc_port> <websockify_port> <tiles_file> <api_port>
+        # Device config (screen dims, font sizes) is passed via environment variables.
+        # Output goes through _pump_session_output so build phases and the
+        # first frame are timestamped as they are logged.
+        proc = subprocess.Popen(
+            ['/bin/bash', script_path, session_id, str(display), str(vnc_port), str(websockify_port), user_config_filename, str(api_port)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=os.path.dirname(__file__),
+            start_new_session=True,
+            env={**os.environ, **session_env},
+        )
+        threading.Thread(
+            target=_pump_session_output,
+            args=(proc, log_path, session_metrics),
+            daemon=True
+        ).start()
         
         pid_file = f'/tmp/emulator_{session_id}.pid'
         with open(pid_file, 'w') as f:
             f.write(str(proc.pid))
             
+        proxy_state = SessionState()
         with sessions_lock:
             sessions[session_id] = {
                 'pid': proc.pid,
@@ -412,6 +604,9 @@ def start_emulator():
                 'websockify_port': websockify_port,
                 'api_port': api_port,
                 'connections': 0,
+                'disconnected_at': None,  # Set when the last viewer stream closes
+                'hibernated': False,  # Process group stopped (SIGSTOP) while nobody watches
+                'hibernated_at': None,
                 'last_activity': None,  # Will be set on VNC connection
                 'session_start_time': time.time(),  # Track session creation time
                 'pid_file': pid_file,
@@ -420,20 +615,18 @@ def start_emulator():
                 'screen_type': screen_type,
                 'screen_w': _dev_cfg['screen_w'],
                 'screen_h': _dev_cfg['screen_h'],
+                'emulator_cache_hit': bool(cached_bin),
+                'data_file': data_file,
+                'metrics': session_metrics,
+                'proxy_state': proxy_state,  # pushed to the API proxy, which reads it lock-free
             }
+        # Make room for this session's build dir if the artifact quota is exceeded.
+        _collect_session_artifacts_async()
         
         # Start API proxy thread to forward service calls from emulator to HA
         # Only start if not in mock mode and we have some way to reach HA
         if not is_mock and (SUPERVISOR_TOKEN or (ha_url and ha_url.strip())):
-            def check_session_alive():
-                with sessions_lock:
-                    return session_id in sessions
-
-            threading.Thread(
-                target=run_proxy_thread, 
-                args=(session_id, api_port, ha_url, ha_token, SUPERVISOR_TOKEN, check_session_alive),
-                daemon=True
-            ).start()
+            start_proxy(session_id, api_port, ha_url, ha_token, SUPERVISOR_TOKEN, proxy_state)
         else:
             print(f"API PROXY [{session_id}]: Skipping start (Mock mode or no HA credentials)", flush=True)
             
@@ -441,6 +634,19 @@ def start_emulator():
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def _pump_session_output(proc, log_path, session_metrics):
+    """Copy session output to its log file, feeding each line to the session metrics."""
+    try:
+        with open(log_path, 'ab', buffering=0) as log_file:
+            for raw in iter(proc.stdout.readline, b''):
+                log_file.write(raw)
+                session_metrics.observe_line(raw.decode('utf-8', errors='replace'))
+    except Exception as e:
+        print(f"Session {session_metrics.session_id}: log pump error: {e}", flush=True)
+    finally:
+        proc.stdout.close()
+        proc.wait()  # reap, so is_process_running() sees the session exit
+
 def _stop_session(session_id):
     """Stops all processes associated with a session."""
     with sessions_lock:
@@ -450,11 +656,15 @@ def _stop_session(session_id):
         pid = session.get('pid')
         pid_file = session.get('pid_file')
         user_config_path = session.get('user_config_path')
+        data_file = session.get('data_file')
         display = session.get('display')
         
         if pid:
             try:
                 os.killpg(os.getpgid(pid), signal.SIGTERM)
+                if session.get('hibernated'):
+                    # Stopped processes only act on SIGTERM once continued.
+                    os.killpg(os.getpgid(pid), signal.SIGCONT)
             except (ProcessLookupError, OSError):
                 pass
         
@@ -464,6 +674,8 @@ def _stop_session(session_id):
         # We might want to keep the config or logs for a bit, but for now let's clean up
         if user_config_path and os.path.exists(user_config_path):
             os.remove(user_config_path)
+        if data_file and os.path.exists(data_file):
+            os.remove(data_file)
             
         # Explicit cleanup for display locks
         if display:
@@ -477,7 +689,89 @@ def _stop_session(session_id):
                     except:
                         pass
 
+        session['proxy_state'].alive = False
+        stop_proxy(session_id)
+
+        session_metrics = session.get('metrics')
+        if session_metrics:
+            session_metrics.finish()
+            finished_session_metrics.append(session_metrics)
+
         del sessions[session_id]
+        # LRU age of the build dir counts from the end of the session.
+        session_artifacts.touch(session_id)
+
+def _active_session_ids():
+    with sessions_lock:
+        return list(sessions.keys())
+
+def _collect_session_artifacts():
+    try:
+        session_artifacts.collect(_active_session_ids())
+    except Exception as e:
+        print(f"Session artifact GC failed: {e}", flush=True)
+
+def _collect_session_artifacts_async():
+    threading.Thread(target=_collect_session_artifacts, daemon=True).start()
+
+def _hibernate_session(session_id):
+    """Stop (SIGSTOP) a session's process group. Call with sessions_lock held."""
+    session = sessions.get(session_id)
+    if not session or session.get('hibernated'):
+        return False
+    try:
+        os.killpg(os.getpgid(session['pid']), signal.SIGSTOP)
+    except (ProcessLookupError, OSError, TypeError) as e:
+        print(f"Session {session_id}: hibernate failed: {e}", flush=True)
+        return False
+    session['hibernated'] = True
+    session['hibernated_at'] = time.time()
+    session['proxy_state'].hibernated = True
+    if session.get('metrics'):
+        session['metrics'].set_hibernated(True)
+    print(f"Session {session_id}: no viewers for {EMULATOR_HIBERNATE_GRACE}s, hibernating", flush=True)
+    return True
+
+def _running_sessions(exclude=None):
+    """Sessions with a running (not hibernated) emulator. Call with sessions_lock held."""
+    return sum(1 for sid, s in sessions.items()
+               if sid != exclude and not s.get('hibernated') and is_process_running(s.get('pid')))
+
+def _can_wake(session_id):
+    """Whether waking *session_id* stays within MAX_CONCURRENT_SESSIONS. Call with sessions_lock held."""
+    return _running_sessions(session_id) < MAX_CONCURRENT_SESSIONS
+
+def _session_limit_response(active_sessions):
+    return jsonify({
+        "status": "error",
+        "message": f"Too many emulators are currently running ({active_sessions}/{MAX_CONCURRENT_SESSIONS}). Please try again later.",
+        "error_code": "session_limit_reached"
+    }), 429
+
+def _wake_session(session_id, reason):
+    """Continue (SIGCONT) a hibernated session if there is room under
+    MAX_CONCURRENT_SESSIONS; it stays parked otherwise. Call with sessions_lock held."""
+    session = sessions.get(session_id)
+    if not session or not session.get('hibernated'):
+        return False
+    if not _can_wake(session_id):
+        print(f"Session {session_id}: not waking ({reason}), "
+              f"{MAX_CONCURRENT_SESSIONS} emulators already running", flush=True)
+        return False
+    try:
+        os.killpg(os.getpgid(session['pid']), signal.SIGCONT)
+    except (ProcessLookupError, OSError, TypeError) as e:
+        print(f"Session {session_id}: wake failed: {e}", flush=True)
+    session['hibernated'] = False
+    session['hibernated_at'] = None
+    session['proxy_state'].hibernated = False
+    # Time spent parked does not count towards the inactivity timeout.
+    if session.get('last_activity') is not None:
+        session['last_activity'] = time.time()
+    if session.get('metrics'):
+        session['metrics'].set_hibernated(False)
+    print(f"Session {session_id}: waking from hibernation ({reason})", flush=True)
+    return True
 
 @app.route('/api/emulator/stop', methods=['POST'])
 def stop_emulator():
@@ -522,6 +816,7 @@ def debug_emulator():
                 'vnc_port': s.get('vnc_port'),
                 'websockify_port': s.get('websockify_port'),
                 'screen_type': s.get('screen_type'),
+                'emulator_cache_hit': s.get('emulator_cache_hit'),
             }
             for sid, s in sessions.items()
         }
@@ -543,6 +838,7 @@ def debug_emulator():
         'ccache_dir': {'exists': os.path.isdir(ccache_dir), 'size': _dir_size_mb(ccache_dir) if os.path.isdir(ccache_dir) else None},
         'setup_marker': os.path.exists(setup_marker),
         'generate_script': os.path.exists(_GENERATE_SCRIPT),
+        'emulator_bin_cache': emulator_cache.stats(),
         'base_dir': BASE_DIR,
         'recent_emulator_logs': log_files,
         'memory_mb': _read_file('/proc/meminfo').split('\n')[0] if os.path.exists('/proc/meminfo') else None,
@@ -555,9 +851,14 @@ def emulator_status():
         if session_id in sessions:
             session = sessions[session_id]
             if is_process_running(session.get('pid')):
+                # A hibernated session still reports "running" so the client
+                # re-opens its keep-alive stream, which wakes the session.
+                hibernated_at = session.get('hibernated_at')
                 return jsonify({
                     "status": "running",
-                    "websockify_port": session.get('websockify_port')
+                    "websockify_port": session.get('websockify_port'),
+                    "hibernated": bool(session.get('hibernated')),
+                    "hibernated_for_s": round(time.time() - hibernated_at, 1) if hibernated_at else None,
                 })
     return jsonify({"status": "stopped"})
 
@@ -575,6 +876,163 @@ def emulator_logs():
             return f"Error reading logs: {e}"
     return "No logs available"
 
+# ============================================================
+# Metrics
+# ============================================================
+
+def _emulator_session_metrics():
+    with sessions_lock:
+        active = [s['metrics'] for s in sessions.values() if s.get('metrics')]
+    return active, list(finished_session_metrics)
+
+def _emulator_sessions_snapshot():
+    active, finished = _emulator_session_metrics()
+    return {
+        'active': [m.to_dict() for m in active],
+        'finished': [m.to_dict() for m in finished],
+    }
+
+def _emulator_sessions_samples():
+    active, _ = _emulator_session_metrics()
+    yield 'emulator_sessions_active', None, len(active)
+    yield 'emulator_sessions_max', None, MAX_CONCURRENT_SESSIONS
+    for m in active:
+        yield from m.samples()
+
+def _session_artifacts_samples():
+    st = session_artifacts.stats()
+    for k in ('collections', 'evictions', 'evicted_bytes'):
+        yield f'session_artifacts_{k}_total', None, st[k]
+    yield 'session_artifacts_bytes', None, st['bytes']
+    yield 'session_artifacts_quota_bytes', None, st['quota_bytes']
+    for kind, entry in st['by_kind'].items():
+        yield 'session_artifacts_kind_bytes', {'kind': kind}, entry['bytes']
+        yield 'session_artifacts_kind_count', {'kind': kind}, entry['count']
+
+def _ha_state_hub_samples():
+    for hub in ha_state_hub.stats():
+        labels = {'ha_url': hub['base_url']}
+        yield 'ha_state_hub_sessions', labels, hub['sessions']
+        yield 'ha_state_hub_entities', labels, hub['entities']
+        yield 'ha_state_hub_cached_entities', labels, hub['cached']
+        yield 'ha_state_hub_websocket_connected', labels, int(hub['websocket'])
+        for k in ('requested', 'coalesced', 'single', 'batched', 'errors'):
+            yield f'ha_state_hub_fetch_{k}_total', labels, hub['fetch'][k]
+        yield 'ha_state_hub_fetch_pending', labels, hub['fetch']['pending']
+
+def _ha_http_samples():
+    for c in ha_http.stats():
+        labels = {'origin': c['origin']}
+        yield 'ha_http_requests_total', labels, c['requests']
+        yield 'ha_http_errors_total', labels, c['errors']
+        if c['connections_opened'] is not None:
+            yield 'ha_http_connections_opened_total', labels, c['connections_opened']
+
+def _ha_state_delivery_samples():
+    st = delivery_stats()
+    yield 'ha_state_sent_total', None, st['sent']
+    yield 'ha_state_suppressed_total', None, st['suppressed']
+    yield 'ha_state_suppression_ratio', None, st['suppression_ratio']
+    yield 'ha_proxies_active', None, proxy_count()
+    yield 'process_threads', None, threading.active_count()
+
+def _ha_service_confirm_samples():
+    st = confirm_stats()
+    for outcome in ('push', 'poll', 'timeout'):
+        yield 'ha_service_confirm_total', {'outcome': outcome}, st[outcome]
+    yield from tap_latency.samples('ha_tap_to_state_seconds')
+
+def _ha_response_cache_samples():
+    st = ha_response_cache.stats()
+    for k in ('hits', 'misses', 'not_modified', 'stores', 'evictions', 'invalidations',
+              'streamed', 'filtered', 'filtered_bytes_saved'):
+        yield f'ha_proxy_cache_{k}_total', None, st[k]
+    yield 'ha_proxy_cache_entries', None, st['entries']
+    yield 'ha_proxy_cache_bytes', None, st['bytes']
+
+def _entity_index_samples():
+    st = entity_index.stats()
+    for k in ('searches', 'loads', 'load_errors', 'updates'):
+        yield f'ha_entity_index_{k}_total', None, st[k]
+    for index in st['indexes']:
+        yield 'ha_entity_index_entities', {'ha_url': index['base_url']}, index['entities']
+
+def _build_scheduler_samples():
+    st = build_scheduler.scheduler.stats()
+    yield 'builds_max_concurrent', None, st['max_concurrent']
+    yield 'builds_running', None, len(st['running'])
+    yield 'builds_queued', None, len(st['queued'])
+    for k in ('submitted', 'started', 'finished', 'cancelled', 'start_errors'):
+        yield f'builds_{k}_total', None, st[k]
+    for kind, seconds in st['avg_duration'].items():
+        yield 'builds_avg_duration_seconds', {'kind': kind}, seconds
+
+def _log_stream_samples():
+    st = job_log.stats()
+    yield 'log_streams_open', None, st['open']
+    for k in ('opened', 'rejected', 'events', 'lines'):
+        yield f'log_streams_{k}_total', None, st[k]
+    yield 'build_logs', None, st['logs']
+    yield 'build_logs_ring_lines', None, st['ring_lines']
+    yield 'build_logs_spill_bytes', None, st['spill_bytes']
+    for k in ('spilled_lines', 'spill_reads'):
+        yield f'build_logs_{k}_total', None, st[k]
+
+def _build_stats_samples():
+    st = build_stats.stats()
+    for kind, t in st['totals'].items():
+        labels = {'kind': kind}
+        yield 'build_stats_builds_total', labels, t['builds']
+        yield 'build_stats_failed_total', labels, t['failed']
+        yield 'build_stats_seconds_total', labels, t['seconds']
+        for phase, seconds in t['phases'].items():
+            yield 'build_stats_phase_seconds_total', {**labels, 'phase': phase}, seconds
+        yield 'build_stats_ccache_hits_total', labels, t['ccache_hits']
+        yield 'build_stats_ccache_misses_total', labels, t['ccache_misses']
+
+def _device_seeds_samples():
+    st = device_seeds.stats()
+    yield 'device_seeds_seeded_total', {}, st['seeded']
+    yield 'device_seeds_missing_total', {}, st['no_seed']
+    yield 'device_seeds_errors_total', {}, st['errors']
+    yield 'device_seeds_seconds_total', {}, st['seconds']
+
+def _firmware_cache_samples():
+    st = firmware_cache.stats()
+    for k in ('hits', 'misses', 'stores', 'evictions'):
+        yield f'firmware_cache_{k}_total', None, st[k]
+    yield 'firmware_cache_entries', None, st['entries']
+    yield 'firmware_cache_bytes', None, st['bytes']
+
+def _emulator_cache_samples():
+    st = emulator_cache.stats()
+    for k in ('hits', 'misses', 'stores', 'evictions'):
+        yield f'emulator_bin_cache_{k}_total', None, st[k]
+    yield 'emulator_bin_cache_entries', None, st['entries']
+    yield 'emulator_bin_cache_bytes', None, st['bytes']
+
+metrics.register('emulator_sessions', _emulator_sessions_snapshot, _emulator_sessions_samples)
+metrics.register('emulator_bin_cache', emulator_cache.stats, _emulator_cache_samples)
+metrics.register('session_artifacts', session_artifacts.stats, _session_artifacts_samples)
+metrics.register('ha_state_hubs', ha_state_hub.stats, _ha_state_hub_samples)
+metrics.register('ha_http', ha_http.stats, _ha_http_samples)
+metrics.register('ha_state_delivery', delivery_stats, _ha_state_delivery_samples)
+metrics.register('ha_service_confirm', confirm_stats, _ha_service_confirm_samples)
+metrics.register('ha_proxy_cache', ha_response_cache.stats, _ha_response_cache_samples)
+metrics.register('ha_entity_index', entity_index.stats, _entity_index_samples)
+metrics.register('builds', build_scheduler.scheduler.stats, _build_scheduler_samples)
+metrics.register('firmware_cache', firmware_cache.stats, _firmware_cache_samples)
+metrics.register('log_streams', job_log.stats, _log_stream_samples)
+metrics.register('build_stats', build_stats.stats, _build_stats_samples)
+metrics.register('device_seeds', device_seeds.stats, _device_seeds_samples)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """JSON metrics snapshot, or Prometheus text with ?format=prometheus."""
+    if request.args.get('format') == 'prometheus':
+        return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+    return jsonify(metrics.snapshot())
+
 @app.route('/api/generate', methods=['POST'])
 def generate():
     try:
@@ -915,21 +1373,108 @@ def load_config_raw():
 install_processes = {}  # session_id -> {process, lines, status, message}
 install_processes_lock = threading.Lock()
 
+# Firmware cache key of each session's last successful compile, per device,
+# so the flash manifest serves exactly that build.
+session_firmware = collections.OrderedDict()  # session_id -> {device_name: key}
+MAX_SESSION_FIRMWARE = 200
+
+def _remember_firmware(session_id, device_name, key):
+    with compile_processes_lock:
+        session_firmware.setdefault(session_id, {})[device_name] = key
+        session_firmware.move_to_end(session_id)
+        while len(session_firmware) > MAX_SESSION_FIRMWARE:
+            session_firmware.popitem(last=False)
+
+# Fleet installs (compile once, OTA to many devices)
+fleet_installs = {}  # session_id -> fleet_install.FleetInstall
+fleet_installs_lock = threading.Lock()
+
 # Track active compile processes (for USB flash workflow)
 compile_processes = {}  # session_id -> {process, lines, status, message, device_name}
 compile_processes_lock = threading.Lock()
 
+def _close_unstarted(state):
+    """Close the log of a job cancelled before its process started (no reader
+    thread will), so it expires like any finished job."""
+    if state['process'] is None:
+        state['lines'].close()
+
+def _expire_build_states():
+    """Drop install/compile/fleet states whose job finished more than
+    job_log.JOB_TTL seconds ago and was never collected by a final poll."""
+    for states, lock in ((install_processes, install_processes_lock),
+                         (compile_processes, compile_processes_lock)):
+        with lock:
+            for sid in [sid for sid, st in states.items() if st['lines'].expired()]:
+                del states[sid]
+    with fleet_installs_lock:
+        for sid in [sid for sid, fleet in fleet_installs.items() if fleet.lines.expired()]:
+            del fleet_installs[sid]
+    job_log.expire()
+
+def _esphome_env(tz=None):
+    """Environment for esphome compile/run/upload subprocesses.
+
+    Points ESPHome / PlatformIO at the pre-warmed ccache so builds reuse
+    cached object files instead of rebuilding from scratch.
+    """
+    env = os.environ.copy()
+    env['PYTHONUNBUFFERED'] = '1'
+    if tz:
+        env['TZ'] = tz
+    _pio_dir = '/root/.platformio'
+    _ccache_dir = os.path.join(_pio_dir, '.ccache')
+    _ccache_bin = '/usr/local/lib/ccache'
+    if os.path.isdir(_ccache_dir):
+        env['CCACHE_DIR']           = _ccache_dir
+        env['CCACHE_MAXSIZE']       = '2G'
+        env['CCACHE_COMPILERCHECK'] = 'content'
+        env['CCACHE_SLOPPINESS']    = 'include_file_mtime,pch_defines,time_macros'
+        env['CCACHE_NOHASHDIR']     = 'true'
+    if os.path.isdir(_ccache_bin):
+        env['PATH'] = f"{_ccache_bin}:{env.get('PATH', '')}"
+    return env
+
+# Warm per-screen seed builds made by toolchain_setup.maybe_build_device_seeds()
+DEVICE_SEED_DATA_DIR = os.path.join(APP_DIR, 'esphome', 'lib', '.esphome')
+
+def _seed_build_dir(filename, state):
+    """Clone the seed build of *filename*'s screen type into its build dir if it has none yet."""
+    device_seeds.seed(os.path.join(BASE_DIR, filename), os.path.join(BASE_DIR, '.esphome'),
+                      DEVICE_SEED_DATA_DIR, log=state['lines'].append)
+
+def _build_queue_info(state):
+    """Scheduler fields for an install/compile status response.
+
+    While the job waits for a build slot the message shows its queue position
+    and estimated start; the status stays 'running' so clients keep polling.
+    """
+    job = state['job']
+    if job is None:  # served from firmware_cache, never queued
+        return {'message': state['message'], 'job_id': None, 'queued': False}
+    if job.state == 'failed' and state['status'] == 'running':
+        state['status'] = 'error'
+        state['message'] = f'Could not start the build: {job.error}'
+    info = {'message': state['message'], 'job_id': job.id, 'queued': False}
+    queued = build_scheduler.scheduler.position(job)
+    if queued is not None:
+        position, eta = queued
+        wait = 'under a minute' if eta < 60 else f'about {round(eta / 60)} min'
+        info.update(queued=True, queue_position=position, eta_seconds=eta,
+                    message=f'Waiting for a build slot (position {position} in queue, starts in {wait})')
+    return info
+
 def _get_ha_timezone():
     """Try to fetch the timezone from Home Assistant, with fallbacks."""
     # 1. Try HA Supervisor API
     try:
         if SUPERVISOR_TOKEN:
-            resp = requests.get(
+            resp = ha_http.get(
                 f"{HA_URL}/api/config",
                 headers={"Authorization": f"Bearer {SUPERVISOR_TOKEN}"},
                 timeout=5
             )
-            if resp.ok:
+            if resp.status_code == 200:
                 tz = resp.json().get('time_zone')
                 if tz:
                     print(f"Detected HA timezone: {tz}", flush=True)
@@ -1276,39 +1821,21 @@ def install_esphome_device():
         session_id = get_session_id()
         print(f"[install] Session: {session_id}, File: {filename}", flush=True)
 
-        # Kill ALL existing install processes across all sessions — only one at a time allowed
+        # Replace this session's previous install, queued or running; other
+        # sessions' installs are left alone (build_scheduler limits how many run).
         with install_processes_lock:
-            for sid, existing in list(install_processes.items()):
-                proc = existing['process']
-                if proc.poll() is None:
-                    print(f"[install] Killing existing install process PID {proc.pid} (session {sid})", flush=True)
-                    proc.terminate()
-                    try:
-                        proc.wait(timeout=5)
-                    except subprocess.TimeoutExpired:
-                        proc.kill()
-            install_processes.clear()
+            existing = install_processes.pop(session_id, None)
+        if existing:
+            if build_scheduler.scheduler.cancel(existing['job']):
+                print(f"[install] Replacing previous install for session {session_id}", flush=True)
+            _close_unstarted(existing)
 
         # Determine OTA target address so we can pass --device and avoid the
         # interactive "choose upload method" prompt that appears when a USB serial
         # device is also present in the container (e.g. a Zigbee dongle).
         _ota_address = None
         try:
-            class _IL(yaml.SafeLoader):
-                pass
-            _IL.add_constructor('!include', lambda l, n: l.construct_scalar(n))
-            _IL.add_multi_constructor('!', lambda l, s, n: None)
-            with open(filepath, 'r') as _yf:
-                _ydata = yaml.load(_yf, Loader=_IL)
-            if isinstance(_ydata, dict):
-                # Prefer explicit wifi.use_address; fall back to <device_name>.local
-                _wifi = _ydata.get('wifi') or {}
-                _ota_address = _wifi.get('use_address') if isinstance(_wifi, dict) else None
-                if not _ota_address:
-                    _name = ((_ydata.get('substitutions') or {}).get('device_name') or
-                             (_ydata.get('esphome') or {}).get('name'))
-                    if _name:
-                        _ota_address = f'{_name}.local'
+            _ota_address = fleet_install.ota_address(fleet_install.load_config(filepath))
         except Exception as _e:
             print(f"[install] Could not determine OTA address: {_e}", flush=True)
 
@@ -1321,44 +1848,17 @@ def install_esphome_device():
         else:
             print("[install] WARNING: could not determine OTA address — ESPHome may prompt interactively", flush=True)
 
-        # Start the process immediately — timezone is fetched in the background thread
-        _install_env = os.environ.copy()
-        _install_env['PYTHONUNBUFFERED'] = '1'
-        # Point ESPHome / PlatformIO at the pre-warmed ccache so the compile
-        # reuses cached object files instead of rebuilding from scratch.
-        _pio_dir = '/root/.platformio'
-        _ccache_dir = os.path.join(_pio_dir, '.ccache')
-        _ccache_bin = '/usr/local/lib/ccache'
-        if os.path.isdir(_ccache_dir):
-            _install_env['CCACHE_DIR']           = _ccache_dir
-            _install_env['CCACHE_MAXSIZE']        = '2G'
-            _install_env['CCACHE_COMPILERCHECK']  = 'content'
-            _install_env['CCACHE_SLOPPINESS']     = 'include_file_mtime,time_macros'
-            _install_env['CCACHE_NOHASHDIR']      = 'true'
-        if os.path.isdir(_ccache_bin):
-            _install_env['PATH'] = f"{_ccache_bin}:{_install_env.get('PATH', '')}"
-        process = subprocess.Popen(
-            _esphome_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            stdin=subprocess.DEVNULL,   # prevent interactive prompts from blocking
-            cwd=BASE_DIR,
-            text=True,
-            bufsize=1,
-            env=_install_env,
-        )
+        _install_env = _esphome_env()
 
         install_state = {
-            'process': process,
-            'lines': [],
+            'process': None,
+            'job': None,
+            'lines': job_log.JobLog(),
             'status': 'running',      # running | success | error
             'message': f'Starting install of {filename}...',
             'line_offset': 0,          # not used server-side, just tracks total
         }
 
-        with install_processes_lock:
-            install_processes[session_id] = install_state
-
         # Regex to strip ANSI escape codes from ESPHome output
         ansi_re = re.compile(r'\x1b\[[0-9;?]*[a-zA-Z]')
         # Split on \r\n, \n, or bare \r so CMake progress lines (\r-terminated) are captured
@@ -1410,43 +1910,90 @@ def install_esphome_device():
                     state['message'] = str(e)
                 print(f"[install] Reader thread error: {e}", flush=True)
             finally:
-                pass
-
-        t = threading.Thread(target=_reader_thread, args=(install_state,), daemon=True)
-        t.start()
+                state['lines'].close()
+                build_stats.finish(state.get('build'), state['lines'], state['status'])
+                build_scheduler.scheduler.finished(state['job'])
+
+        def _start(job):
+            """Launch the build once build_scheduler gives it a slot."""
+            install_state['build'] = build_stats.begin('install', filename, _install_env)
+            _seed_build_dir(filename, install_state)
+            process = subprocess.Popen(
+                _esphome_cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,   # prevent interactive prompts from blocking
+                cwd=BASE_DIR,
+                text=True,
+                bufsize=1,
+                env=_install_env,
+            )
+            job.process = install_state['process'] = process
+            install_state['message'] = f'Starting install of {filename}...'
+            threading.Thread(target=_reader_thread, args=(install_state,), daemon=True).start()
+            print(f"[install] Started, process PID: {process.pid}", flush=True)
+            return process
+
+        job = build_scheduler.BuildJob('install', session_id, filename, _start,
+                                       priority=data.get('priority', 'normal'))
+        install_state['job'] = job
+        with install_processes_lock:
+            install_processes[session_id] = install_state
+        build_scheduler.scheduler.submit(job)
 
-        print(f"[install] Returning response, process PID: {process.pid}", flush=True)
-        return jsonify({'status': 'started', 'message': install_state['message']})
+        return jsonify({'status': 'started', **_build_queue_info(install_state)})
 
     except Exception as e:
         print(f"[install] Exception: {e}", flush=True)
         return jsonify({'error': str(e)}), 500
 
 
+def _poll_status(status, sent, lines):
+    """Status for a poll answer that ends at line *sent*: 'running' until the
+    last page of lines has gone out, since clients stop at a final status."""
+    return status if sent >= len(lines) else 'running'
+
+
+def _find_install_state(session_id):
+    """This session's install; never another session's log or build."""
+    with install_processes_lock:
+        return install_processes.get(session_id)
+
+
+def _sse_response(events):
+    """Stream *events* as text/event-stream; frees the job_log stream slot on close."""
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: don't buffer the stream
+    response.call_on_close(job_log.release)
+    return response
+
+
+def _stream_busy():
+    return jsonify({'error': 'Too many open log streams, poll the status endpoint instead'}), 503
+
+
 @app.route('/api/esphome/install/status')
 def install_status():
     """Poll for install progress. Pass ?offset=N to get only new lines since line N."""
     session_id = get_session_id()
-    with install_processes_lock:
-        state = install_processes.get(session_id)
-        # Fall back to any running process (e.g. browser reloaded and got new session)
-        if not state:
-            for s in install_processes.values():
-                state = s
-                break
+    state = _find_install_state(session_id)
 
     if not state:
         return jsonify({'status': 'not_running'}), 404
 
     offset = request.args.get('offset', 0, type=int)
+    queue_info = _build_queue_info(state)
     lines = state['lines']
-    new_lines = lines[offset:]
+    offset = max(0, min(offset, len(lines)))
+    new_lines = lines.since(offset, job_log.READ_LIMIT)
 
     result = {
-        'status': state['status'],
-        'message': state['message'],
+        'status': _poll_status(state['status'], offset + len(new_lines), lines),
         'lines': new_lines,
-        'offset': len(lines),
+        'offset': offset + len(new_lines),
+        'log_id': lines.id,
+        **queue_info,
     }
 
     # Clean up finished installs after client has seen the final status
@@ -1460,24 +2007,157 @@ def install_status():
     return jsonify(result)
 
 
+@app.route('/api/esphome/install/stream')
+def install_stream():
+    """Server-sent events for this session's install: log lines, progress and
+    status changes (see job_log).  Resumes from Last-Event-ID or ?offset=N."""
+    session_id = get_session_id()
+    with install_processes_lock:
+        state = install_processes.get(session_id)
+    if not state:
+        return jsonify({'status': 'not_running'}), 404
+    if not job_log.acquire():
+        return _stream_busy()
+    offset = job_log.start_offset(request.headers, request.args)
+
+    def _events():
+        yield from job_log.stream(state['lines'], lambda: {'status': state['status'], **_build_queue_info(state)},
+                                  offset)
+        if state['status'] in ('success', 'error'):
+            with install_processes_lock:
+                if install_processes.get(session_id) is state:
+                    install_processes.pop(session_id, None)
+
+    return _sse_response(_events())
+
+
 @app.route('/api/esphome/install/cancel', methods=['POST'])
 def cancel_install():
-    """Cancel a running installation."""
+    """Cancel this session's installation, whether still queued or running."""
+    session_id = get_session_id()
     with install_processes_lock:
-        if not install_processes:
-            return jsonify({'status': 'not_running'}), 404
-        for sid, state in list(install_processes.items()):
-            process = state['process']
-            if process.poll() is None:
-                process.terminate()
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    process.kill()
-            state['status'] = 'error'
-            state['message'] = 'Installation cancelled by user'
-        install_processes.clear()
-        return jsonify({'status': 'cancelled'})
+        state = install_processes.pop(session_id, None)
+    if not state:
+        return jsonify({'status': 'not_running'}), 404
+    build_scheduler.scheduler.cancel(state['job'])
+    state['status'] = 'error'
+    state['message'] = 'Installation cancelled by user'
+    _close_unstarted(state)
+    return jsonify({'status': 'cancelled'})
+
+
+@app.route('/api/esphome/fleet/install', methods=['POST'])
+def fleet_install_devices():
+    """Install one config set to many devices: each distinct firmware is compiled
+    once and uploaded to all of its devices in parallel.
+    Body: {"filenames": ["panel1.yaml", ...]}; poll /api/esphome/fleet/status."""
+    try:
+        data = request.get_json() or {}
+        filenames = data.get('filenames') or []
+        if not isinstance(filenames, list) or not filenames:
+            return jsonify({'error': 'filenames must be a non-empty list'}), 400
+        for filename in filenames:
+            if not isinstance(filename, str) or not filename or '..' in filename:
+                return jsonify({'error': f'Invalid filename: {filename}'}), 400
+            if not os.path.exists(os.path.join(BASE_DIR, filename.lstrip('/'))):
+                return jsonify({'error': f'File not found: {filename}'}), 404
+
+        session_id = get_session_id()
+        with fleet_installs_lock:
+            previous = fleet_installs.pop(session_id, None)
+        if previous and previous.status == 'running':
+            print(f"[fleet] Replacing previous fleet install for session {session_id}", flush=True)
+            previous.cancel()
+
+        try:
+            fleet = fleet_install.FleetInstall(session_id, BASE_DIR, list(dict.fromkeys(filenames)),
+                                               _esphome_env(_get_ha_timezone()))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        print(f"[fleet] Session {session_id}: {fleet.message}", flush=True)
+        with fleet_installs_lock:
+            fleet_installs[session_id] = fleet
+        fleet.start()
+        return jsonify({'status': 'started', **fleet.snapshot()})
+    except Exception as e:
+        print(f"[fleet] Exception: {e}", flush=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/esphome/fleet/status')
+def fleet_install_status():
+    """Aggregated fleet progress. Pass ?offset=N to get only new lines since line N."""
+    session_id = get_session_id()
+    with fleet_installs_lock:
+        fleet = fleet_installs.get(session_id)
+    if not fleet:
+        return jsonify({'status': 'not_running'}), 404
+    return jsonify(fleet.snapshot(request.args.get('offset', 0, type=int)))
+
+
+@app.route('/api/esphome/fleet/stream')
+def fleet_install_stream():
+    """Server-sent events for this session's fleet install; the status events
+    carry fleet/status minus its lines."""
+    session_id = get_session_id()
+    with fleet_installs_lock:
+        fleet = fleet_installs.get(session_id)
+    if not fleet:
+        return jsonify({'status': 'not_running'}), 404
+    if not job_log.acquire():
+        return _stream_busy()
+
+    def _status():
+        snapshot = fleet.snapshot(len(fleet.lines))
+        del snapshot['lines'], snapshot['offset']
+        return snapshot
+
+    return _sse_response(job_log.stream(fleet.lines, _status,
+                                        job_log.start_offset(request.headers, request.args)))
+
+
+@app.route('/api/esphome/fleet/cancel', methods=['POST'])
+def cancel_fleet_install():
+    """Cancel this session's fleet install (its build and uploads only)."""
+    session_id = get_session_id()
+    with fleet_installs_lock:
+        fleet = fleet_installs.get(session_id)
+    if not fleet or fleet.status != 'running':
+        return jsonify({'status': 'not_running'}), 404
+    fleet.cancel()
+    return jsonify({'status': 'cancelled'})
+
+
+@app.route('/api/esphome/build_stats')
+def get_build_stats():
+    """Phase timings and ccache hit rates of recent install/compile builds, with
+    per-kind totals and averages (see build_stats)."""
+    return jsonify(build_stats.stats())
+
+
+@app.route('/api/esphome/logs/<log_id>')
+def build_log_lines(log_id):
+    """Any range of a build log by its log_id (from the status responses), also
+    lines that have left the in-memory buffer.  ?offset=N&limit=M."""
+    log = job_log.get(log_id)
+    if log is None:
+        return jsonify({'error': 'Log not found or expired'}), 404
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = max(1, min(request.args.get('limit', job_log.READ_LIMIT, type=int), job_log.READ_LIMIT))
+    lines = log.since(offset, limit)
+    return jsonify({'lines': lines, 'offset': offset + len(lines), 'total': len(log), 'closed': log.closed})
+
+
+@app.route('/api/esphome/logs/<log_id>/download')
+def build_log_download(log_id):
+    """The complete build log as a gzip file (supports HTTP Range requests)."""
+    log = job_log.get(log_id)
+    path = log.spill_file() if log is not None else None
+    if path is None:
+        return jsonify({'error': 'Log not found or expired'}), 404
+    return send_from_directory(os.path.dirname(path), os.path.basename(path),
+                               mimetype='application/gzip', as_attachment=True,
+                               download_name=f'build-{log_id}.log.gz', conditional=True)
 
 
 # ============================================================
@@ -1552,6 +2232,16 @@ def save_wifi_credentials():
 # ESPHome Compile & Firmware Download (for USB/Web Serial flash)
 # ============================================================
 
+def _remove_device_yaml(filename):
+    if filename and '..' not in filename:
+        yaml_path = os.path.join(BASE_DIR, filename.lstrip('/'))
+        try:
+            if os.path.exists(yaml_path):
+                os.remove(yaml_path)
+                print(f"[compile] Auto-removed {yaml_path}", flush=True)
+        except Exception as e:
+            print(f"[compile] Failed to auto-remove {yaml_path}: {e}", flush=True)
+
 @app.route('/api/esphome/compile', methods=['POST'])
 def compile_esphome_device():
     """Compile firmware for a device config. Returns immediately; poll /api/esphome/compile/status for progress."""
@@ -1570,19 +2260,13 @@ def compile_esphome_device():
         session_id = get_session_id()
         print(f"[compile] Session: {session_id}, File: {filename}", flush=True)
 
-        # Clean up any existing compile for this session
+        # Replace any existing compile for this session, queued or running
         with compile_processes_lock:
-            existing = compile_processes.get(session_id)
-            if existing:
-                proc = existing['process']
-                if proc.poll() is None:
-                    print(f"[compile] Killing stale compile process PID {proc.pid}", flush=True)
-                    proc.terminate()
-                    try:
-                        proc.wait(timeout=5)
-                    except subprocess.TimeoutExpired:
-                        proc.kill()
-                compile_processes.pop(session_id, None)
+            existing = compile_processes.pop(session_id, None)
+        if existing and build_scheduler.scheduler.cancel(existing['job']):
+            print(f"[compile] Replacing previous compile for session {session_id}", flush=True)
+        if existing:
+            _close_unstarted(existing)
 
         # Parse device name from the YAML for locating build output
         device_name = None
@@ -1603,38 +2287,39 @@ def compile_esphome_device():
         except Exception:
             device_name = os.path.splitext(os.path.basename(filename))[0]
 
-        # Get timezone
-        env = os.environ.copy()
-        env['PYTHONUNBUFFERED'] = '1'
-        tz = _get_ha_timezone()
-        if tz:
-            env['TZ'] = tz
-        # Point ESPHome / PlatformIO at the pre-warmed ccache.
-        _pio_dir = '/root/.platformio'
-        _ccache_dir = os.path.join(_pio_dir, '.ccache')
-        _ccache_bin = '/usr/local/lib/ccache'
-        if os.path.isdir(_ccache_dir):
-            env['CCACHE_DIR']           = _ccache_dir
-            env['CCACHE_MAXSIZE']       = '2G'
-            env['CCACHE_COMPILERCHECK'] = 'content'
-            env['CCACHE_SLOPPINESS']    = 'include_file_mtime,time_macros'
-            env['CCACHE_NOHASHDIR']     = 'true'
-        if os.path.isdir(_ccache_bin):
-            env['PATH'] = f"{_ccache_bin}:{env.get('PATH', '')}"
-
-        process = subprocess.Popen(
-            ['esphome', 'compile', filename],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            cwd=BASE_DIR,
-            text=True,
-            bufsize=1,
-            env=env
-        )
+        firmware_key = None
+        try:
+            firmware_key = firmware_cache.config_key(filepath, BASE_DIR)
+        except Exception as e:
+            print(f"[compile] Could not compute firmware cache key: {e}", flush=True)
+        if firmware_key and firmware_cache.lookup(firmware_key):
+            print(f"[compile] Firmware cache hit {firmware_key}, skipping compile", flush=True)
+            _remember_firmware(session_id, device_name, firmware_key)
+            if not IS_ADDON:
+                _remove_device_yaml(filename)
+            compile_state = {
+                'process': None,
+                'job': None,
+                'lines': job_log.JobLog([f'Inputs unchanged since the last build of {filename} — using cached firmware ({firmware_key})']),
+                'status': 'success',
+                'message': 'Compilation completed successfully! (cached firmware)',
+                'device_name': device_name,
+                'filename': filename,
+                'firmware_key': firmware_key,
+            }
+            compile_state['lines'].close()
+            with compile_processes_lock:
+                compile_processes[session_id] = compile_state
+            return jsonify({'status': 'started', 'device_name': device_name, 'cached': True,
+                            **_build_queue_info(compile_state)})
+
+        env = _esphome_env(_get_ha_timezone())
 
         compile_state = {
-            'process': process,
-            'lines': [],
+            'process': None,
+            'job': None,
+            'firmware_key': firmware_key,
+            'lines': job_log.JobLog(),
             'status': 'running',
             'message': f'Compiling {filename}...',
             'device_name': device_name,
@@ -1644,9 +2329,6 @@ def compile_esphome_device():
             'auto_cleanup': not IS_ADDON,
         }
 
-        with compile_processes_lock:
-            compile_processes[session_id] = compile_state
-
         ansi_re = re.compile(r'\x1b\[[0-9;?]*[a-zA-Z]')
         line_split_re = re.compile(r'\r\n|\n|\r')
 
@@ -1661,6 +2343,14 @@ def compile_esphome_device():
                             state['lines'].append(clean)
                 proc.wait()
                 if proc.returncode == 0:
+                    if state.get('firmware_key'):
+                        try:
+                            build_dir = os.path.join(BASE_DIR, '.esphome', 'build', state['device_name'],
+                                                     '.pioenvs', state['device_name'])
+                            firmware_cache.store(state['firmware_key'], build_dir, state['device_name'])
+                            _remember_firmware(session_id, state['device_name'], state['firmware_key'])
+                        except Exception as e:
+                            print(f"[compile] Could not cache firmware: {e}", flush=True)
                     state['status'] = 'success'
                     state['message'] = 'Compilation completed successfully!'
                     print(f"[compile] Compilation succeeded", flush=True)
@@ -1675,21 +2365,37 @@ def compile_esphome_device():
             finally:
                 # Auto-delete the device YAML so cloud users don't see each other's files.
                 if state.get('auto_cleanup'):
-                    _fname = state.get('filename', '')
-                    if _fname and '..' not in _fname:
-                        _yaml_path = os.path.join(BASE_DIR, _fname.lstrip('/'))
-                        try:
-                            if os.path.exists(_yaml_path):
-                                os.remove(_yaml_path)
-                                print(f"[compile] Auto-removed {_yaml_path}", flush=True)
-                        except Exception as _e:
-                            print(f"[compile] Failed to auto-remove {_yaml_path}: {_e}", flush=True)
-
-        t = threading.Thread(target=_reader_thread, args=(compile_state,), daemon=True)
-        t.start()
+                    _remove_device_yaml(state.get('filename', ''))
+                state['lines'].close()
+                build_stats.finish(state.get('build'), state['lines'], state['status'])
+                build_scheduler.scheduler.finished(state['job'])
+
+        def _start(job):
+            """Launch the build once build_scheduler gives it a slot."""
+            compile_state['build'] = build_stats.begin('compile', filename, env)
+            _seed_build_dir(filename, compile_state)
+            process = subprocess.Popen(
+                ['esphome', 'compile', filename],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=BASE_DIR,
+                text=True,
+                bufsize=1,
+                env=env
+            )
+            job.process = compile_state['process'] = process
+            threading.Thread(target=_reader_thread, args=(compile_state,), daemon=True).start()
+            print(f"[compile] Started, process PID: {process.pid}", flush=True)
+            return process
+
+        job = build_scheduler.BuildJob('compile', session_id, filename, _start,
+                                       priority=data.get('priority', 'normal'))
+        compile_state['job'] = job
+        with compile_processes_lock:
+            compile_processes[session_id] = compile_state
+        build_scheduler.scheduler.submit(job)
 
-        print(f"[compile] Returning response, process PID: {process.pid}", flush=True)
-        return jsonify({'status': 'started', 'message': compile_state['message'], 'device_name': device_name})
+        return jsonify({'status': 'started', 'device_name': device_name, **_build_queue_info(compile_state)})
 
     except Exception as e:
         print(f"[compile] Exception: {e}", flush=True)
@@ -1707,15 +2413,18 @@ def compile_status():
         return jsonify({'status': 'not_running'}), 404
 
     offset = request.args.get('offset', 0, type=int)
+    queue_info = _build_queue_info(state)
     lines = state['lines']
-    new_lines = lines[offset:]
+    offset = max(0, min(offset, len(lines)))
+    new_lines = lines.since(offset, job_log.READ_LIMIT)
 
     result = {
-        'status': state['status'],
-        'message': state['message'],
+        'status': _poll_status(state['status'], offset + len(new_lines), lines),
         'lines': new_lines,
-        'offset': len(lines),
+        'offset': offset + len(new_lines),
+        'log_id': lines.id,
         'device_name': state.get('device_name'),
+        **queue_info,
     }
 
     if state['status'] in ('success', 'error'):
@@ -1726,25 +2435,39 @@ def compile_status():
     return jsonify(result)
 
 
+@app.route('/api/esphome/compile/stream')
+def compile_stream():
+    """Server-sent events for this session's compile: log lines, progress and
+    status changes (see job_log).  Resumes from Last-Event-ID or ?offset=N.
+    The state is kept after 'done' for /api/esphome/compile/cleanup."""
+    session_id = get_session_id()
+    with compile_processes_lock:
+        state = compile_processes.get(session_id)
+    if not state:
+        return jsonify({'status': 'not_running'}), 404
+    if not job_log.acquire():
+        return _stream_busy()
+
+    def _status():
+        return {'status': state['status'], 'device_name': state.get('device_name'), **_build_queue_info(state)}
+
+    return _sse_response(job_log.stream(state['lines'], _status,
+                                        job_log.start_offset(request.headers, request.args)))
+
+
 @app.route('/api/esphome/compile/cancel', methods=['POST'])
 def cancel_compile():
-    """Cancel a running compilation."""
+    """Cancel this session's compilation, whether still queued or running."""
     session_id = get_session_id()
     with compile_processes_lock:
-        state = compile_processes.get(session_id)
-        if state:
-            process = state['process']
-            if process.poll() is None:
-                process.terminate()
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    process.kill()
-                state['status'] = 'error'
-                state['message'] = 'Compilation cancelled by user'
-            compile_processes.pop(session_id, None)
-            return jsonify({'status': 'cancelled'})
-    return jsonify({'status': 'not_running'}), 404
+        state = compile_processes.pop(session_id, None)
+    if not state:
+        return jsonify({'status': 'not_running'}), 404
+    build_scheduler.scheduler.cancel(state['job'])
+    state['status'] = 'error'
+    state['message'] = 'Compilation cancelled by user'
+    _close_unstarted(state)
+    return jsonify({'status': 'cancelled'})
 
 
 @app.route('/api/esphome/compile/cleanup', methods=['POST'])
@@ -1791,47 +2514,53 @@ def cleanup_compile():
 
 @app.route('/api/esphome/firmware/<device_name>/manifest.json')
 def get_firmware_manifest(device_name):
-    """Return a manifest for flashing via esptool-js (ESP Web Tools compatible)."""
+    """Return a manifest for flashing via esptool-js (ESP Web Tools compatible).
+
+    Serves this session's last compile of *device_name* from firmware_cache
+    when it is there, else the ESPHome build output.
+    """
     if '..' in device_name:
         return jsonify({'error': 'Invalid device name'}), 400
 
+    with compile_processes_lock:
+        key = session_firmware.get(get_session_id(), {}).get(device_name)
+    cached = key and firmware_cache.lookup(key)
+    if cached:
+        return jsonify({
+            'name': device_name,
+            'parts': [{'path': f"/api/esphome/firmware/cache/{key}/{p['file']}", 'offset': p['offset']}
+                      for p in cached['parts']],
+        })
+
     build_dir = os.path.join(BASE_DIR, '.esphome', 'build', device_name, '.pioenvs', device_name)
 
     if not os.path.isdir(build_dir):
         return jsonify({'error': f'Build output not found for {device_name}. Compile first.'}), 404
 
-    # Check for factory image (esp-idf, single image that includes bootloader+partitions+app)
-    factory_bin = os.path.join(build_dir, 'firmware.factory.bin')
-    if os.path.exists(factory_bin):
+    # A factory image (esp-idf) alone, else bootloader/partitions/app at the
+    # typical ESP32 Arduino offsets.
+    parts = firmware_cache.manifest_parts(build_dir)
+    if parts:
         return jsonify({
             'name': device_name,
-            'parts': [
-                {'path': f'/api/esphome/firmware/{device_name}/firmware.factory.bin', 'offset': 0}
-            ]
+            'parts': [{'path': f'/api/esphome/firmware/{device_name}/{name}', 'offset': offset}
+                      for name, offset in parts],
         })
 
-    # Arduino framework: separate files
-    parts = []
-    firmware_bin = os.path.join(build_dir, 'firmware.bin')
-    if os.path.exists(firmware_bin):
-        # Typical ESP32 Arduino offsets
-        bootloader = os.path.join(build_dir, 'bootloader.bin')
-        partitions = os.path.join(build_dir, 'partitions.bin')
-        boot_app = os.path.join(build_dir, 'boot_app0.bin')
-
-        if os.path.exists(bootloader):
-            parts.append({'path': f'/api/esphome/firmware/{device_name}/bootloader.bin', 'offset': 4096})
-        if os.path.exists(partitions):
-            parts.append({'path': f'/api/esphome/firmware/{device_name}/partitions.bin', 'offset': 32768})
-        if os.path.exists(boot_app):
-            parts.append({'path': f'/api/esphome/firmware/{device_name}/boot_app0.bin', 'offset': 57344})
-        parts.append({'path': f'/api/esphome/firmware/{device_name}/firmware.bin', 'offset': 65536})
-
-        return jsonify({'name': device_name, 'parts': parts})
-
     return jsonify({'error': f'No firmware binaries found for {device_name}'}), 404
 
 
+@app.route('/api/esphome/firmware/cache/<key>/<filename>')
+def get_cached_firmware_file(key, filename):
+    """Serve a firmware binary from firmware_cache."""
+    if not re.fullmatch(r'[0-9a-f]+', key) or filename not in dict(firmware_cache.FIRMWARE_FILES):
+        return jsonify({'error': 'Invalid path'}), 400
+    entry = firmware_cache.entry_dir(key)
+    if not os.path.isfile(os.path.join(entry, filename)):
+        return jsonify({'error': f'File not found: {filename}'}), 404
+    return send_from_directory(entry, filename, mimetype='application/octet-stream')
+
+
 @app.route('/api/esphome/firmware/<device_name>/<filename>')
 def get_firmware_file(device_name, filename):
     """Serve a compiled firmware binary file."""
@@ -1856,25 +2585,24 @@ def get_firmware_file(device_name, filename):
 # marker exists (e.g. very early in container startup).
 _pgrep_cache: dict = {'ts': 0.0, 'running': False}
 
-@app.route('/api/toolchain/status')
-def toolchain_status():
-    """
-    Return the current toolchain setup progress so the UI can show a progress bar.
-    Reads from /tmp/toolchain_setup_progress.json (written by toolchain_setup.py).
-    Falls back to ready if the legacy .cyd_setup_done marker is present.
-    """
+TOOLCHAIN_LOG = '/tmp/toolchain_setup.log'
+TOOLCHAIN_STREAM_CHUNK = 64 * 1024  # most log bytes read per toolchain stream poll
+TOOLCHAIN_LOG_TAIL_BYTES = 512 * 1024  # /api/toolchain/log looks this far back for its lines
+
+def _toolchain_progress():
+    """Current toolchain setup progress dict (see toolchain_status)."""
     progress_file = '/tmp/toolchain_setup_progress.json'
     if os.path.exists(progress_file):
         try:
             with open(progress_file) as f:
-                return jsonify(json.load(f))
+                return json.load(f)
         except (json.JSONDecodeError, OSError):
             pass
 
     # Legacy: baked-in toolchain (BAKE_TOOLCHAIN=1) or already-set-up volume
     if os.path.exists('/root/.platformio/.cyd_setup_done'):
-        return jsonify({'phase': 'ready', 'progress': 100,
-                        'message': 'Toolchain ready.', 'fallback': False})
+        return {'phase': 'ready', 'progress': 100,
+                'message': 'Toolchain ready.', 'fallback': False}
 
     # No progress file and no marker — check if the script is still running.
     # Cache the pgrep result for 5 s so rapid polls don't spawn a new process.
@@ -1888,31 +2616,104 @@ def toolchain_status():
         _pgrep_cache['ts'] = now
 
     if _pgrep_cache['running']:
-        return jsonify({'phase': 'starting', 'progress': 0,
-                        'message': 'Toolchain setup starting...', 'fallback': False})
+        return {'phase': 'starting', 'progress': 0,
+                'message': 'Toolchain setup starting...', 'fallback': False}
 
-    return jsonify({'phase': 'no_toolchain', 'progress': 0,
-                    'message': 'Toolchain not initialised. '
-                               'Open the Install dialog to build locally.',
-                    'fallback': False})
+    return {'phase': 'no_toolchain', 'progress': 0,
+            'message': 'Toolchain not initialised. '
+                       'Open the Install dialog to build locally.',
+            'fallback': False}
+
+
+@app.route('/api/toolchain/status')
+def toolchain_status():
+    """
+    Return the current toolchain setup progress so the UI can show a progress bar.
+    Reads from /tmp/toolchain_setup_progress.json (written by toolchain_setup.py).
+    Falls back to ready if the legacy .cyd_setup_done marker is present.
+    """
+    return jsonify(_toolchain_progress())
+
+
+@app.route('/api/toolchain/stream')
+def toolchain_stream():
+    """
+    Server-sent events for toolchain setup: 'log' events with new lines of the
+    setup log (event id = byte offset, so Last-Event-ID / ?offset=N resume),
+    'progress' events whenever the status endpoint's answer changes, and
+    'done' once the phase is ready or no_toolchain.
+    """
+    if not job_log.acquire():
+        return _stream_busy()
+    offset = job_log.start_offset(request.headers, request.args)
+
+    def _events():
+        pos = offset
+        sent = None
+        started = last_write = time.time()
+        yield f'retry: {job_log.RETRY_MS}\n\n'
+        while True:
+            chunks = []
+            try:
+                size = os.path.getsize(TOOLCHAIN_LOG)
+            except OSError:
+                size = 0
+            if size < pos:  # start_local_build truncates the log
+                pos = 0
+            if size > pos:
+                with open(TOOLCHAIN_LOG, 'rb') as f:
+                    f.seek(pos)
+                    data = f.read(TOOLCHAIN_STREAM_CHUNK)
+                end = data.rfind(b'\n') + 1
+                if end == 0 and len(data) == TOOLCHAIN_STREAM_CHUNK:
+                    end = len(data)  # one very long line
+                if end:
+                    pos += end
+                    lines = data[:end].decode('utf-8', errors='replace').splitlines()
+                    chunks.append(job_log.event('log', {'lines': lines, 'offset': pos}, pos))
+            progress = _toolchain_progress()
+            if progress != sent:
+                sent = progress
+                chunks.append(job_log.event('progress', progress))
+            if progress.get('phase') in ('ready', 'no_toolchain') and pos >= size:
+                chunks.append(job_log.event('done', progress, pos))
+                yield ''.join(chunks)
+                return
+            now = time.time()
+            if chunks:
+                last_write = now
+                yield ''.join(chunks)
+            elif now - last_write >= job_log.KEEPALIVE_SECONDS:
+                last_write = now
+                yield ': keepalive\n\n'
+            if now - started >= job_log.MAX_SECONDS:
+                return
+            time.sleep(1)
+
+    return _sse_response(_events())
 
 
 @app.route('/api/toolchain/log', methods=['GET'])
 def toolchain_log():
     """
     Return the last N lines of the toolchain setup log.
-    Query param ?lines=N (default 200).
+    Query param ?lines=N (default 200).  The X-Log-Offset header is the byte
+    offset the text ends at, for resuming with /api/toolchain/stream.
     """
-    log_path = '/tmp/toolchain_setup.log'
     try:
         n = int(request.args.get('lines', 200))
     except (ValueError, TypeError):
         n = 200
-    if not os.path.exists(log_path):
-        return '', 200
+    if not os.path.exists(TOOLCHAIN_LOG):
+        return '', 200, {'X-Log-Offset': '0'}
     try:
-        result = subprocess.run(['tail', '-n', str(n), log_path], capture_output=True, text=True)
-        return result.stdout, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+        with open(TOOLCHAIN_LOG, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - TOOLCHAIN_LOG_TAIL_BYTES))
+            data = f.read(size - f.tell())
+        lines = data.decode('utf-8', errors='replace').splitlines()[-n:] if n > 0 else []
+        text = '\n'.join(lines) + ('\n' if lines else '')
+        return text, 200, {'Content-Type': 'text/plain; charset=utf-8', 'X-Log-Offset': str(size)}
     except Exception as e:
         return f'Error reading log: {e}', 500
 
@@ -2569,13 +3370,22 @@ def track_activity():
         if session_id in sessions:
             # Reset the inactivity timer on user activity
             sessions[session_id]['last_activity'] = time.time()
+            _wake_session(session_id, "activity")
+            if sessions[session_id].get('hibernated'):
+                return _session_limit_response(_running_sessions(session_id))
     
     return jsonify({"status": "ok"})
 
 def monitor_activity():
+    last_artifact_gc = 0
     while True:
         time.sleep(10)
         now = time.time()
+
+        if now - last_artifact_gc > SESSION_ARTIFACT_GC_INTERVAL:
+            last_artifact_gc = now
+            _collect_session_artifacts()
+        _expire_build_states()
         
         with sessions_lock:
             active_sessions = list(sessions.keys())
@@ -2587,6 +3397,39 @@ def monitor_activity():
                 last_act = session.get('last_activity')
                 session_start = session.get('session_start_time', now)
                 log_path = session.get('log_path')
+                session_metrics = session.get('metrics')
+                pid = session.get('pid')
+                websockify_port = session.get('websockify_port')
+                stream_connections = session.get('connections', 0)
+                disconnected_at = session.get('disconnected_at')
+                hibernated = session.get('hibernated')
+
+            # Sample CPU/RSS of the session's process group (it leads its own
+            # group via start_new_session) and its viewer connections.
+            if session_metrics:
+                session_metrics.sample(pid, websockify_port, stream_connections)
+            vnc_clients = session_metrics.vnc_clients if session_metrics else 0
+
+            # Hibernation: stop the process group once nobody has watched for
+            # the grace period; a VNC client reconnecting straight to
+            # websockify (queued by the kernel while stopped) wakes it.
+            if hibernated:
+                if vnc_clients > 0:
+                    with sessions_lock:
+                        # Stays parked while MAX_CONCURRENT_SESSIONS others run.
+                        _wake_session(sid, "VNC client connected")
+                # Parked sessions are only bounded by the hard session limit.
+                if now - session_start > EMULATOR_MAX_SESSION_TIME:
+                    print(f"Session {sid} reached maximum duration ({EMULATOR_MAX_SESSION_TIME}s). Stopping...", flush=True)
+                    _stop_session(sid)
+                continue
+            if (stream_connections <= 0 and vnc_clients == 0 and disconnected_at is not None
+                    and now - disconnected_at > EMULATOR_HIBERNATE_GRACE):
+                with sessions_lock:
+                    if sid in sessions and sessions[sid].get('connections', 0) <= 0:
+                        _hibernate_session(sid)
+                _evict_hibernated_sessions()
+                continue
             
             # Check for hard session timeout (30 minutes max)
             if now - session_start > EMULATOR_MAX_SESSION_TIME:
@@ -2601,6 +3444,17 @@ def monitor_activity():
                     print(f"Session {sid} inactivity timeout reached ({EMULATOR_TIMEOUT}s). Stopping...", flush=True)
                     _stop_session(sid)
 
+def _evict_hibernated_sessions():
+    """Stop the longest-parked sessions beyond MAX_HIBERNATED_SESSIONS."""
+    with sessions_lock:
+        parked = sorted((s['hibernated_at'], sid) for sid, s in sessions.items() if s.get('hibernated'))
+    for _, sid in parked[:max(0, len(parked) - MAX_HIBERNATED_SESSIONS)]:
+        print(f"Session {sid}: too many hibernated sessions, stopping", flush=True)
+        _stop_session(sid)
+
+# Build logs spilled by a previous server process are unreachable now
+job_log.clear_spill_dir()
+
 # Start monitoring thread
 monitor_thread = threading.Thread(target=monitor_activity, daemon=True)
 monitor_thread.start()
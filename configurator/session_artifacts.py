@@ -0,0 +1,162 @@
+"""Disk-quota-bounded garbage collection for emulator session artifacts.
+
+Every emulator session leaves files behind in /tmp (often a tmpfs):
+
+  build      /tmp/esphome_sessions/<id>/.esphome — a full copy of the
+             pre-compiled build tree made by run_session.sh
+  log        /tmp/emulator_<id>.log
+  pio_cache  /tmp/pio_cache — PlatformIO download cache shared by all sessions
+
+collect() keeps their total size under a quota.  Artifacts of running
+sessions are never touched; the rest are evicted least-recently-used first,
+where "used" is the last time the session was started or stopped (touch()
+bumps the session directory's mtime).  Keeping recently used build dirs
+means a returning session ID warm-starts: run_session.sh skips seeding when
+its build directory still exists.  The shared PlatformIO cache is only
+evicted when session artifacts alone cannot bring usage under the quota.
+
+Sizes are measured during collect() and cached, so stats() is cheap enough
+for /api/metrics scrapes.
+"""
+import os
+import glob
+import time
+import shutil
+import threading
+
+SESSIONS_DIR = os.environ.get('EMULATOR_SESSIONS_DIR', '/tmp/esphome_sessions')
+LOG_PATTERN = os.environ.get('EMULATOR_LOG_PATTERN', '/tmp/emulator_*.log')
+PIO_CACHE_DIR = os.environ.get('EMULATOR_PIO_CACHE_DIR', '/tmp/pio_cache')
+QUOTA_MB = int(os.environ.get('SESSION_ARTIFACTS_MB', '2048'))
+
+_collect_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'evictions': 0, 'evicted_bytes': 0, 'collections': 0}
+_last_scan = {'artifacts': [], 'scanned_at': None}
+
+
+def touch(session_id):
+    """Mark *session_id*'s build directory as used now."""
+    path = os.path.join(SESSIONS_DIR, session_id)
+    try:
+        now = time.time()
+        os.utime(path, (now, now))
+    except OSError:
+        pass
+
+
+def _tree_size(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for fname in files:
+            try:
+                total += os.lstat(os.path.join(dirpath, fname)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _session_from_log(path):
+    name = os.path.basename(path)
+    prefix, suffix = LOG_PATTERN.rsplit('/', 1)[-1].split('*', 1)
+    return name[len(prefix):len(name) - len(suffix)] if suffix else name[len(prefix):]
+
+
+def scan():
+    """Return [{kind, session_id, path, bytes, last_used}] for every artifact."""
+    result = []
+    if os.path.isdir(SESSIONS_DIR):
+        for name in os.listdir(SESSIONS_DIR):
+            path = os.path.join(SESSIONS_DIR, name)
+            try:
+                last_used = os.path.getmtime(path)
+            except OSError:
+                continue
+            if os.path.isdir(path):
+                result.append({'kind': 'build', 'session_id': name, 'path': path,
+                               'bytes': _tree_size(path), 'last_used': last_used})
+    for path in glob.glob(LOG_PATTERN):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        result.append({'kind': 'log', 'session_id': _session_from_log(path), 'path': path,
+                       'bytes': st.st_size, 'last_used': st.st_mtime})
+    if os.path.isdir(PIO_CACHE_DIR):
+        try:
+            last_used = os.path.getmtime(PIO_CACHE_DIR)
+        except OSError:
+            last_used = 0
+        result.append({'kind': 'pio_cache', 'session_id': None, 'path': PIO_CACHE_DIR,
+                       'bytes': _tree_size(PIO_CACHE_DIR), 'last_used': last_used})
+    return result
+
+
+def _remove(artifact):
+    path = artifact['path']
+    if artifact['kind'] == 'log':
+        os.remove(path)
+    else:
+        shutil.rmtree(path)
+
+
+def collect(active_sessions=(), quota_mb=None):
+    """Evict LRU artifacts of inactive sessions until usage fits the quota.
+
+    Returns the list of evicted artifacts.
+    """
+    budget = (QUOTA_MB if quota_mb is None else quota_mb) * 1024 * 1024
+    active = set(active_sessions)
+    with _collect_lock:
+        artifacts = scan()
+        total = sum(a['bytes'] for a in artifacts)
+        candidates = sorted(
+            (a for a in artifacts if a['kind'] != 'pio_cache' and a['session_id'] not in active),
+            key=lambda a: a['last_used'])
+        # The shared PlatformIO cache goes last, and only if no session is running.
+        if not active:
+            candidates += [a for a in artifacts if a['kind'] == 'pio_cache']
+        evicted = []
+        for artifact in candidates:
+            if total <= budget:
+                break
+            try:
+                _remove(artifact)
+            except OSError as e:
+                print(f"[session_artifacts] Could not remove {artifact['path']}: {e}", flush=True)
+                continue
+            total -= artifact['bytes']
+            evicted.append(artifact)
+            print(f"[session_artifacts] Evicted {artifact['kind']} {artifact['path']} "
+                  f"({artifact['bytes'] // 1024} KB)", flush=True)
+        remaining = [a for a in artifacts if a not in evicted]
+        with _stats_lock:
+            _stats['collections'] += 1
+            _stats['evictions'] += len(evicted)
+            _stats['evicted_bytes'] += sum(a['bytes'] for a in evicted)
+            _last_scan['artifacts'] = remaining
+            _last_scan['scanned_at'] = time.time()
+    if total > budget:
+        print(f"[session_artifacts] Still {total // (1024 * 1024)} MB in use after collection "
+              f"(quota {budget // (1024 * 1024)} MB); remaining artifacts belong to running sessions", flush=True)
+    return evicted
+
+
+def stats():
+    """Return eviction counters and per-kind usage from the last collection."""
+    with _stats_lock:
+        counters = dict(_stats)
+        artifacts = list(_last_scan['artifacts'])
+        scanned_at = _last_scan['scanned_at']
+    by_kind = {}
+    for a in artifacts:
+        entry = by_kind.setdefault(a['kind'], {'count': 0, 'bytes': 0})
+        entry['count'] += 1
+        entry['bytes'] += a['bytes']
+    return {
+        **counters,
+        'bytes': sum(a['bytes'] for a in artifacts),
+        'quota_bytes': QUOTA_MB * 1024 * 1024,
+        'by_kind': by_kind,
+        'scanned_at': scanned_at,
+    }
@@ -0,0 +1,226 @@
+"""Per-session resource accounting for emulator sessions.
+
+Each emulator session owns a SessionMetrics object.  The session's output
+is pumped through ``observe_line`` as it is written to the log, so phase
+boundaries are timestamped when they happen instead of being reconstructed
+from the log later:
+
+  seed        run_session.sh copying the pre-compiled build into the session
+  config      ESPHome reading and validating the YAML
+  codegen     ESPHome generating C++ sources
+  compile     PlatformIO compiling translation units
+  link        linking the host program
+  first_frame session start until the tile view is initialised and shown
+
+CPU seconds and RSS of the whole process group (Xvfb, x11vnc, websockify,
+ESPHome, compiler and the emulator itself) are sampled from /proc by the
+activity monitor thread, together with the number of established viewer
+connections to the session's websockify port.  Time spent hibernated
+(process group stopped while no viewer is connected) is tracked as well.
+"""
+import os
+import time
+import threading
+
+_CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# (marker substring, event name) — first match per event wins.
+_LINE_MARKERS = (
+    ('Seeding session build cache', 'seed_start'),
+    ('Session build cache seeded', 'seed_end'),
+    ('Emulator binary cache hit', 'cache_hit'),
+    ('Reading configuration', 'config_start'),
+    ('Generating C++ source', 'codegen_start'),
+    ('Compiling app', 'compile_start'),
+    ('Linking .pioenvs', 'link_start'),
+    ('Successfully compiled program', 'build_end'),
+    ('Running through setup()', 'program_start'),
+    ('Tiles initialized', 'first_frame'),
+)
+
+# phase name -> (start event, end events in order of preference)
+_PHASES = {
+    'seed':    ('seed_start', ('seed_end', 'config_start')),
+    'config':  ('config_start', ('codegen_start',)),
+    'codegen': ('codegen_start', ('compile_start', 'link_start', 'build_end')),
+    'compile': ('compile_start', ('link_start', 'build_end')),
+    'link':    ('link_start', ('build_end',)),
+}
+
+
+def sample_process_group(pgid):
+    """Return {pid: (cpu_seconds, rss_bytes, ppid)} for every live process in *pgid*.
+
+    cpu_seconds includes the children the process has reaped (cutime and
+    cstime), so short-lived compiler processes that start and exit between
+    two samples are still counted.
+    """
+    result = {}
+    try:
+        pids = [p for p in os.listdir('/proc') if p.isdigit()]
+    except OSError:
+        return result
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                raw = f.read()
+        except OSError:
+            continue
+        # comm (field 2) may contain spaces; everything after the last ')' is
+        # space separated, starting at field 3 (state).
+        fields = raw[raw.rfind(')') + 2:].split()
+        try:
+            if int(fields[2]) != pgid:
+                continue
+            cpu = sum(int(v) for v in fields[11:15]) / _CLK_TCK
+            rss = int(fields[21]) * _PAGE_SIZE
+            ppid = int(fields[1])
+        except (IndexError, ValueError):
+            continue
+        result[int(pid)] = (cpu, rss, ppid)
+    return result
+
+
+def count_established(port):
+    """Count established TCP connections whose local port is *port*."""
+    if not port:
+        return 0
+    count = 0
+    for path in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(path) as f:
+                next(f, None)
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 4 or parts[3] != '01':  # 01 = ESTABLISHED
+                        continue
+                    if int(parts[1].rsplit(':', 1)[1], 16) == port:
+                        count += 1
+        except (OSError, ValueError):
+            continue
+    return count
+
+
+class SessionMetrics:
+    def __init__(self, session_id, screen_type=None, started_at=None):
+        self.session_id = session_id
+        self.screen_type = screen_type
+        self.started_at = started_at or time.time()
+        self.ended_at = None
+        self.events = {}  # event name -> wall-clock timestamp
+        self.cpu_seconds = 0.0
+        self.rss_bytes = 0
+        self.processes = 0
+        self.vnc_clients = 0
+        self.stream_connections = 0
+        self.sampled_at = None
+        self.hibernations = 0
+        self._hibernated_since = None
+        self._hibernated_total = 0.0
+        self._lock = threading.Lock()
+        self._pid_cpu = {}         # pid -> (last seen cpu seconds, ppid)
+        self._exited_cpu = 0.0     # cpu seconds of processes that have exited
+
+    def observe_line(self, line, now=None):
+        """Record phase markers found in one line of session output."""
+        for marker, event in _LINE_MARKERS:
+            if marker in line and event not in self.events:
+                with self._lock:
+                    self.events[event] = now or time.time()
+                break
+
+    def sample(self, pgid, websockify_port=None, stream_connections=0):
+        """Refresh CPU, RSS and viewer counts for the session's process group."""
+        procs = sample_process_group(pgid) if pgid else {}
+        vnc = count_established(websockify_port)
+        with self._lock:
+            for pid, (cpu, ppid) in self._pid_cpu.items():
+                # A child reaped by a parent still in the group is now part of
+                # the parent's cutime/cstime.
+                if pid not in procs and ppid not in procs:
+                    self._exited_cpu += cpu
+            self._pid_cpu = {pid: (cpu, ppid) for pid, (cpu, _, ppid) in procs.items()}
+            self.cpu_seconds = self._exited_cpu + sum(cpu for cpu, _ in self._pid_cpu.values())
+            self.rss_bytes = sum(rss for _, rss, _ in procs.values())
+            self.processes = len(procs)
+            self.vnc_clients = vnc
+            self.stream_connections = stream_connections
+            self.sampled_at = time.time()
+
+    def set_hibernated(self, hibernated, now=None):
+        """Record the session's process group being stopped or continued."""
+        now = now or time.time()
+        with self._lock:
+            if hibernated and self._hibernated_since is None:
+                self._hibernated_since = now
+                self.hibernations += 1
+            elif not hibernated and self._hibernated_since is not None:
+                self._hibernated_total += now - self._hibernated_since
+                self._hibernated_since = None
+
+    def hibernated_seconds(self, now=None):
+        with self._lock:
+            total = self._hibernated_total
+            if self._hibernated_since is not None:
+                total += (now or time.time()) - self._hibernated_since
+        return total
+
+    def finish(self):
+        self.set_hibernated(False)
+        self.ended_at = time.time()
+
+    def phase_durations(self):
+        """Return {phase: seconds} for every phase whose boundaries were seen."""
+        with self._lock:
+            events = dict(self.events)
+        durations = {}
+        for phase, (start, ends) in _PHASES.items():
+            if start not in events:
+                continue
+            end = next((events[e] for e in ends if e in events), None)
+            if end is not None:
+                durations[phase] = round(end - events[start], 3)
+        if 'first_frame' in events:
+            durations['first_frame'] = round(events['first_frame'] - self.started_at, 3)
+        return durations
+
+    def to_dict(self):
+        with self._lock:
+            cpu, rss, procs = self.cpu_seconds, self.rss_bytes, self.processes
+            vnc, streams, sampled = self.vnc_clients, self.stream_connections, self.sampled_at
+            cache_hit = 'cache_hit' in self.events
+            hibernated, hibernations = self._hibernated_since is not None, self.hibernations
+        end = self.ended_at or time.time()
+        return {
+            'session_id': self.session_id,
+            'screen_type': self.screen_type,
+            'started_at': self.started_at,
+            'ended_at': self.ended_at,
+            'uptime_s': round(end - self.started_at, 1),
+            'phases_s': self.phase_durations(),
+            'emulator_cache_hit': cache_hit,
+            'cpu_seconds': round(cpu, 2),
+            'rss_bytes': rss,
+            'processes': procs,
+            'vnc_clients': vnc,
+            'stream_connections': streams,
+            'hibernated': hibernated,
+            'hibernations': hibernations,
+            'hibernated_s': round(self.hibernated_seconds(), 1),
+            'sampled_at': sampled,
+        }
+
+    def samples(self):
+        """Yield Prometheus samples for this session."""
+        d = self.to_dict()
+        labels = {'session': self.session_id, 'screen_type': self.screen_type or ''}
+        for phase, seconds in d['phases_s'].items():
+            yield 'emulator_session_phase_seconds', {**labels, 'phase': phase}, seconds
+        yield 'emulator_session_cpu_seconds_total', labels, d['cpu_seconds']
+        yield 'emulator_session_rss_bytes', labels, d['rss_bytes']
+        yield 'emulator_session_processes', labels, d['processes']
+        yield 'emulator_session_vnc_clients', labels, d['vnc_clients']
+        yield 'emulator_session_uptime_seconds', labels, d['uptime_s']
+        yield 'emulator_session_hibernated', labels, d['hibernated']
+        yield 'emulator_session_hibernated_seconds_total', labels, d['hibernated_s']
@@ -0,0 +1,38 @@
+"""The one long-lived asyncio event loop shared by all HA proxies and state hubs.
+
+Started lazily on a daemon thread; everything that talks to emulators or to
+Home Assistant asynchronously is scheduled onto it with submit(), so the
+thread count does not grow with the number of sessions.
+"""
+import asyncio
+import threading
+
+_lock = threading.Lock()
+_loop = None
+
+
+def _run(loop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def get_loop():
+    """The shared loop, starting its thread on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_run, args=(_loop,), name='ha-proxy-loop', daemon=True).start()
+        return _loop
+
+
+def submit(coro):
+    """Schedule *coro* on the shared loop; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def task_count():
+    loop = _loop
+    if loop is None:
+        return 0
+    return len(asyncio.all_tasks(loop))
@@ -143,7 +143,8 @@ function App() {
     haUrl, setHaUrl,
     haToken, setHaToken,
     connectionType, setConnectionType,
-    haEntities,
+    searchHaEntities,
+    entityCount,
     haStatus,
     fetchHaEntities
   } = useHaConnection();
@@ -459,7 +460,7 @@ function App() {
       <TopBar 
         haStatus={haStatus}
         connectionType={connectionType}
-        entityCount={haEntities.length}
+        entityCount={entityCount}
         onOpenSettings={() => setIsHaSettingsOpen(true)}
         onRefreshHa={fetchHaEntities}
         canUndo={canUndo}
@@ -564,7 +565,7 @@ function App() {
           config={config}
           schema={schema}
           activePage={activePage}
-          haEntities={haEntities}
+          searchEntities={searchHaEntities}
           onUpdatePage={handleUpdatePage}
           onRenamePage={handleRenamePage}
           setConfig={setConfig}
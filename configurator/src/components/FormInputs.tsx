@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { Trash2, Plus, Upload, X } from 'lucide-react';
 import { apiFetch } from '../utils/api';
-import { HaEntity, ImageEntry, ScreenImageEntry } from '../types';
+import { HaEntitySearch, HaEntitySearchPage, ImageEntry, ScreenImageEntry } from '../types';
 import { IconPicker, ColorPicker } from './Pickers';
 
 export const NumberInput = ({ label, value, onChange, min = 0 }: { label: string, value: number, onChange: (v: number) => void, min?: number }) => (
@@ -17,7 +17,70 @@ export const NumberInput = ({ label, value, onChange, min = 0 }: { label: string
   </div>
 );
 
-export const TextInput = ({ label, value, onChange, haEntities }: { label: string, value: string, onChange: (v: string) => void, haEntities?: HaEntity[] }) => {
+const ENTITY_SEARCH_DEBOUNCE_MS = 200;
+
+// Suggestions for the inputs with list={id}: one page of server-side search
+// matches for the text of the focused input, with more pages on request.
+const EntityDatalist = ({ id, search }: { id: string, search: HaEntitySearch }) => {
+  const [query, setQuery] = useState<string | null>(null); // null while none of the inputs has focus
+  const [page, setPage] = useState<HaEntitySearchPage>({ total: 0, results: [] });
+
+  useEffect(() => {
+    const ours = (e: Event) => (e.target as HTMLElement | null)?.getAttribute?.('list') === id;
+    const track = (e: Event) => { if (ours(e)) setQuery((e.target as HTMLInputElement).value); };
+    const leave = (e: Event) => { if (ours(e)) setQuery(null); };
+    document.addEventListener('focusin', track);
+    document.addEventListener('input', track);
+    document.addEventListener('focusout', leave);
+    return () => {
+      document.removeEventListener('focusin', track);
+      document.removeEventListener('input', track);
+      document.removeEventListener('focusout', leave);
+    };
+  }, [id]);
+
+  useEffect(() => {
+    if (query === null) return;
+    let cancelled = false;
+    const timer = setTimeout(() => {
+      search(query, 0)
+        .then(result => { if (!cancelled) setPage(result); })
+        .catch(err => console.error("Entity search failed", err));
+    }, ENTITY_SEARCH_DEBOUNCE_MS);
+    return () => { cancelled = true; clearTimeout(timer); };
+  }, [query, search]);
+
+  const loadMore = () => {
+    search(query || '', page.results.length)
+      .then(result => setPage(prev => ({ total: result.total, results: [...prev.results, ...result.results] })))
+      .catch(err => console.error("Entity search failed", err));
+  };
+
+  return (
+    <>
+      <datalist id={id}>
+        {page.results.map(e => (
+          <option key={e.entity_id} value={e.entity_id}>
+            {e.friendly_name && e.friendly_name !== e.entity_id ? e.friendly_name : null}
+          </option>
+        ))}
+      </datalist>
+      {query !== null && page.total > page.results.length && (
+        <button
+          type="button"
+          // Keep focus on the input so its suggestions stay open.
+          onMouseDown={e => e.preventDefault()}
+          onClick={loadMore}
+          className="text-[10px] text-blue-600 hover:underline"
+        >
+          Show more matches ({page.results.length} of {page.total})
+        </button>
+      )}
+    </>
+  );
+};
+
+export const TextInput = ({ label, value, onChange, searchEntities }: { label: string, value: string, onChange: (v: string) => void, searchEntities?: HaEntitySearch }) => {
   const listId = `ha-entities-text-${Math.random().toString(36).substr(2, 9)}`;
   return (
   <div className="mb-2">
@@ -26,18 +89,10 @@ export const TextInput = ({ label, value, onChange, haEntities }: { label: strin
       type="text" 
       value={value || ''} 
       onChange={e => onChange(e.target.value)}
-      list={haEntities ? listId : undefined}
+      list={searchEntities ? listId : undefined}
       className="w-full border rounded p-1 text-sm"
     />
-    {haEntities && (
-        <datalist id={listId}>
-            {haEntities.map(e => (
-                <option key={e.entity_id} value={e.entity_id}>
-                    {e.friendly_name && e.friendly_name !== e.entity_id ? e.friendly_name : null}
-                </option>
-            ))}
-        </datalist>
-    )}
+    {searchEntities && <EntityDatalist id={listId} search={searchEntities} />}
   </div>
   );
 };
@@ -250,11 +305,11 @@ export const ArrayInput = ({ label, values, onChange, suggestionType, allowedVal
   );
 };
 
-export const EntityListInput = ({ label, values, onChange, haEntities }: { 
+export const EntityListInput = ({ label, values, onChange, searchEntities }: { 
   label: string, 
   values: string[], 
   onChange: (v: string[]) => void, 
-  haEntities?: HaEntity[]
+  searchEntities?: HaEntitySearch
 }) => {
   const safeValues = Array.isArray(values) ? values : (values ? [values] : []);
   const listId = `ha-entities-list-${Math.random().toString(36).substr(2, 9)}`;
@@ -284,13 +339,7 @@ export const EntityListInput = ({ label, values, onChange, haEntities }: {
             </button>
           </div>
         ))}
-        <datalist id={listId}>
-          {haEntities?.map(e => (
-            <option key={e.entity_id} value={e.entity_id}>
-              {e.friendly_name && e.friendly_name !== e.entity_id ? e.friendly_name : null}
-            </option>
-          ))}
-        </datalist>
+        {searchEntities && <EntityDatalist id={listId} search={searchEntities} />}
         <button 
           onClick={() => onChange([...safeValues, ''])}
           className="text-xs text-blue-600 hover:underline flex items-center gap-1"
@@ -430,13 +479,13 @@ export const ConditionBuilder = ({ value, onChange, scriptOptions: propScriptOpt
   );
 };
 
-export const ObjectInput = ({ label, value, fields, onChange, dynamicEntities, haEntities }: { 
+export const ObjectInput = ({ label, value, fields, onChange, dynamicEntities, searchEntities }: { 
   label: string, 
   value: any, 
   fields: { key: string, label: string, type?: string }[],
   onChange: (v: any) => void,
   dynamicEntities?: string[],
-  haEntities?: HaEntity[]
+  searchEntities?: HaEntitySearch
 }) => {
   const listId = `ha-entities-obj-${Math.random().toString(36).substr(2, 9)}`;
   return (
@@ -459,7 +508,7 @@ export const ObjectInput = ({ label, value, fields, onChange, dynamicEntities, h
                     <option value="">Select variable...</option>
                     {dynamicEntities.map(d => <option key={d} value={d}>{d}</option>)}
                 </select>
-            ) : field.type === 'ha_entity' && haEntities ? (
+            ) : field.type === 'ha_entity' && searchEntities ? (
                 <div className="relative">
                     <input 
                         type="text" 
@@ -471,13 +520,7 @@ export const ObjectInput = ({ label, value, fields, onChange, dynamicEntities, h
                         list={listId}
                         className="w-full border rounded p-1 text-xs"
                     />
-                    <datalist id={listId}>
-                        {haEntities.map(e => (
-                            <option key={e.entity_id} value={e.entity_id}>
-                                {e.friendly_name && e.friendly_name !== e.entity_id ? e.friendly_name : null}
-                            </option>
-                        ))}
-                    </datalist>
+                    <EntityDatalist id={listId} search={searchEntities} />
                 </div>
             ) : field.type === 'ha_entity_list' ? (
                 <EntityListInput 
@@ -487,7 +530,7 @@ export const ObjectInput = ({ label, value, fields, onChange, dynamicEntities, h
                         const newValue = { ...value, [field.key]: v };
                         onChange(newValue);
                     }}
-                    haEntities={haEntities}
+                    searchEntities={searchEntities}
                 />
             ) : field.type === 'string_list' ? (
                 <ArrayInput 
@@ -563,12 +606,12 @@ export const DynamicEntitiesEditor = ({ entities, onChange }: { entities: string
 );
 };
 
-export const EntityArrayInput = ({ label, values, onChange, dynamicEntities, haEntities }: { 
+export const EntityArrayInput = ({ label, values, onChange, dynamicEntities, searchEntities }: { 
   label: string, 
   values: any[], 
   onChange: (v: any[]) => void,
   dynamicEntities: string[],
-  haEntities?: HaEntity[]
+  searchEntities?: HaEntitySearch
 }) => {
   const safeValues = Array.isArray(values) ? values : (values ? [values] : []);
   const listId = `ha-entities-arr-${Math.random().toString(36).substr(2, 9)}`;
@@ -672,15 +715,7 @@ export const EntityArrayInput = ({ label, values, onChange, dynamicEntities, haE
         <Plus size={12} /> Add Entity
       </button>
     </div>
-    {haEntities && (
-        <datalist id={listId}>
-            {haEntities.map(e => (
-                <option key={e.entity_id} value={e.entity_id}>
-                    {e.friendly_name || e.entity_id}
-                </option>
-            ))}
-        </datalist>
-    )}
+    {searchEntities && <EntityDatalist id={listId} search={searchEntities} />}
   </div>
   );
 };
@@ -1574,12 +1609,12 @@ export const ImagesListInput = ({
   );
 };
 
-export const ObjectArrayInput = ({ label, values, fields, onChange, haEntities }: { 
+export const ObjectArrayInput = ({ label, values, fields, onChange, searchEntities }: { 
   label: string, 
   values: any[], 
   fields: { key: string, label: string, type?: string }[],
   onChange: (v: any[]) => void,
-  haEntities?: HaEntity[]
+  searchEntities?: HaEntitySearch
 }) => {
   const listId = `ha-entities-obj-arr-${Math.random().toString(36).substr(2, 9)}`;
   // Check if one of the fields is 'entity'
@@ -1638,7 +1673,7 @@ export const ObjectArrayInput = ({ label, values, fields, onChange, haEntities }
                       newValues[i] = { ...item, [field.key]: v };
                       onChange(newValues);
                     }}
-                    haEntities={haEntities}
+                    searchEntities={searchEntities}
                   />
                 ) : (
                   <input 
@@ -1665,15 +1700,7 @@ export const ObjectArrayInput = ({ label, values, fields, onChange, haEntities }
         <Plus size={12} /> Add Item
       </button>
     </div>
-    {haEntities && (
-        <datalist id={listId}>
-            {haEntities.map(e => (
-                <option key={e.entity_id} value={e.entity_id}>
-                    {e.friendly_name || e.entity_id}
-                </option>
-            ))}
-        </datalist>
-    )}
+    {searchEntities && <EntityDatalist id={listId} search={searchEntities} />}
   </div>
 );
 };
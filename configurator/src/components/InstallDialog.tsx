@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { X, Upload, RefreshCw, Wifi, WifiOff, Monitor, Square, ArrowLeft, ChevronDown, ChevronUp, Save, Usb, CheckCircle, AlertTriangle, ChevronRight, Settings } from 'lucide-react';
-import { apiFetch } from '../utils/api';
+import { apiFetch, apiEventSource } from '../utils/api';
 import { UsbInstallPanel } from './UsbInstallPanel';
 import { HwOverridesDialog } from './HwOverridesDialog';
 
@@ -46,9 +46,14 @@ export const InstallDialog: React.FC<InstallDialogProps> = ({
   const [loadingDevices, setLoadingDevices] = useState(false);
   const [logs, setLogs] = useState<string[]>([]);
   const [statusMessage, setStatusMessage] = useState('');
+  // Set while the install waits for a build slot (server build queue)
+  const [queueMessage, setQueueMessage] = useState('');
   const logsEndRef = useRef<HTMLDivElement>(null);
   const [logsExpanded, setLogsExpanded] = useState(true);
   const pollRef = useRef<ReturnType<typeof setInterval> | null>(null);
+  // Server-sent event stream of the install log (polling is the fallback)
+  const streamRef = useRef<EventSource | null>(null);
+  const closeStream = () => { streamRef.current?.close(); streamRef.current = null; };
   // Track whether an OTA install is running in the background (dialog hidden)
   const otaRunningRef = useRef(false);
   // Elapsed timer for the installing phase
@@ -90,6 +95,7 @@ export const InstallDialog: React.FC<InstallDialogProps> = ({
             const d = await sr.json();
             if (d.lines?.length) setLogs(prev => [...prev, ...d.lines]);
             offset = d.offset;
+            setQueueMessage(d.queued ? d.message : '');
             if (d.status === 'success') {
               clearInterval(pollRef.current!); pollRef.current = null;
               otaRunningRef.current = false; onOtaActiveChange?.(false);
@@ -105,7 +111,10 @@ export const InstallDialog: React.FC<InstallDialogProps> = ({
         poll();
       })
       .catch(() => {});
-    return () => { if (pollRef.current) { clearInterval(pollRef.current); pollRef.current = null; } };
+    return () => {
+      if (pollRef.current) { clearInterval(pollRef.current); pollRef.current = null; }
+      closeStream();
+    };
   // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
@@ -167,6 +176,7 @@ export const InstallDialog: React.FC<InstallDialogProps> = ({
         clearInterval(pollRef.current);
         pollRef.current = null;
       }
+      if (!otaRunningRef.current) closeStream();
     }
   }, [isOpen, fetchDevices]);
 
@@ -307,8 +317,20 @@ export const InstallDialog: React.FC<InstallDialogProps> = ({
       const startData = await res.json();
       setLogs(prev => [...prev, startData.message || 'Install started...']);
 
-      // Step 3: Poll for progress
+      // Step 3: Follow progress
       let offset = 0;
+      const applyStatus = (data: any) => {
+        setQueueMessage(data.queued ? data.message : '');
+        if (data.status === 'success' || data.status === 'error') {
+          if (pollRef.current) clearInterval(pollRef.current);
+          pollRef.current = null;
+          closeStream();
+          otaRunningRef.current = false;
+          onOtaActiveChange?.(false);
+          setStatus(data.status);
+          setStatusMessage(data.message);
+        }
+      };
       const poll = async () => {
         try {
           const statusRes = await apiFetch(`/esphome/install/status?offset=${offset}`);
@@ -328,22 +350,7 @@ export const InstallDialog: React.FC<InstallDialogProps> = ({
             setLogs(prev => [...prev, ...data.lines]);
           }
           offset = data.offset;
-
-          if (data.status === 'success') {
-            if (pollRef.current) clearInterval(pollRef.current);
-            pollRef.current = null;
-            otaRunningRef.current = false;
-            onOtaActiveChange?.(false);
-            setStatus('success');
-            setStatusMessage(data.message);
-          } else if (data.status === 'error') {
-            if (pollRef.current) clearInterval(pollRef.current);
-            pollRef.current = null;
-            otaRunningRef.current = false;
-            onOtaActiveChange?.(false);
-            setStatus('error');
-            setStatusMessage(data.message);
-          }
+          applyStatus(data);
         } catch (e) {
           console.error('Poll error:', e);
           // Don't stop polling on transient network errors
@@ -354,10 +361,38 @@ export const InstallDialog: React.FC<InstallDialogProps> = ({
       otaRunningRef.current = true;
       onOtaActiveChange?.(true);
 
-      // Poll every 1.5 seconds
-      pollRef.current = setInterval(poll, 1500);
-      // Also poll immediately
-      poll();
+      const startPolling = () => {
+        // Poll every 1.5 seconds
+        pollRef.current = setInterval(poll, 1500);
+        // Also poll immediately
+        poll();
+      };
+
+      // Prefer the server-sent event stream; it reconnects by itself (resuming
+      // from the last line seen) and is only given up on if the server refuses
+      // it, e.g. when all stream slots are taken.
+      if (typeof EventSource === 'undefined') {
+        startPolling();
+      } else {
+        const es = apiEventSource('/esphome/install/stream', offset);
+        streamRef.current = es;
+        es.addEventListener('log', (e) => {
+          const data = JSON.parse((e as MessageEvent).data);
+          setLogs(prev => [...prev, ...data.lines]);
+          offset = data.offset;
+        });
+        es.addEventListener('status', (e) => {
+          const data = JSON.parse((e as MessageEvent).data);
+          setQueueMessage(data.queued ? data.message : '');
+        });
+        es.addEventListener('done', (e) => applyStatus(JSON.parse((e as MessageEvent).data)));
+        es.onerror = () => {
+          if (es.readyState === EventSource.CLOSED && streamRef.current === es) {
+            closeStream();
+            startPolling();
+          }
+        };
+      }
 
     } catch (e) {
       setStatus('error');
@@ -392,6 +427,7 @@ export const InstallDialog: React.FC<InstallDialogProps> = ({
       clearInterval(pollRef.current);
       pollRef.current = null;
     }
+    closeStream();
     otaRunningRef.current = false;
     onOtaActiveChange?.(false);
     try {
@@ -662,7 +698,9 @@ export const InstallDialog: React.FC<InstallDialogProps> = ({
                         <span className="font-mono text-xs opacity-60">{Math.floor(elapsed/60)}:{String(elapsed%60).padStart(2,'0')}</span>
                       </div>
                       <div className="text-[10px] opacity-70">
-                        {lastLogAge >= 10
+                        {queueMessage
+                          ? queueMessage
+                          : lastLogAge >= 10
                           ? `No new output for ${lastLogAge}s — compiling (this is normal for CMake/ESP-IDF phases)`
                           : 'Compiling and uploading via OTA. This may take a few minutes.'}
                       </div>
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { Trash2, Layout, Settings2, Plus } from 'lucide-react';
-import { Tile, Config, Page, HaEntity, ImageEntry, ScreenBgEntry, ScreenImageEntry } from '../types';
+import { Tile, Config, Page, HaEntitySearch, ImageEntry, ScreenBgEntry, ScreenImageEntry } from '../types';
 import { 
   TextInput, 
   Checkbox, 
@@ -18,7 +18,7 @@ import { DisplayListInput } from './DisplayListInput';
 import { ColorPicker } from './Pickers';
 import { apiFetch } from '../utils/api';
 
-export const Sidebar = ({ selectedTile, onUpdate, onDelete, config, schema, activePage, onUpdatePage, onRenamePage, haEntities, setConfig, screenImages }: { 
+export const Sidebar = ({ selectedTile, onUpdate, onDelete, config, schema, activePage, onUpdatePage, onRenamePage, searchEntities, setConfig, screenImages }: { 
   selectedTile: Tile | null, 
   onUpdate: (t: Tile) => void, 
   onDelete: () => void,
@@ -27,7 +27,7 @@ export const Sidebar = ({ selectedTile, onUpdate, onDelete, config, schema, acti
   activePage: Page,
   onUpdatePage: (p: Page) => void,
   onRenamePage: (oldId: string, newId: string) => void,
-  haEntities: HaEntity[],
+  searchEntities: HaEntitySearch,
   setConfig?: (config: Config) => void,
   screenImages?: Record<string, ScreenImageEntry>
 }) => {
@@ -830,7 +830,7 @@ export const Sidebar = ({ selectedTile, onUpdate, onDelete, config, schema, acti
                               fields={field.objectFields}
                               onChange={v => onUpdate({...selectedTile, [field.name]: v})}
                               dynamicEntities={dynamicEntities}
-                              haEntities={haEntities}
+                              searchEntities={searchEntities}
                             />
                           </div>
                         )}
@@ -854,7 +854,7 @@ export const Sidebar = ({ selectedTile, onUpdate, onDelete, config, schema, acti
                           label={field.label}
                           value={selectedTile[field.name] || ''}
                           onChange={v => onUpdate({...selectedTile, [field.name]: v})}
-                          haEntities={field.type === 'ha_entity' ? haEntities : undefined}
+                          searchEntities={field.type === 'ha_entity' ? searchEntities : undefined}
                         />
                       );
                     }
@@ -865,7 +865,7 @@ export const Sidebar = ({ selectedTile, onUpdate, onDelete, config, schema, acti
                           label={field.label}
                           values={selectedTile[field.name] || []}
                           onChange={v => onUpdate({...selectedTile, [field.name]: v})}
-                          haEntities={haEntities}
+                          searchEntities={searchEntities}
                         />
                       );
                     }
@@ -909,7 +909,7 @@ export const Sidebar = ({ selectedTile, onUpdate, onDelete, config, schema, acti
                           values={selectedTile[field.name] || []}
                           onChange={v => onUpdate({...selectedTile, [field.name]: v})}
                           dynamicEntities={dynamicEntities}
-                          haEntities={haEntities}
+                          searchEntities={searchEntities}
                         />
                       );
                     }
@@ -946,7 +946,7 @@ export const Sidebar = ({ selectedTile, onUpdate, onDelete, config, schema, acti
                                   fields={field.objectFields}
                                   onChange={v => onUpdate({...selectedTile, [field.name]: v})}
                                   dynamicEntities={dynamicEntities}
-                                  haEntities={haEntities}
+                                  searchEntities={searchEntities}
                                 />
                               </div>
                             )}
@@ -961,7 +961,7 @@ export const Sidebar = ({ selectedTile, onUpdate, onDelete, config, schema, acti
                           fields={field.objectFields}
                           onChange={v => onUpdate({...selectedTile, [field.name]: v})}
                           dynamicEntities={dynamicEntities}
-                          haEntities={haEntities}
+                          searchEntities={searchEntities}
                         />
                       );
                     }
@@ -973,7 +973,7 @@ export const Sidebar = ({ selectedTile, onUpdate, onDelete, config, schema, acti
                           values={selectedTile[field.name] || []}
                           fields={field.objectFields}
                           onChange={v => onUpdate({...selectedTile, [field.name]: v})}
-                          haEntities={haEntities}
+                          searchEntities={searchEntities}
                         />
                       );
                     }
@@ -21,7 +21,9 @@ import {
   ChevronDown
 } from 'lucide-react';
 import { ConnectionType, HaStatus } from '../hooks/useHaConnection';
-import { apiFetch } from '../utils/api';
+import { apiFetch, apiEventSource } from '../utils/api';
+
+const TOOLCHAIN_LOG_LINES = 400;
 
 interface TopBarProps {
   haStatus: HaStatus;
@@ -141,18 +143,48 @@ export const TopBar: React.FC<TopBarProps> = ({
   };
   const logEndRef = useRef<HTMLDivElement>(null);
 
+  const toolchainReady = toolchainPhase === 'ready';
   useEffect(() => {
     if (!showLog) return;
+    let cancelled = false;
+    let es: EventSource | null = null;
+    let pollId: ReturnType<typeof setInterval> | null = null;
     const fetchLog = async () => {
       try {
-        const res = await apiFetch('/toolchain/log?lines=400');
-        if (res.ok) { const t = await res.text(); setLogContent(t); }
+        const res = await apiFetch(`/toolchain/log?lines=${TOOLCHAIN_LOG_LINES}`);
+        if (res.ok) {
+          const t = await res.text();
+          if (!cancelled) setLogContent(t);
+          return Number(res.headers.get('X-Log-Offset') || 0);
+        }
       } catch { /* ignore */ }
+      return null;
+    };
+    const startPolling = () => { pollId = setInterval(fetchLog, 2000); };
+
+    // Show the tail, then follow the log over server-sent events from where it
+    // ended; poll the tail instead if the stream is refused.  The stream ends
+    // once setup is ready, and this reopens it when an update starts.
+    fetchLog().then(offset => {
+      if (cancelled) return;
+      if (offset === null || typeof EventSource === 'undefined') { startPolling(); return; }
+      es = apiEventSource('/toolchain/stream', offset);
+      es.addEventListener('log', (e) => {
+        const data = JSON.parse((e as MessageEvent).data);
+        setLogContent(prev => (prev + data.lines.map((l: string) => l + '\n').join(''))
+          .split('\n').slice(-TOOLCHAIN_LOG_LINES - 1).join('\n'));
+      });
+      es.addEventListener('done', () => { es?.close(); es = null; });
+      es.onerror = () => {
+        if (es && es.readyState === EventSource.CLOSED) { es = null; startPolling(); }
+      };
+    });
+    return () => {
+      cancelled = true;
+      es?.close();
+      if (pollId) clearInterval(pollId);
     };
-    fetchLog();
-    const id = setInterval(fetchLog, 2000);
-    return () => clearInterval(id);
-  }, [showLog]);
+  }, [showLog, toolchainReady]);
 
   useEffect(() => {
     if (showLog) logEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { Usb, RefreshCw, ChevronDown, ChevronUp, Square, AlertTriangle, Key, Monitor, Plus, FolderOpen, Wifi, Eye, EyeOff } from 'lucide-react';
-import { apiFetch, isAddon } from '../utils/api';
+import { apiFetch, apiEventSource, isAddon } from '../utils/api';
 
 // Types for Web Serial API (not in standard TS lib)
 declare global {
@@ -99,11 +99,20 @@ export const UsbInstallPanel: React.FC<UsbInstallPanelProps> = ({
   const [port, setPort] = useState<SerialPort | null>(null);
   const [status, setStatus] = useState<UsbStatus>('idle');
   const [statusMessage, setStatusMessage] = useState('');
+  // Set while the compile waits for a build slot (server build queue)
+  const [queueMessage, setQueueMessage] = useState('');
   const [logs, setLogs] = useState<string[]>([]);
   const [logsExpanded, setLogsExpanded] = useState(true);
   const [flashProgress, setFlashProgress] = useState(0);
   const logsEndRef = useRef<HTMLDivElement>(null);
   const pollRef = useRef<ReturnType<typeof setInterval> | null>(null);
+  // Server-sent event stream of the compile log (polling is the fallback)
+  const streamRef = useRef<EventSource | null>(null);
+  const stopFollowing = () => {
+    if (pollRef.current) { clearInterval(pollRef.current); pollRef.current = null; }
+    streamRef.current?.close();
+    streamRef.current = null;
+  };
   const compiledDeviceNameRef = useRef<string>('');
 
   // Config mode: use existing file or create new
@@ -175,14 +184,9 @@ export const UsbInstallPanel: React.FC<UsbInstallPanelProps> = ({
     }
   }, [logs, hidden]);
 
-  // ── Cleanup poll on unmount ──────────────────────────────────
+  // ── Stop following the compile on unmount ───────────────────
   useEffect(() => {
-    return () => {
-      if (pollRef.current) {
-        clearInterval(pollRef.current);
-        pollRef.current = null;
-      }
-    };
+    return () => stopFollowing();
   }, []);
 
   // ── Check for already-granted serial ports ───────────────────
@@ -239,7 +243,7 @@ export const UsbInstallPanel: React.FC<UsbInstallPanelProps> = ({
           notifyCompileActive(true);
           if (data.lines?.length > 0) setLogs(data.lines);
           if (data.device_name) compiledDeviceNameRef.current = data.device_name;
-          startCompilePoll(data.offset || 0);
+          followCompile(data.offset || 0);
         }
       } catch {
         // No active compile
@@ -249,17 +253,31 @@ export const UsbInstallPanel: React.FC<UsbInstallPanelProps> = ({
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
-  // ── Compile polling ──────────────────────────────────────────
-  const startCompilePoll = useCallback((initialOffset: number) => {
-    if (pollRef.current) { clearInterval(pollRef.current); pollRef.current = null; }
+  // ── Follow compile progress ──────────────────────────────────
+  const followCompile = useCallback((initialOffset: number) => {
+    stopFollowing();
     let offset = initialOffset;
 
+    const applyStatus = (data: any) => {
+      setQueueMessage(data.queued ? data.message : '');
+      if (data.device_name) compiledDeviceNameRef.current = data.device_name;
+      if (data.status === 'success') {
+        stopFollowing();
+        setStatus('compiled');
+        notifyCompileActive(false);
+      } else if (data.status === 'error') {
+        stopFollowing();
+        setStatus('error');
+        setStatusMessage(data.message || 'Compilation failed');
+        notifyCompileActive(false);
+      }
+    };
+
     const poll = async () => {
       try {
         const statusRes = await apiFetch(`/esphome/compile/status?offset=${offset}`);
         if (!statusRes.ok) {
-          if (pollRef.current) clearInterval(pollRef.current);
-          pollRef.current = null;
+          stopFollowing();
           setStatus('error');
           setStatusMessage('Lost connection to compile process');
           notifyCompileActive(false);
@@ -268,27 +286,42 @@ export const UsbInstallPanel: React.FC<UsbInstallPanelProps> = ({
         const data = await statusRes.json();
         if (data.lines?.length > 0) setLogs(prev => [...prev, ...data.lines]);
         offset = data.offset;
-        if (data.device_name) compiledDeviceNameRef.current = data.device_name;
-
-        if (data.status === 'success') {
-          if (pollRef.current) clearInterval(pollRef.current);
-          pollRef.current = null;
-          setStatus('compiled');
-          notifyCompileActive(false);
-        } else if (data.status === 'error') {
-          if (pollRef.current) clearInterval(pollRef.current);
-          pollRef.current = null;
-          setStatus('error');
-          setStatusMessage(data.message || 'Compilation failed');
-          notifyCompileActive(false);
-        }
+        applyStatus(data);
       } catch (e) {
         console.error('Compile poll error:', e);
       }
     };
 
-    pollRef.current = setInterval(poll, 1500);
-    poll();
+    const startPolling = () => {
+      pollRef.current = setInterval(poll, 1500);
+      poll();
+    };
+
+    // Prefer the server-sent event stream, as the OTA install does; fall back
+    // to polling if the server refuses it (e.g. all stream slots taken).
+    if (typeof EventSource === 'undefined') {
+      startPolling();
+      return;
+    }
+    const es = apiEventSource('/esphome/compile/stream', offset);
+    streamRef.current = es;
+    es.addEventListener('log', (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      setLogs(prev => [...prev, ...data.lines]);
+      offset = data.offset;
+    });
+    es.addEventListener('status', (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      setQueueMessage(data.queued ? data.message : '');
+      if (data.device_name) compiledDeviceNameRef.current = data.device_name;
+    });
+    es.addEventListener('done', (e) => applyStatus(JSON.parse((e as MessageEvent).data)));
+    es.onerror = () => {
+      if (es.readyState === EventSource.CLOSED && streamRef.current === es) {
+        streamRef.current = null;
+        startPolling();
+      }
+    };
   }, [notifyCompileActive]);
 
   // ── When compile finishes, auto-proceed to firmware download + flash ──
@@ -703,8 +736,8 @@ export const UsbInstallPanel: React.FC<UsbInstallPanelProps> = ({
       if (startData.device_name) compiledDeviceNameRef.current = startData.device_name;
       setLogs(prev => [...prev, startData.message || 'Compilation started...']);
 
-      // Start polling — compile success triggers download+flash via useEffect
-      startCompilePoll(0);
+      // Follow the log — compile success triggers download+flash via useEffect
+      followCompile(0);
 
     } catch (e) {
       setStatus('error');
@@ -714,7 +747,7 @@ export const UsbInstallPanel: React.FC<UsbInstallPanelProps> = ({
   };
 
   const handleCancel = async () => {
-    if (pollRef.current) { clearInterval(pollRef.current); pollRef.current = null; }
+    stopFollowing();
     if (status === 'compiling') {
       try { await apiFetch('/esphome/compile/cancel', { method: 'POST' }); } catch { /* */ }
     }
@@ -732,7 +765,7 @@ export const UsbInstallPanel: React.FC<UsbInstallPanelProps> = ({
     setStatusMessage('');
     setFlashProgress(0);
     compiledDeviceNameRef.current = '';
-    if (pollRef.current) { clearInterval(pollRef.current); pollRef.current = null; }
+    stopFollowing();
     notifyCompileActive(false);
   };
 
@@ -1029,7 +1062,8 @@ export const UsbInstallPanel: React.FC<UsbInstallPanelProps> = ({
                      'Compiling firmware...'}
                   </div>
                   <div className="text-[10px] opacity-70">
-                    {status === 'compiling' ? 'This may take a few minutes. You can close this dialog — compilation continues in the background.' :
+                    {status === 'compiling' && queueMessage ? queueMessage :
+                     status === 'compiling' ? 'This may take a few minutes. You can close this dialog — compilation continues in the background.' :
                      status === 'saving' ? 'Preparing device config.' :
                      status === 'downloading' ? 'Fetching compiled firmware from server.' :
                      'Preparing flash...'}
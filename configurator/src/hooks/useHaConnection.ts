@@ -1,10 +1,12 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useMemo } from 'react';
 import { apiFetch, isAddon } from '../utils/api';
-import { HaEntity } from '../types';
+import { HaEntitySearch } from '../types';
 
 export type HaStatus = 'connected' | 'error' | 'mock' | 'idle';
 export type ConnectionType = 'local' | 'remote' | 'mock';
 
+const ENTITY_SEARCH_LIMIT = 25;
+
 export function useHaConnection() {
   const [haUrl, setHaUrl] = useState(() => localStorage.getItem('ha_url') || 'http://homeassistant.local:8123');
   const [haToken, setHaToken] = useState(() => localStorage.getItem('ha_token') || '');
@@ -22,7 +24,7 @@ export function useHaConnection() {
     if (localStorage.getItem('ha_use_mock') === 'true') return 'mock';
     return 'remote';
   });
-  const [haEntities, setHaEntities] = useState<HaEntity[]>([]);
+  const [entityCount, setEntityCount] = useState(0);
   const [haStatus, setHaStatus] = useState<HaStatus>('idle');
   const [refreshTrigger, setRefreshTrigger] = useState(0);
 
@@ -33,41 +35,39 @@ export function useHaConnection() {
     localStorage.setItem('ha_use_mock', (connectionType === 'mock').toString());
   }, [haUrl, haToken, connectionType]);
 
+  const haHeaders = useMemo(() => {
+    const headers: Record<string, string> = {};
+    if (connectionType === 'mock') {
+      headers['x-ha-mock'] = 'true';
+    } else if (connectionType === 'remote') {
+      headers['x-ha-url'] = haUrl;
+      headers['x-ha-token'] = haToken;
+    }
+    return headers;
+  }, [haUrl, haToken, connectionType]);
+
+  // Entity pickers search on the server instead of downloading every state.
+  const searchHaEntities = useCallback<HaEntitySearch>(async (query, offset) => {
+    const params = new URLSearchParams({ q: query, limit: String(ENTITY_SEARCH_LIMIT), offset: String(offset) });
+    const res = await apiFetch(`/ha/search?${params}`, { headers: haHeaders });
+    if (!res.ok) throw new Error(`Entity search failed: ${res.status}`);
+    const data = await res.json();
+    return { total: data.total, results: data.results };
+  }, [haHeaders]);
+
   const fetchHaEntities = useCallback(async () => {
     setHaStatus('idle');
-    setHaEntities([]);
+    setEntityCount(0);
     
     try {
-      const headers: Record<string, string> = {};
-      
-      if (connectionType === 'mock') {
-        headers['x-ha-mock'] = 'true';
-      } else if (connectionType === 'remote') {
-        headers['x-ha-url'] = haUrl;
-        headers['x-ha-token'] = haToken;
-      }
-
-      const res = await apiFetch('/ha/states', { headers });
-      if (res.ok) {
-        const data = await res.json();
-        if (Array.isArray(data)) {
-          const entities = data.map((s: any) => ({
-            entity_id: s.entity_id,
-            friendly_name: s.attributes?.friendly_name
-          })).sort((a: HaEntity, b: HaEntity) => a.entity_id.localeCompare(b.entity_id));
-          setHaEntities(entities);
-          setHaStatus(connectionType === 'mock' ? 'mock' : 'connected');
-        } else {
-          setHaStatus('error');
-        }
-      } else {
-        setHaStatus('error');
-      }
+      const { total } = await searchHaEntities('', 0);
+      setEntityCount(total);
+      setHaStatus(connectionType === 'mock' ? 'mock' : 'connected');
     } catch (err) {
       console.error("Failed to fetch HA entities", err);
       setHaStatus('error');
     }
-  }, [haUrl, haToken, connectionType]);
+  }, [searchHaEntities, connectionType]);
 
   useEffect(() => {
     fetchHaEntities();
@@ -80,7 +80,8 @@ export function useHaConnection() {
     setHaToken,
     connectionType,
     setConnectionType,
-    haEntities,
+    searchHaEntities,
+    entityCount,
     haStatus,
     fetchHaEntities: () => setRefreshTrigger(prev => prev + 1)
   };
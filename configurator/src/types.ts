@@ -50,3 +50,11 @@ export interface HaEntity {
   entity_id: string;
   friendly_name?: string;
 }
+
+// One page of /api/ha/search results.
+export interface HaEntitySearchPage {
+  total: number;
+  results: HaEntity[];
+}
+
+export type HaEntitySearch = (query: string, offset: number) => Promise<HaEntitySearchPage>;
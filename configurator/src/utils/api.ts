@@ -35,3 +35,10 @@ export async function apiFetch(path: string, options: RequestInit = {}, override
     headers 
   });
 }
+
+// Server-sent events from a /stream endpoint (build logs).  EventSource cannot
+// send headers, so the session ID goes in the query string instead.
+export function apiEventSource(path: string, offset = 0) {
+  const url = `${API_BASE}${path.startsWith('/') ? path : '/' + path}`;
+  return new EventSource(`${url}?offset=${offset}&session_id=${encodeURIComponent(SESSION_ID)}`);
+}
@@ -61,6 +61,11 @@ _SCRIPT_DIR         = os.path.dirname(os.path.abspath(__file__))
 EMULATOR_MARKER     = os.path.join(PIO_DIR, '.emulator_prebuilt')
 ESPHOME_DIR         = '/app/esphome'
 PREPARE_PRECACHE    = os.path.join(_SCRIPT_DIR, 'prepare_precache.py')
+# Warm device build seeds, one per lib/<screen>_base.yaml (see
+# configurator/device_seeds.py, which clones them; the names must match).
+DEVICE_SEED_MARKER  = os.path.join(PIO_DIR, '.device_seeds_prebuilt')
+DEVICE_SEED_NAME    = 'seed-{screen}'             # esphome.name of a seed build
+DEVICE_SEED_CONFIG  = 'device_seed_{screen}.yaml'  # its config file in ESPHOME_DIR
 
 # ─── Helpers ─────────────────────────────────────────────────────────────────
 
@@ -655,6 +660,35 @@ def _emulator_config_hash() -> str:
 
 
 def maybe_warm_cache() -> None:
+    """Warm the emulator build cache, then the per-screen device seeds."""
+    _warm_emulator_cache()
+    maybe_build_device_seeds()
+
+
+def _warming_env() -> dict:
+    """Environment for the warming compiles; they all write under lib/.esphome."""
+    _esphome_data_dir = os.path.join(ESPHOME_DIR, 'lib', '.esphome')
+    env = os.environ.copy()
+    env['ESPHOME_DATA_DIR']       = _esphome_data_dir
+    env['CCACHE_DIR']             = f'{PIO_DIR}/.ccache'
+    env['CCACHE_MAXSIZE']         = '2G'
+    env['CCACHE_COMPILERCHECK']   = 'content'
+    env['CCACHE_SLOPPINESS']      = 'include_file_mtime,pch_defines,time_macros'
+    env['CCACHE_NOHASHDIR']       = 'true'
+    # Strip the data-dir prefix from absolute compiler -I paths before hashing.
+    # Sessions set CCACHE_BASEDIR=$SESSION_ESPHOME (their own data dir), so
+    # both sides normalize to the same relative path and get cache hits.
+    env['CCACHE_BASEDIR']         = _esphome_data_dir
+    # Cap at 1 on arm64 (RPi4) to avoid OOM-killing Gunicorn; 2 on amd64.
+    env['CMAKE_BUILD_PARALLEL_LEVEL'] = '1' if get_arch() == 'arm64' else '2'
+    os.makedirs(env['CCACHE_DIR'], exist_ok=True)
+    ccache_bin = '/usr/local/lib/ccache'
+    if os.path.isdir(ccache_bin):
+        env['PATH'] = f'{ccache_bin}:{env.get("PATH", "")}'
+    return env
+
+
+def _warm_emulator_cache() -> None:
     """Pre-compile the emulator for both screen sizes to warm the ccache.
 
     Skipped when the marker already exists with the current ESPHome version
@@ -696,25 +730,8 @@ def maybe_warm_cache() -> None:
 
     log('Warming emulator cache...')
 
-    # Warming always writes to this fixed path; run_session.sh seeds from here.
-    _esphome_data_dir = os.path.join(ESPHOME_DIR, 'lib', '.esphome')
-    env = os.environ.copy()
-    env['ESPHOME_DATA_DIR']       = _esphome_data_dir
-    env['CCACHE_DIR']             = f'{PIO_DIR}/.ccache'
-    env['CCACHE_MAXSIZE']         = '2G'
-    env['CCACHE_COMPILERCHECK']   = 'content'
-    env['CCACHE_SLOPPINESS']      = 'include_file_mtime,time_macros'
-    env['CCACHE_NOHASHDIR']       = 'true'
-    # Strip the data-dir prefix from absolute compiler -I paths before hashing.
-    # Sessions set CCACHE_BASEDIR=$SESSION_ESPHOME (their own data dir), so
-    # both sides normalize to the same relative path and get cache hits.
-    env['CCACHE_BASEDIR']         = _esphome_data_dir
-    # Cap at 1 on arm64 (RPi4) to avoid OOM-killing Gunicorn; 2 on amd64.
-    env['CMAKE_BUILD_PARALLEL_LEVEL'] = '1' if get_arch() == 'arm64' else '2'
-    os.makedirs(env['CCACHE_DIR'], exist_ok=True)
-    ccache_bin = '/usr/local/lib/ccache'
-    if os.path.isdir(ccache_bin):
-        env['PATH'] = f'{ccache_bin}:{env.get("PATH", "")}'
+    # Warming always writes to lib/.esphome; run_session.sh seeds from there.
+    env = _warming_env()
 
     # Step 1 — generate test_device_tiles.yaml + PNG files.
     write_progress('warming', 85, 'Warming cache: preparing assets...')
@@ -778,6 +795,144 @@ def maybe_warm_cache() -> None:
     log('Cache warming complete.')
 
 
+def _device_seed_screens() -> list:
+    """Screen types with a lib/<screen>_base.yaml."""
+    lib = os.path.join(ESPHOME_DIR, 'lib')
+    try:
+        names = os.listdir(lib)
+    except OSError:
+        return []
+    return sorted(n[:-len('_base.yaml')] for n in names if n.endswith('_base.yaml'))
+
+
+def _device_seed_config_hash(screens: list) -> str:
+    """Short hash of the files a device seed build is made from."""
+    import hashlib
+    h = hashlib.md5()
+    rels = [f'lib/{screen}_base.yaml' for screen in screens] + [
+        'lib/lib.yaml',
+        'lib/lib_common.yaml',
+        'external_components/tile_ui/__init__.py',
+    ]
+    for rel in rels:
+        try:
+            with open(os.path.join(ESPHOME_DIR, rel), 'rb') as f:
+                h.update(f.read())
+        except OSError:
+            h.update(rel.encode())
+    return h.hexdigest()[:12]
+
+
+def _device_seed_yaml(screen: str) -> str:
+    """A device config shaped like the ones the configurator saves."""
+    return (
+        'substitutions:\n'
+        f'  device_name: "{DEVICE_SEED_NAME.format(screen=screen)}"\n'
+        f'  friendly_name: {DEVICE_SEED_NAME.format(screen=screen)}\n'
+        '\n'
+        'packages:\n'
+        f'  device_base: !include lib/{screen}_base.yaml\n'
+        '  lib: !include lib/lib.yaml\n'
+        '\n'
+        'esphome:\n'
+        '  name: $device_name\n'
+        '  friendly_name: $friendly_name\n'
+        '\n'
+        'api:\n'
+        '  encryption:\n'
+        '    key: "AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA="\n'
+        '\n'
+        'ota:\n'
+        '  - platform: esphome\n'
+        '\n'
+        'tile_ui:\n'
+        '  tiles_file: lib/test_device_tiles.yaml\n'
+    )
+
+
+def maybe_build_device_seeds() -> None:
+    """Compile one device build per screen type for first-time device builds.
+
+    The configurator clones lib/.esphome/build/seed-<screen> into a device's
+    empty build directory (configurator/device_seeds.py), so a device's
+    first compile starts with PlatformIO's libraries resolved and the
+    framework already built instead of from nothing.  Built like the
+    emulator seed: same data dir, same ccache settings.  Skipped when the
+    marker matches the ESPHome version and seed inputs and every seed exists.
+    Failures are non-fatal: the marker is not written, so the next startup
+    retries.
+    """
+    if not shutil.which('esphome'):
+        return
+    screens = _device_seed_screens()
+    if not screens:
+        return
+    data_dir = os.path.join(ESPHOME_DIR, 'lib', '.esphome')
+    expected_marker = f'{get_expected_version()}:{_device_seed_config_hash(screens)}'
+    seeds_present = all(
+        os.path.isdir(os.path.join(data_dir, 'build', DEVICE_SEED_NAME.format(screen=s)))
+        for s in screens)
+    try:
+        stored_marker = open(DEVICE_SEED_MARKER).read().strip()
+    except OSError:
+        stored_marker = ''
+    if stored_marker == expected_marker and seeds_present:
+        log('Device seed builds already warm — skipping.')
+        return
+
+    log(f'Building device seeds for {", ".join(screens)}...')
+    env = _warming_env()
+    # The seed configs need the same assets the emulator warming uses, and
+    # lib.yaml's wifi block needs secrets; placeholders are fine, only the
+    # generated main.cpp depends on them.
+    tiles = os.path.join(ESPHOME_DIR, 'lib', 'test_device_tiles.yaml')
+    wrote_tiles = not os.path.exists(tiles) and os.path.exists(PREPARE_PRECACHE)
+    if wrote_tiles:
+        with open(PIO_SETUP_LOG, 'a') as logf:
+            subprocess.run(['python3', PREPARE_PRECACHE], stdout=logf, stderr=logf, check=False)
+    secrets = os.path.join(ESPHOME_DIR, 'secrets.yaml')
+    placeholder = 'wifi_ssid: "seed"\nwifi_password: "seed-password"\n'
+    wrote_secrets = not os.path.exists(secrets)
+    if wrote_secrets:
+        with open(secrets, 'w') as f:
+            f.write(placeholder)
+
+    ok = True
+    try:
+        for i, screen in enumerate(screens):
+            write_progress('warming', 96 + (3 * i) // len(screens),
+                           f'Warming cache: device build {screen}...')
+            config = DEVICE_SEED_CONFIG.format(screen=screen)
+            with open(os.path.join(ESPHOME_DIR, config), 'w') as f:
+                f.write(_device_seed_yaml(screen))
+            try:
+                with open(PIO_SETUP_LOG, 'a') as logf:
+                    result = subprocess.run(['esphome', 'compile', config], cwd=ESPHOME_DIR, env=env,
+                                            stdout=logf, stderr=logf, check=False)
+                if result.returncode != 0:
+                    ok = False
+                    log(f'WARNING: device seed build for {screen} failed (exit {result.returncode})')
+            finally:
+                os.remove(os.path.join(ESPHOME_DIR, config))
+    finally:
+        try:
+            # Unless the user saved real credentials meanwhile.
+            if wrote_secrets and open(secrets).read() == placeholder:
+                os.remove(secrets)
+        except OSError:
+            pass
+        if wrote_tiles:
+            try:
+                os.remove(tiles)
+            except OSError:
+                pass
+
+    if ok:
+        with open(DEVICE_SEED_MARKER, 'w') as f:
+            f.write(expected_marker)
+        log('Device seed builds complete.')
+
+
 # ─── Local-build fallback ────────────────────────────────────────────────────
 
 def build_toolchain_locally(reason: str) -> None:
@@ -805,7 +960,7 @@ def build_toolchain_locally(reason: str) -> None:
     env['CCACHE_DIR']           = f'{PIO_DIR}/.ccache'
     env['CCACHE_MAXSIZE']       = '2G'
     env['CCACHE_COMPILERCHECK'] = 'content'
-    env['CCACHE_SLOPPINESS']    = 'include_file_mtime,time_macros'
+    env['CCACHE_SLOPPINESS']    = 'include_file_mtime,pch_defines,time_macros'
     env['CCACHE_NOHASHDIR']     = 'true'
     os.makedirs(env['CCACHE_DIR'], exist_ok=True)
     ccache_bin = '/usr/local/lib/ccache'
@@ -191,7 +191,7 @@ python3 /app/toolchain_setup.py > /tmp/toolchain_setup.log 2>&1 &
     sleep 15
     if ! pgrep -f 'gunicorn.*server:app' > /dev/null 2>&1; then
       echo "[gunicorn-watchdog] Gunicorn is not running — restarting..."
-      gunicorn -w 1 --threads 4 --timeout 300 -b 127.0.0.1:8099 \
+      gunicorn -w 1 --threads 16 --timeout 300 -b 127.0.0.1:8099 \
         --chdir /app/configurator --error-logfile - server:app \
         >> /tmp/gunicorn_restart.log 2>&1 &
     fi
@@ -12,6 +12,12 @@ from .data_collection import load_tiles_yaml, collect_available_scripts, collect
 from .tile_generation import generate_tile_cpp
 from .tile_utils import flags_to_cpp, build_expression
 from .schema import screens_list_schema
+from .tile_data import (
+    BLOB_VERSION, DATA_DRIVEN_MARKER, DataBlobUnsupported, serialize_screens, generate_registry_cpp,
+    cpp_string_literal,
+)
+from .codegen_check import label_statements, report_changes
+from .precompiled_headers import PCH_HEADER, PCH_SCRIPT, system_includes, pch_header, pch_script
 
 # Configuration constants
 DOMAIN = "tile_ui"
@@ -19,6 +25,8 @@ CONF_TILES_FILE = "tiles_file"
 CONF_SCREENS = "screens"
 CONF_DEBUG_OUTPUT = "debug_output"
 CONF_SYSTEM_PAGES = "system_pages"
+CONF_DATA_DRIVEN = "data_driven"
+CONF_PRECOMPILED_HEADERS = "precompiled_headers"
 
 def load_tiles_config(config):
     """Load tiles configuration from file if not present in config."""
@@ -57,6 +65,8 @@ CONFIG_SCHEMA = cv.All(
             cv.Required(CONF_ID): cv.declare_id(DisplayPage),
         })),
         cv.Optional(CONF_DEBUG_OUTPUT, default=False): cv.boolean,
+        cv.Optional(CONF_DATA_DRIVEN, default=False): cv.boolean,
+        cv.Optional(CONF_PRECOMPILED_HEADERS, default=False): cv.boolean,
     }, extra=cv.ALLOW_EXTRA)
 )
 
@@ -198,7 +208,7 @@ class _ImageRegistrar:
             return False
 
 
-async def _register_screen_images(screen_images_conf: dict, screen_w: int, screen_h: int) -> None:
+async def _register_screen_images(screen_images_conf: dict, screen_w: int, screen_h: int) -> set:
     """Register screen_images entries (full-screen backgrounds) via ESPHome's image codegen API.
 
     Each entry is keyed by the ID used in background: declarations.  A cover-crop
@@ -248,9 +258,10 @@ async def _register_screen_images(screen_images_conf: dict, screen_w: int, scree
 
     if registered:
         print(f"[tile_ui] Registered {len(registered)} screen background image(s) from inline tile_ui.screen_images: config", file=sys.stderr)
+    return registered
 
 
-async def _register_images(images_conf: dict, screens: list, screen_w: int = 480, screen_h: int = 320) -> None:
+async def _register_images(images_conf: dict, screens: list, screen_w: int = 480, screen_h: int = 320) -> set:
     """Register tile_ui.images: entries via ESPHome's image codegen API.
 
     Processes base64 PNG data from inline config, writes temp files, and registers
@@ -303,6 +314,7 @@ async def _register_images(images_conf: dict, screens: list, screen_w: int = 480
 
     if registered:
         print(f"[tile_ui] Registered {len(registered)} image variant(s) from inline tile_ui.images: config", file=sys.stderr)
+    return registered
 
 
 CALIB_PAGE_LAMBDA = """
@@ -442,11 +454,102 @@ def final_validate(config):
 FINAL_VALIDATE_SCHEMA = final_validate
 
 
+def _data_driven_blob(screens, available_scripts, available_globals):
+    """Serialize *screens* for InitTilesFromData, or return None to fall back to codegen."""
+    try:
+        return serialize_screens(screens, available_scripts, available_globals)
+    except DataBlobUnsupported as e:
+        print(f"[tile_ui] data_driven: falling back to generated C++ ({e})", file=sys.stderr)
+    except ValueError:
+        pass  # reported by validate_tiles_config below
+    return None
+
+
+def _mark_data_driven(data_driven: bool) -> None:
+    """Create or remove the build directory's DATA_DRIVEN_MARKER to match this build."""
+    path = CORE.relative_build_path(DATA_DRIVEN_MARKER)
+    try:
+        if data_driven:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(BLOB_VERSION + "\n")
+        elif os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        print(f"[tile_ui] data_driven: could not update {DATA_DRIVEN_MARKER} ({e})", file=sys.stderr)
+
+
+def _report_codegen_changes(statements: dict) -> None:
+    """Print which generated statements changed since the previous build of this device."""
+    try:
+        summary = report_changes(CORE.build_path, statements)
+    except Exception as e:
+        summary = f"could not compare with the previous build ({e})"
+    print(f"[tile_ui] {summary}", file=sys.stderr)
+
+
+def _setup_precompiled_headers() -> None:
+    """Write tile_ui_pch.h and the PlatformIO script that precompiles it (see precompiled_headers)."""
+    from esphome.helpers import write_file_if_changed
+
+    if getattr(CORE, "using_toolchain_esp_idf", False):
+        print("[tile_ui] precompiled_headers: only supported for PlatformIO builds, skipped", file=sys.stderr)
+        return
+    sources = []
+    for include in CORE.config.get("esphome", {}).get("includes", []):
+        try:
+            with open(CORE.relative_config_path(include), encoding="utf-8") as f:
+                sources.append(f.read())
+        except OSError:
+            continue
+    includes = system_includes(sources)
+    if not includes:
+        return
+    write_file_if_changed(CORE.relative_src_path(PCH_HEADER), pch_header(includes))
+    write_file_if_changed(CORE.relative_build_path(PCH_SCRIPT), pch_script())
+    cg.add_platformio_option("extra_scripts", [f"pre:{PCH_SCRIPT}"])
+    print(f"[tile_ui] precompiled_headers: {len(includes)} system headers in {PCH_HEADER}", file=sys.stderr)
+
+
+def _config_ids(domain: str) -> list:
+    """IDs declared under a top-level list component such as font: or color:."""
+    entries = CORE.config.get(domain, [])
+    if not isinstance(entries, list):
+        return []
+    return [str(getattr(e.get(CONF_ID), "id", e.get(CONF_ID)))
+            for e in entries if isinstance(e, dict) and e.get(CONF_ID) is not None]
+
+
 async def to_code(config):
     """Generate and validate YAML tile configuration."""
     from .validation import validate_tiles_config
-    
+
+    # Try to get screens from inline config first, then fall back to file
+    # Note: screens are already loaded into config by load_tiles_config validator
+    screens = config.get(CONF_SCREENS, [])
+
+    # Validate schema for screens (deep validation)
+    try:
+        screens = screens_list_schema(screens)
+    except cv.Invalid as e:
+        _print_error("Schema Validation Failed", str(e))
+        sys.exit(1)
+
+    available_scripts = collect_available_scripts(CORE.config)
+    available_globals = collect_available_globals(CORE.config)
+
+    if config.get(CONF_PRECOMPILED_HEADERS, False):
+        _setup_precompiled_headers()
+
+    # In data-driven mode the screen pages are created at runtime by
+    # InitTilesFromData, so only the system pages are declared here.
+    blob = None
+    if config.get(CONF_DATA_DRIVEN, False) and screens:
+        blob = _data_driven_blob(screens, available_scripts, available_globals)
+    _mark_data_driven(blob is not None)
+
     all_pages = []
+    system_pages = []
 
     # Register system pages (calib)
     for page_conf in config.get(CONF_SYSTEM_PAGES, []):
@@ -456,14 +559,16 @@ async def to_code(config):
              lambda_expr = cg.RawExpression(lambda_str)
              var = cg.new_Pvariable(page_id, lambda_expr)
              all_pages.append(var)
+             system_pages.append(var)
 
     # Register screen pages
-    for screen_conf in config.get(CONF_SCREENS, []):
-        screen_id = screen_conf[CONF_ID]
-        lambda_str = f"[](esphome::display::Display &it) {{ id(_draw_page).execute(); }}"
-        lambda_expr = cg.RawExpression(lambda_str)
-        var = cg.new_Pvariable(screen_id, lambda_expr)
-        all_pages.append(var)
+    if blob is None:
+        for screen_conf in config.get(CONF_SCREENS, []):
+            screen_id = screen_conf[CONF_ID]
+            lambda_str = f"[](esphome::display::Display &it) {{ id(_draw_page).execute(); }}"
+            lambda_expr = cg.RawExpression(lambda_str)
+            var = cg.new_Pvariable(screen_id, lambda_expr)
+            all_pages.append(var)
 
     # Now generate code to set pages
     if all_pages:
@@ -489,20 +594,6 @@ async def to_code(config):
         """
         cg.add(cg.RawStatement(stmt))
 
-    # Try to get screens from inline config first, then fall back to file
-    # Note: screens are already loaded into config by load_tiles_config validator
-    screens = config.get(CONF_SCREENS, [])
-    
-    # Validate schema for screens (deep validation)
-    try:
-        screens = screens_list_schema(screens)
-    except cv.Invalid as e:
-        _print_error("Schema Validation Failed", str(e))
-        sys.exit(1)
-    
-    available_scripts = collect_available_scripts(CORE.config)
-    available_globals = collect_available_globals(CORE.config)
-    
     if not screens:
         return
     
@@ -543,14 +634,38 @@ async def to_code(config):
             except (TypeError, ValueError):
                 pass
 
+    registered_images = {"none_transparent"}
     images_conf = config.get("images", {})
     if images_conf:
-        await _register_images(images_conf, screens, screen_w=_screen_w, screen_h=_screen_h)
+        registered_images |= await _register_images(images_conf, screens, screen_w=_screen_w, screen_h=_screen_h)
 
     # Register screen background images from inline tile_ui.screen_images: config.
     screen_images_conf = config.get("screen_images", {})
     if screen_images_conf:
-        await _register_screen_images(screen_images_conf, screen_w=_screen_w, screen_h=_screen_h)
+        registered_images |= await _register_screen_images(screen_images_conf, screen_w=_screen_w, screen_h=_screen_h)
+
+    if blob is not None:
+        # Registry of everything the blob may reference by name, then the
+        # generic initializer.  On the host platform TileDataLoadBlob prefers
+        # $TILE_UI_DATA_FILE over the embedded blob.
+        registry = generate_registry_cpp(
+            available_scripts,
+            fonts=_config_ids("font"),
+            colors=_config_ids("color"),
+            images=registered_images | set(_config_ids("image")),
+        )
+        system_list = ", ".join(str(p) for p in system_pages)
+        registry_code = "\n        ".join(registry)
+        stmt = f"""
+    App.scheduler.set_timeout(nullptr, "tile_ui_init", 2000, [=]() {{
+        {registry_code}
+        InitTilesFromData(TileDataLoadBlob({cpp_string_literal(blob)}), {{{system_list}}});
+    }});
+    """
+        cg.add(cg.RawStatement(stmt))
+        _report_codegen_changes({"data": stmt})
+        _print_success(f"Injected data-driven tile initialization ({len(blob)} byte blob, {len(registry)} registry entries)")
+        return
 
     # Generate C++ initialization code (returns list of lambda strings)
     debug_output = config.get(CONF_DEBUG_OUTPUT, False)
@@ -565,5 +680,6 @@ async def to_code(config):
     }});
     """
     cg.add(cg.RawStatement(stmt))
-        
+    _report_codegen_changes(label_statements(cpp_lambdas))
+
     _print_success(f"Injected {len(cpp_lambdas)} tile initialization blocks into setup() (delayed)")
@@ -0,0 +1,138 @@
+"""Byte-stability checks for the C++ that tile_ui injects into main.cpp.
+
+Everything to_code generates ends up in one translation unit, so ccache can
+only reuse the compiled main.cpp when the generated text is byte-identical to
+the previous build.  Code generation must therefore depend on nothing but the
+configuration: no set or hash ordering, no timestamps, no temp paths.
+
+This module labels the generated statements, keeps a digest of each one in
+the build directory and reports which of them changed since the last build.
+It also works as a command-line check between two tiles files:
+
+    python -m tile_ui.codegen_check old_tiles.yaml new_tiles.yaml --config lib/lib.yaml
+"""
+import hashlib
+import json
+import os
+
+__all__ = [
+    "label_statements",
+    "statement_digests",
+    "changed_statements",
+    "report_changes",
+]
+
+MANIFEST_FILE = "tile_ui_codegen.json"
+
+
+def label_statements(blocks: list) -> dict:
+    """Name the blocks returned by generate_init_tiles_cpp: init, screen <id>..., finalize."""
+    labeled = {}
+    for i, block in enumerate(blocks):
+        first = block.split("\n", 1)[0]
+        if first.startswith("// Screen: "):
+            label = f"screen {first[len('// Screen: '):]}"
+        elif i == 0:
+            label = "init"
+        elif i == len(blocks) - 1:
+            label = "finalize"
+        else:
+            label = f"block {i}"
+        labeled[label] = block
+    return labeled
+
+
+def statement_digests(statements: dict) -> dict:
+    """``{label: sha256 of the statement text}``."""
+    return {label: hashlib.sha256(text.encode("utf-8")).hexdigest()
+            for label, text in statements.items()}
+
+
+def changed_statements(old: dict, new: dict) -> dict:
+    """Compare two digest maps; returns lists of added, removed and changed labels."""
+    return {
+        "added": [label for label in new if label not in old],
+        "removed": [label for label in old if label not in new],
+        "changed": [label for label in new if label in old and old[label] != new[label]],
+    }
+
+
+def _format_changes(changes: dict, total: int) -> str:
+    parts = [f"{kind} {', '.join(labels)}" for kind, labels in changes.items() if labels]
+    if not parts:
+        return f"generated code unchanged ({total} statements)"
+    return "generated code differs: " + "; ".join(parts)
+
+
+def report_changes(build_dir: str, statements: dict) -> str:
+    """Compare *statements* with the previous build's manifest in *build_dir*, save the new one."""
+    digests = statement_digests(statements)
+    path = os.path.join(build_dir, MANIFEST_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = None
+    try:
+        os.makedirs(build_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(digests, f, indent=2)
+    except OSError:
+        pass
+    if previous is None:
+        return f"first build ({len(digests)} statements)"
+    return _format_changes(changed_statements(previous, digests), len(digests))
+
+
+def _generate(tiles_path, esphome_config):
+    from . import generate_init_tiles_cpp
+    from .data_collection import load_tiles_yaml, collect_available_scripts, collect_available_globals
+    from .schema import screens_list_schema
+
+    screens = screens_list_schema(load_tiles_yaml(tiles_path).get("screens", []))
+    scripts = collect_available_scripts(esphome_config) if esphome_config else None
+    globals_ = collect_available_globals(esphome_config) if esphome_config else None
+    return label_statements(generate_init_tiles_cpp(screens, scripts, globals_))
+
+
+def main(argv=None):
+    import argparse
+    import difflib
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Report which tile_ui statements differ between two tiles files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--config", help="ESPHome config providing scripts and globals (e.g. lib/lib.yaml)")
+    parser.add_argument("--diff", action="store_true", help="print a unified diff of each changed statement")
+    args = parser.parse_args(argv)
+
+    class _Loader(yaml.SafeLoader):
+        pass
+
+    def _tag(loader, suffix, node):
+        if suffix == "include" and isinstance(node, yaml.ScalarNode):
+            path = os.path.join(os.path.dirname(args.config), loader.construct_scalar(node))
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    return yaml.load(f, Loader=_Loader)
+        return None
+
+    _Loader.add_multi_constructor("!", _tag)
+    esphome_config = None
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            esphome_config = yaml.load(f, Loader=_Loader)
+
+    old, new = _generate(args.old, esphome_config), _generate(args.new, esphome_config)
+    changes = changed_statements(statement_digests(old), statement_digests(new))
+    print(_format_changes(changes, len(new)))
+    if args.diff:
+        for label in changes["changed"]:
+            print("".join(difflib.unified_diff(old[label].splitlines(True), new[label].splitlines(True),
+                                               f"{args.old} ({label})", f"{args.new} ({label})")))
+    return 1 if any(changes.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+"""Precompiled header for the tile runtime (``precompiled_headers: true``).
+
+The runtime headers listed under ``esphome: includes:`` (utils.h, tiles.h,
+screens.h, view.h) are pasted into main.cpp after ESPHome's declarations and
+use them directly, so they cannot be precompiled themselves.  The standard
+library headers they pull in (<regex>, <map>, <sstream>, ...) can: they do
+not depend on the config, and parsing them is a large part of every main.cpp
+compile.
+
+to_code writes src/tile_ui_pch.h with those system includes and a PlatformIO
+extra script that precompiles it (with main.cpp's exact compiler flags) and
+force-includes it into main.cpp only.  If GCC finds the .gch unusable it
+falls back to the plain header, so the build result is the same either way.
+The script prints PCH_MARKER when main.cpp is actually compiled with the
+precompiled header (not when it is up to date), which the configurator's
+build stats use to compare compile times with and without.
+"""
+import re
+
+__all__ = [
+    "PCH_HEADER",
+    "PCH_SCRIPT",
+    "PCH_MARKER",
+    "system_includes",
+    "pch_header",
+    "pch_script",
+]
+
+PCH_HEADER = "tile_ui_pch.h"
+PCH_SCRIPT = "tile_ui_pch.py"
+PCH_MARKER = "tile_ui: main.cpp uses precompiled header"
+
+_SYSTEM_INCLUDE_RE = re.compile(r'^\s*#\s*include\s*<([^>]+)>', re.MULTILINE)
+
+
+def system_includes(sources: list) -> list:
+    """``#include <...>`` targets of the given header texts, in first-seen order."""
+    seen = []
+    for text in sources:
+        for name in _SYSTEM_INCLUDE_RE.findall(text):
+            if name not in seen:
+                seen.append(name)
+    return seen
+
+
+def pch_header(includes: list) -> str:
+    """Contents of tile_ui_pch.h for *includes*."""
+    lines = [
+        "// Generated by tile_ui: system headers of the tile runtime, precompiled",
+        f"// by {PCH_SCRIPT} and force-included into main.cpp.",
+        "#ifndef TILE_UI_PCH_H",
+        "#define TILE_UI_PCH_H",
+    ]
+    lines += [f"#include <{name}>" for name in includes]
+    lines.append("#endif  // TILE_UI_PCH_H")
+    return "\n".join(lines) + "\n"
+
+
+_SCRIPT = '''\
+# Generated by tile_ui: precompile {header} and force-include it into main.cpp.
+import os
+
+Import("env")
+
+PCH = os.path.join(env.subst("$PROJECT_SRC_DIR"), "{header}")
+
+
+def _with_pch(env, node):
+    if os.path.basename(node.get_path()) != "main.cpp" or not os.path.isfile(PCH):
+        return node
+    gch = env.Command(
+        PCH + ".gch", PCH,
+        env.VerboseAction("$CXX -x c++-header -o $TARGET -c $CXXFLAGS $CCFLAGS $_CCCOMCOM $SOURCE",
+                          "Precompiling $SOURCE"),
+    )
+    obj = env.Object(node, CCFLAGS=env["CCFLAGS"] + ["-include", PCH, "-Winvalid-pch"])
+    env.Depends(obj, gch)
+    # Runs only when main.cpp is rebuilt, unlike this middleware.
+    env.AddPreAction(obj, env.Action(_note_pch, None))
+    return obj
+
+
+def _note_pch(target, source, env):
+    print("{marker}")
+    return 0
+
+
+env.AddBuildMiddleware(_with_pch, "*main.cpp")
+'''
+
+
+def pch_script() -> str:
+    """PlatformIO extra script that builds and uses the precompiled header."""
+    return _SCRIPT.format(header=PCH_HEADER, marker=PCH_MARKER)
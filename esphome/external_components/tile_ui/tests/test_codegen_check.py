@@ -0,0 +1,92 @@
+"""Tests for byte-stable code generation and the codegen_check helpers."""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from tile_ui.codegen_check import (
+    label_statements, statement_digests, changed_statements, report_changes,
+)
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+
+# Runs in a fresh interpreter: the root conftest installs the esphome mocks.
+_GENERATE = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import conftest
+from tile_ui import generate_init_tiles_cpp
+data = json.load(sys.stdin)
+out = generate_init_tiles_cpp(data["screens"], data["scripts"], set(data["globals"]))
+sys.stdout.write("\\n".join(out))
+"""
+
+_SCREENS = [
+    {"id": "main", "flags": ["BASE"], "rows": 2, "cols": 2, "tiles": [
+        {"ha_action": {"x": 0, "y": 0, "perform": ["act"],
+                       "entities": ["light.a"], "display_assets": [{"image": "cat"}, {"image": "dog"}]}},
+        {"ha_action": {"x": 1, "y": 0, "perform": ["act"], "entities": ["light.c"], "display_assets": [
+            {"image": "dog", "condition": {"operator": "OR", "conditions": ["g_one", "g_two", "g_three"]}}]}},
+        {"move_page": {"x": 0, "y": 1, "display": ["page_icon"], "destination": "other"}},
+    ]},
+    {"id": "other", "flags": ["TEMPORARY"], "rows": 3, "cols": 3, "tiles": [
+        {"ha_action": {"x": 0, "y": 0, "perform": ["act"], "entities": ["light.b"],
+                       "display_assets": [{"image": "cat"}, {"image": "bird",
+                                                             "condition": {"operator": "AND", "conditions": ["g_two", "g_three"]}}]}},
+    ]},
+]
+_SCRIPTS = {
+    "icon": {"parameters": {"x_start": "int", "x_end": "int", "y_start": "int", "y_end": "int",
+                                "entities": "string[]"}},
+    "page_icon": {"parameters": {"x_start": "int", "x_end": "int", "y_start": "int", "y_end": "int"}},
+    "act": {"parameters": {"entities": "string[]"}},
+}
+_GLOBALS = ["g_one", "g_two", "g_three", "g_four", "g_five"]
+
+
+def _generate_in_subprocess(hash_seed):
+    env = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+    payload = json.dumps({"screens": _SCREENS, "scripts": _SCRIPTS, "globals": _GLOBALS})
+    result = subprocess.run([sys.executable, "-c", _GENERATE, _ROOT], input=payload, env=env,
+                            capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise AssertionError(result.stderr)
+    return result.stdout
+
+
+class TestDeterministicGeneration(unittest.TestCase):
+
+    def test_identical_across_processes(self):
+        """Same config in separate interpreters (different hash seeds) → identical bytes."""
+        first = _generate_in_subprocess(1)
+        self.assertIn("tiles_main", first)
+        for seed in (2, 3):
+            self.assertEqual(first, _generate_in_subprocess(seed))
+
+
+class TestChangedStatements(unittest.TestCase):
+
+    def test_labels(self):
+        blocks = ["// Initialize view\nx", "// Screen: main\ny", "// Screen: other\nz", "view_ptr->init();"]
+        self.assertEqual(list(label_statements(blocks)),
+                         ["init", "screen main", "screen other", "finalize"])
+
+    def test_changed_added_removed(self):
+        old = statement_digests({"init": "a", "screen main": "b", "screen gone": "c"})
+        new = statement_digests({"init": "a", "screen main": "B", "screen new": "d"})
+        self.assertEqual(changed_statements(old, new),
+                         {"added": ["screen new"], "removed": ["screen gone"], "changed": ["screen main"]})
+
+    def test_report_against_previous_build(self):
+        with tempfile.TemporaryDirectory() as build_dir:
+            self.assertIn("first build", report_changes(build_dir, {"init": "a", "screen main": "b"}))
+            self.assertIn("unchanged", report_changes(build_dir, {"init": "a", "screen main": "b"}))
+            summary = report_changes(build_dir, {"init": "a", "screen main": "c"})
+            self.assertIn("changed screen main", summary)
+            self.assertNotIn("init", summary)
+
+
+if __name__ == "__main__":
+    unittest.main()
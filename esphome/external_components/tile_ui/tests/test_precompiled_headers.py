@@ -0,0 +1,52 @@
+"""Tests for the tile runtime precompiled header helpers."""
+import os
+import unittest
+
+from tile_ui.precompiled_headers import PCH_HEADER, PCH_MARKER, system_includes, pch_header, pch_script
+
+_LIB = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "lib"))
+
+
+class TestSystemIncludes(unittest.TestCase):
+
+    def test_order_and_dedup(self):
+        a = "#include <regex>\n#include \"tiles.h\"\n  #  include <map>\n"
+        b = "#include <map>\n#include <sstream>\n// #include <vector> in a comment line is skipped\n"
+        self.assertEqual(system_includes([a, b]), ["regex", "map", "sstream"])
+
+    def test_runtime_headers(self):
+        """The standard headers the real runtime headers pull in."""
+        sources = []
+        for name in ("utils.h", "tiles.h", "screens.h", "view.h"):
+            with open(os.path.join(_LIB, name), encoding="utf-8") as f:
+                sources.append(f.read())
+        includes = system_includes(sources)
+        for name in ("regex", "map", "sstream", "string", "vector"):
+            self.assertIn(name, includes)
+
+
+class TestGeneratedFiles(unittest.TestCase):
+
+    def test_header(self):
+        text = pch_header(["regex", "map"])
+        self.assertIn("#ifndef TILE_UI_PCH_H", text)
+        self.assertLess(text.index("#include <regex>"), text.index("#include <map>"))
+        self.assertTrue(text.endswith("#endif  // TILE_UI_PCH_H\n"))
+
+    def test_script(self):
+        script = pch_script()
+        compile(script, "tile_ui_pch.py", "exec")
+        self.assertIn(f'"{PCH_HEADER}"', script)
+        self.assertIn('"-include", PCH', script)
+
+    def test_marker_printed_by_compile_action(self):
+        """The marker comes from a pre-action of main.cpp's object, not the middleware."""
+        script = pch_script()
+        middleware = script[script.index("def _with_pch"):script.index("def _note_pch")]
+        self.assertNotIn(PCH_MARKER, middleware)
+        self.assertIn("env.AddPreAction(obj, env.Action(_note_pch, None))", middleware)
+        self.assertIn(f'print("{PCH_MARKER}")', script[script.index("def _note_pch"):])
+
+
+if __name__ == "__main__":
+    unittest.main()
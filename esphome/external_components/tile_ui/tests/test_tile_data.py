@@ -0,0 +1,238 @@
+"""Tests for tile_data.py — data-driven blob serialization and the C++ registry."""
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from tile_ui.tile_data import (
+    BLOB_VERSION,
+    DataBlobUnsupported,
+    encode,
+    decode,
+    serialize_screens,
+    script_kinds,
+    generate_registry_cpp,
+    cpp_string_literal,
+)
+
+_TILES_H = os.path.join(os.path.dirname(__file__), "..", "..", "..", "lib", "tiles.h")
+
+_DRAW = {"x_start": "int", "x_end": "int", "y_start": "int", "y_end": "int"}
+
+SCRIPTS = {
+    "tile_label": {"parameters": dict(_DRAW)},
+    "tile_lights": {"parameters": {**_DRAW, "entities": "string[]"}},
+    "tile_icon": {"parameters": {**_DRAW, "icon": "string", "color": "Color",
+                                 "size": "esphome::display::BaseFont*"}},
+    "tile_choose": {"parameters": {**_DRAW, "name": "string", "is_on": "bool"}},
+    "action_lights": {"parameters": {"entities": "string[]"}},
+    "is_on": {"parameters": {"entities": "string[]"}},
+    "on_press": {"parameters": {}},
+}
+
+
+def _screens(*tiles, **screen):
+    return [{"id": "main", "flags": ["BASE"], "tiles": list(tiles), **screen},
+            {"id": "other", "tiles": [
+                {"move_page": {"x": 0, "y": 0, "display": ["tile_label"], "destination": "main"}}]}]
+
+
+def _tiles(blob, screen=0):
+    return [n for n in decode(blob)[2 + screen] if isinstance(n, list) and n[0] == "tile"]
+
+
+class TestEncoding(unittest.TestCase):
+
+    def test_atoms_are_length_prefixed(self):
+        self.assertEqual(encode(["a", "bc", 3]), "(1:a2:bc1:3)")
+
+    def test_length_counts_utf8_bytes(self):
+        self.assertEqual(encode("\ue8b8"), "3:\ue8b8")
+
+    def test_round_trip(self):
+        node = ["tile_ui", "1", ["screen", "a (b)", ["flags"], ["x", "1:2", ""]]]
+        self.assertEqual(decode(encode(node)), node)
+
+    def test_bool_atoms(self):
+        self.assertEqual(decode(encode([True, False])), ["1", "0"])
+
+
+class TestScriptKinds(unittest.TestCase):
+
+    def test_known_types(self):
+        self.assertEqual(script_kinds(SCRIPTS["tile_icon"]), "iiiiscF")
+        self.assertEqual(script_kinds(SCRIPTS["on_press"]), "")
+
+    def test_unknown_type(self):
+        self.assertIsNone(script_kinds({"parameters": {"p": "uint8_t"}}))
+
+
+class TestSerializeScreens(unittest.TestCase):
+
+    def test_root_and_screens(self):
+        root = decode(serialize_screens(_screens(
+            {"ha_action": {"x": 0, "y": 0, "display": ["tile_lights"],
+                           "perform": ["action_lights"], "entities": ["light.a"]}},
+            rows=2, cols=3), SCRIPTS))
+        self.assertEqual(root[:2], ["tile_ui", BLOB_VERSION])
+        self.assertEqual(root[2][:5], ["screen", "main", ["flags", "BASE"], ["rows", "2"], ["cols", "3"]])
+        self.assertEqual(root[3][:3], ["screen", "other", ["flags"]])
+
+    def test_ha_action_tile(self):
+        tile = _tiles(serialize_screens(_screens(
+            {"ha_action": {"x": 1, "y": 0, "display": ["tile_lights"], "perform": ["action_lights"],
+                           "entities": [{"dynamic_entity": "LIGHT"}, "light.a"]}}), SCRIPTS))[0]
+        self.assertEqual(tile[:4], ["tile", "ha_action", "1", "0"])
+        self.assertIn(["draw", ["call", "tile_lights", ["a", "0"], ["a", "1"], ["a", "2"], ["a", "3"], ["a", "4"]]], tile)
+        self.assertIn(["entities", "#{LIGHT}", "light.a"], tile)
+        self.assertIn(["perform", ["call", "action_lights", ["a", "0"]]], tile)
+
+    def test_static_params_are_normalized(self):
+        tile = _tiles(serialize_screens(_screens(
+            {"move_page": {"x": 0, "y": 0, "destination": "other", "display": [
+                {"tile_icon": {"icon": '"\\U0000e8b8"', "color": "id(gray)", "size": "medium"}}]}}), SCRIPTS))[0]
+        draw = next(n for n in tile if isinstance(n, list) and n[0] == "draw")
+        self.assertEqual(draw[1][6:], [["l", "\U0000e8b8"], ["l", "gray"], ["l", "medium"]])
+        self.assertIn(["destination", "other"], tile)
+
+    def test_conditions(self):
+        tile = _tiles(serialize_screens(_screens(
+            {"ha_action": {"x": 0, "y": 0, "display": ["tile_lights"], "entities": ["light.a"],
+                           "perform": ["action_lights"],
+                           "requires_fast_refresh": {"operator": "NOT", "conditions": ["is_on"]},
+                           "fill_color": [{"color": "red", "condition": "is_on"}, {"color": "Color(1, 2, 3)"}]}}),
+            SCRIPTS, {"red": "Color"}))[0]
+        self.assertIn(["fast_refresh", ["not", ["s", "is_on"]]], tile)
+        self.assertIn(["fill", "red", ["s", "is_on"]], tile)
+        self.assertIn(["fill", "Color(1, 2, 3)"], tile)
+
+    def test_toggle_tile(self):
+        tile = _tiles(serialize_screens(_screens(
+            {"toggle_entity": {"x": 0, "y": 0, "display": ["tile_choose"], "dynamic_entity": "LIGHT",
+                               "entity": "light.a, light.b", "presentation_name": "Both",
+                               "initially_chosen": True}}), SCRIPTS))[0]
+        self.assertEqual(tile[:4], ["tile", "toggle_entity", "0", "0"])
+        self.assertIn(["identifier", "LIGHT"], tile)
+        self.assertIn(["presentation_name", "Both"], tile)
+        self.assertIn(["initially_chosen"], tile)
+
+    def test_serialization_is_deterministic(self):
+        screens = _screens({"function": {"x": 0, "y": 0, "display": ["tile_label"], "on_press": "on_press"}})
+        self.assertEqual(serialize_screens(screens, SCRIPTS), serialize_screens(screens, SCRIPTS))
+
+    def test_unknown_script_is_unsupported(self):
+        with self.assertRaises(DataBlobUnsupported):
+            serialize_screens(_screens({"function": {"x": 0, "y": 0, "display": ["tile_label"],
+                                                     "on_press": "on_press"}}), None)
+
+    def test_cpp_expression_param_is_unsupported(self):
+        screens = _screens({"move_page": {"x": 0, "y": 0, "destination": "other", "display": [
+            {"tile_icon": {"icon": "x", "color": "id(palette)[2]", "size": "big"}}]}})
+        with self.assertRaises(DataBlobUnsupported):
+            serialize_screens(screens, SCRIPTS)
+
+    def test_invalid_config_raises_value_error(self):
+        screens = _screens({"ha_action": {"x": 0, "y": 0, "display": ["tile_lights"], "perform": ["action_lights"],
+                                          "entities": ["light.a"], "display_page_if_no_entity": "other"}})
+        with self.assertRaises(ValueError):
+            serialize_screens(screens, SCRIPTS)
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_script_registration(self):
+        lines = generate_registry_cpp(SCRIPTS)
+        self.assertIn(
+            'TileDataRegisterScript("tile_icon", "iiiiscF", [](const TileArgs& a) '
+            '{ id(tile_icon).execute(a[0].i, a[1].i, a[2].i, a[3].i, a[4].s, a[5].c, a[6].font); });',
+            lines)
+        self.assertIn('TileDataRegisterScript("on_press", "", [](const TileArgs& a) { id(on_press).execute(); });', lines)
+
+    def test_unsupported_scripts_are_skipped(self):
+        lines = generate_registry_cpp({"odd": {"parameters": {"p": "uint8_t"}}})
+        self.assertEqual(lines, [])
+
+    def test_fonts_colors_images(self):
+        lines = generate_registry_cpp({}, fonts=["big", "big"], colors=["red"], images=["img_a"])
+        self.assertEqual(lines, [
+            'TileDataRegisterFont("big", &id(big));',
+            'TileDataRegisterColor("red", id(red));',
+            '#ifdef USE_IMAGE',
+            'TileDataRegisterImage("img_a", &id(img_a));',
+            '#endif',
+        ])
+
+    def test_cpp_string_literal_escapes(self):
+        self.assertEqual(cpp_string_literal('a"b\\c'), '"a\\"b\\\\c"')
+
+# Re-encodes the parsed tree, so a lossless parse prints the blob back.
+_PARSER_MAIN = r"""
+void Encode(const TileNode& node, std::string& out) {
+  if (!node.is_list) {
+    out += std::to_string(node.atom.size()) + ":" + node.atom;
+    return;
+  }
+  out += "(";
+  for (const TileNode& item : node.items) {
+    Encode(item, out);
+  }
+  out += ")";
+}
+
+int main() {
+  const std::string blob = BLOB;
+  size_t pos = 0;
+  TileNode root;
+  if (!ParseTileNode(blob, pos, root) || pos != blob.size() || root.tag() != "tile_ui") {
+    return 1;
+  }
+  std::string out;
+  Encode(root, out);
+  std::cout << root.str(1) << "\n" << root.at(2).str(1) << "\n" << out;
+  return 0;
+}
+"""
+
+
+@unittest.skipIf(shutil.which("g++") is None, "g++ not available")
+class TestBlobParser(unittest.TestCase):
+    """Compiles lib/tiles.h's blob parser and feeds it a serialized config."""
+
+    def _parser_source(self, blob):
+        with open(_TILES_H, encoding="utf-8") as f:
+            header = f.read()
+        start = header.index("// A parsed blob node")
+        end = header.index("std::map<std::string, TileDataScript>& TileDataScripts()")
+        return "\n".join([
+            "#include <cctype>", "#include <cstdlib>", "#include <iostream>",
+            "#include <string>", "#include <vector>",
+            header[start:end],
+            "#define BLOB " + cpp_string_literal(blob),
+            _PARSER_MAIN,
+        ])
+
+    def test_parses_serialized_screens(self):
+        blob = serialize_screens(_screens(
+            {"ha_action": {"x": 0, "y": 1, "perform": ["action_lights"], "entities": ["light.a"],
+                           "display": [{"tile_icon": {"icon": '"\U000F0335"', "color": "id(gray)",
+                                                      "size": "big"}}]}},
+            {"move_page": {"x": 1, "y": 0, "destination": "other", "display": [
+                {"tile_icon": {"icon": '"say \\"hi\\" (x):"', "color": "id(gray)", "size": "big"}}]}},
+            rows=2, cols=2), SCRIPTS)
+        with tempfile.TemporaryDirectory() as build_dir:
+            source = os.path.join(build_dir, "parser.cpp")
+            program = os.path.join(build_dir, "parser")
+            with open(source, "w", encoding="utf-8") as f:
+                f.write(self._parser_source(blob))
+            subprocess.run(["g++", "-std=c++17", "-o", program, source], check=True,
+                           capture_output=True)
+            result = subprocess.run([program], capture_output=True, check=True)
+        version, screen_id, encoded = result.stdout.decode("utf-8").split("\n", 2)
+        self.assertEqual(version, BLOB_VERSION)
+        self.assertEqual(screen_id, "main")
+        self.assertEqual(encoded, blob)
+
+
+if __name__ == "__main__":
+    unittest.main()
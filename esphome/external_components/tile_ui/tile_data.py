@@ -0,0 +1,639 @@
+"""Data-driven tile initialization - serializes screens into a compact blob.
+
+In data-driven mode the screens, tiles, entity lists, flags and draw-script
+bindings are encoded as a canonical S-expression instead of C++ lambdas:
+atoms are written as ``<len>:<bytes>`` and lists as ``( ... )``.  The
+generic initializer in tiles.h / screens.h / view.h (InitTilesFromData)
+rebuilds the same view from the blob at runtime.
+
+Script calls are resolved through a registry emitted once per build by
+generate_registry_cpp().  The registry depends only on the lib scripts,
+fonts, colors and images - not on the tiles file - so on the host platform
+a different tiles config can be loaded at startup from $TILE_UI_DATA_FILE
+without recompiling the emulator.
+
+The serializer mirrors tile_generation.py / tile_utils.py construct by
+construct; anything it cannot represent raises DataBlobUnsupported so the
+caller can fall back to generated C++.
+"""
+import re
+from typing import Any
+
+from .schema import TileType
+from .tile_utils import format_entity_value
+
+__all__ = [
+    "BLOB_VERSION",
+    "DATA_DRIVEN_MARKER",
+    "DataBlobUnsupported",
+    "encode",
+    "decode",
+    "serialize_screens",
+    "script_kinds",
+    "generate_registry_cpp",
+    "cpp_string_literal",
+]
+
+BLOB_VERSION = "1"
+# Written to the build directory while the build initializes from a blob, so
+# the configurator only caches such a program as config-independent.
+DATA_DRIVEN_MARKER = "tile_ui_data_driven"
+
+
+class DataBlobUnsupported(ValueError):
+    """The tiles config uses something the data blob cannot express."""
+
+
+# ---------------------------------------------------------------------------
+# Canonical S-expression encoding
+# ---------------------------------------------------------------------------
+
+def _atom(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def encode(node) -> str:
+    """Encode nested lists of scalars as a canonical S-expression."""
+    if isinstance(node, (list, tuple)):
+        return "(" + "".join(encode(n) for n in node) + ")"
+    data = _atom(node)
+    return f"{len(data.encode('utf-8'))}:{data}"
+
+
+def decode(blob: str):
+    """Inverse of encode(); atoms come back as strings."""
+    raw = blob.encode("utf-8")
+
+    def _parse(pos):
+        if raw[pos:pos + 1] == b"(":
+            pos += 1
+            items = []
+            while raw[pos:pos + 1] != b")":
+                if pos >= len(raw):
+                    raise ValueError("unterminated list")
+                item, pos = _parse(pos)
+                items.append(item)
+            return items, pos + 1
+        colon = raw.index(b":", pos)
+        length = int(raw[pos:colon])
+        end = colon + 1 + length
+        return raw[colon + 1:end].decode("utf-8"), end
+
+    node, pos = _parse(0)
+    if pos != len(raw):
+        raise ValueError("trailing data after blob")
+    return node
+
+
+# ---------------------------------------------------------------------------
+# Script bindings
+# ---------------------------------------------------------------------------
+
+# Script parameter type -> TileArg member kind used by the C++ registry.
+_KIND_BY_TYPE = {
+    "int": "i",
+    "float": "f",
+    "bool": "b",
+    "string": "s",
+    "std::string": "s",
+    "string[]": "v",
+    "std::vector<std::string>": "v",
+    "Color": "c",
+    "font": "F",
+    "esphome::display::BaseFont*": "F",
+    "BaseFont*": "F",
+}
+
+
+def script_kinds(script_info) -> str | None:
+    """Return the registry kind string for a script, or None if unsupported."""
+    params = (script_info or {}).get("parameters", {}) or {}
+    kinds = []
+    for p_type in params.values():
+        kind = _KIND_BY_TYPE.get(str(p_type).strip())
+        if kind is None:
+            return None
+        kinds.append(kind)
+    return "".join(kinds)
+
+
+_INT_RE = re.compile(r'^-?\d+$')
+_FLOAT_RE = re.compile(r'^-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?[fF]?$')
+_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_COLOR_RE = re.compile(r'^(Color\(\s*\d+\s*,\s*\d+\s*,\s*\d+\s*\)|Color::(BLACK|WHITE))$')
+
+
+def _literal(kind, raw_val, script_id, param_name) -> str:
+    """Normalize a static script parameter (a C++ expression in generated code) to blob text."""
+    val = str(raw_val).strip()
+    if kind == "s":
+        return _icon_text(val)
+    if kind == "F":
+        return "" if val == "nullptr" else _strip_ref(val, "")
+    if kind == "c":
+        val = _strip_ref(val, "")
+        if _NAME_RE.match(val) or _COLOR_RE.match(val):
+            return val
+    elif kind == "b":
+        if val in ("true", "false"):
+            return val
+    elif kind == "i":
+        if _INT_RE.match(val):
+            return val
+    elif kind == "f":
+        if _FLOAT_RE.match(val):
+            return val.rstrip("fF")
+    raise DataBlobUnsupported(f"script '{script_id}' parameter '{param_name}' value {val!r} is a C++ expression")
+
+
+def _call(script_id, available_scripts, expected_params, static_params=None):
+    """Mirror of tile_utils._generate_lambda: one binding per script parameter."""
+    script_info = available_scripts.get(script_id) if available_scripts else None
+    if script_info is None:
+        raise DataBlobUnsupported(f"script '{script_id}' is not a known script")
+    if script_kinds(script_info) is None:
+        raise DataBlobUnsupported(f"script '{script_id}' has parameter types the data blob cannot pass")
+
+    param_map = {}
+    for i, (p_name, _p_type) in enumerate(expected_params or []):
+        for name in (p_name if isinstance(p_name, list) else [p_name]):
+            param_map[name] = i
+
+    bindings = []
+    for param_name, param_type in script_info.get("parameters", {}).items():
+        if static_params and param_name in static_params:
+            kind = _KIND_BY_TYPE[str(param_type).strip()]
+            bindings.append(["l", _literal(kind, static_params[param_name], script_id, param_name)])
+        elif param_name in param_map:
+            bindings.append(["a", param_map[param_name]])
+        else:
+            bindings.append(["d"])
+    return ["call", script_id, *bindings]
+
+
+def _call_list(display, available_scripts, expected_params):
+    """Mirror of tile_utils.format_display_list."""
+    if isinstance(display, str):
+        display = [display]
+    elif not isinstance(display, list):
+        display = []
+    calls = []
+    for item in display:
+        if not item:
+            continue
+        if isinstance(item, str):
+            calls.append(_call(item, available_scripts, expected_params))
+        elif isinstance(item, dict):
+            for script_id, params in item.items():
+                calls.append(_call(script_id, available_scripts, expected_params, params))
+    return calls
+
+
+# ---------------------------------------------------------------------------
+# Conditions, entities, colors
+# ---------------------------------------------------------------------------
+
+def _condition(expression_config, context=None):
+    """Mirror of tile_utils.build_expression; returns a node or None."""
+    if not expression_config:
+        return None
+    if isinstance(expression_config, str):
+        return ["s", expression_config]
+    if not isinstance(expression_config, dict):
+        return None
+
+    op = expression_config.get("operator", "AND").upper()
+    conditions = expression_config.get("conditions")
+    if conditions is None:
+        return None
+    if isinstance(conditions, str):
+        node = ["s", conditions]
+        return ["not", node] if op == "NOT" else node
+    if isinstance(conditions, list):
+        if op == "NOT":
+            if len(conditions) != 1:
+                error_msg = "NOT operator requires exactly one condition"
+                if context:
+                    error_msg = f"{context}: {error_msg}"
+                raise ValueError(error_msg)
+            return ["not", _condition(conditions[0], context)]
+        subs = [s for s in (_condition(c, context) for c in conditions) if s]
+        if not subs:
+            return None
+        if len(subs) == 1:
+            return subs[0]
+        return ["or" if op == "OR" else "and", *subs]
+    return None
+
+
+def _entity_list(entity_values) -> list:
+    """Mirror of tile_utils.format_entity_cpp."""
+    if isinstance(entity_values, list):
+        return [str(e) for e in entity_values]
+    if isinstance(entity_values, str) and "," in entity_values:
+        return [v.strip() for v in entity_values.split(",")]
+    return [str(entity_values)]
+
+
+def _conditional_entries(tag, value, value_key, context, scalar_type):
+    """Nodes for a plain or [{value_key, condition}] modifier list."""
+    nodes = []
+    if isinstance(value, scalar_type):
+        return [[tag, value]]
+    if not isinstance(value, list):
+        return nodes
+    for entry in value:
+        v = entry.get(value_key) if isinstance(entry, dict) else None
+        if v is None or v == "":
+            continue
+        condition = entry.get("condition")
+        cond = _condition(condition, context) if condition else None
+        nodes.append([tag, v, cond] if cond else [tag, v])
+    return nodes
+
+
+def _tile_modifiers(config, screen_id=None) -> list:
+    """Mirror of tile_utils.get_tile_modifiers."""
+    x = config.get("x", "?")
+    y = config.get("y", "?")
+    context = f"Screen '{screen_id}', Tile at ({x}, {y})" if screen_id else f"Tile at ({x}, {y})"
+
+    nodes = []
+    fill_color = config.get("fill_color")
+    if fill_color:
+        nodes += _conditional_entries("fill", fill_color, "color", context, str)
+    border_color = config.get("border_color")
+    if border_color:
+        nodes += _conditional_entries("border_color", border_color, "color", context, str)
+    border_width = config.get("border_width")
+    if border_width is not None:
+        nodes += _conditional_entries("border_width", border_width, "value", context, int)
+    border_radius = config.get("border_radius")
+    if border_radius is not None:
+        nodes += _conditional_entries("border_radius", border_radius, "value", context, int)
+
+    x_span = config.get("x_span", 1)
+    y_span = config.get("y_span", 1)
+    if x_span > 1 or y_span > 1:
+        nodes.append(["span", x_span, y_span])
+
+    activation_var = config.get("activation_var")
+    if activation_var:
+        var_name = activation_var.get("dynamic_entity")
+        var_value = activation_var.get("value")
+        if var_name and var_value:
+            nodes.append(["activation", var_name, _entity_list(var_value)])
+        else:
+            raise ValueError(f"{context}: activation_var must have both 'dynamic_entity' and 'value' fields")
+    return nodes
+
+
+def _fast_refresh(config) -> list:
+    """Mirror of build_fast_refresh_lambda incl. the animation default."""
+    if "requires_fast_refresh" in config:
+        value = config["requires_fast_refresh"]
+    else:
+        images = config.get("display_assets")
+        value = True if isinstance(images, list) and any(
+            isinstance(e, dict) and isinstance(e.get("animation"), dict) for e in images) else None
+    if value is True:
+        return [["fast_refresh"]]
+    cond = _condition(value)
+    return [["fast_refresh", cond]] if cond else []
+
+
+# ---------------------------------------------------------------------------
+# display_assets (images / icons / animations)
+# ---------------------------------------------------------------------------
+
+_LEGACY_DIR_POS = {
+    "left_right": (0.0, 0.5, 1.0, 0.5),
+    "right_left": (1.0, 0.5, 0.0, 0.5),
+    "up_down":    (0.5, 0.0, 0.5, 1.0),
+    "down_up":    (0.5, 1.0, 0.5, 0.0),
+}
+
+
+def _step_pos(step):
+    if "direction" in step:
+        pos = _LEGACY_DIR_POS.get(step["direction"])
+    else:
+        def _resolve(p):
+            if isinstance(p, (list, tuple)) and len(p) == 2:
+                return (float(p[0]), float(p[1]))
+            return (0.5, 0.5)
+        fx, fy = _resolve(step.get("from", [0.5, 0.5]))
+        tx, ty = _resolve(step.get("to", [0.5, 0.5]))
+        pos = None if (fx, fy, tx, ty) == (0.5, 0.5, 0.5, 0.5) else (fx, fy, tx, ty)
+    if pos is None:
+        return []
+    # Generated code formats fractions with one decimal ("{:.1f}f").
+    return [["pos", *(float(f"{v:.1f}") for v in pos)]]
+
+
+_ESCAPE_RE = re.compile(r'\\(U[0-9a-fA-F]{8}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|.)')
+
+
+def _icon_text(icon_val) -> str:
+    """Decode an icon value to the UTF-8 text the generated C++ literal holds."""
+    if not isinstance(icon_val, str):
+        return ""
+    if len(icon_val) >= 2 and icon_val.startswith('"') and icon_val.endswith('"'):
+        def _unescape(m):
+            esc = m.group(1)
+            if esc[0] in "Uux" and len(esc) > 1:
+                return chr(int(esc[1:], 16))
+            return {"n": "\n", "t": "\t"}.get(esc, esc)
+        return _ESCAPE_RE.sub(_unescape, icon_val[1:-1])
+    return icon_val
+
+
+def _strip_ref(val, default):
+    """'&id(x)' / 'id(x)' / 'x' -> 'x'; Color(...) literals pass through."""
+    if not val:
+        return default
+    val = str(val).strip()
+    if val.startswith("&"):
+        val = val[1:]
+    if val.startswith("id(") and val.endswith(")"):
+        val = val[3:-1]
+    return val
+
+
+def _icon_draw(icon, color, size, step):
+    return ["icon", _icon_text(icon), _strip_ref(color, "white"), _strip_ref(size, "big"), *_step_pos(step)]
+
+
+def _image_draw(img_id, step):
+    return ["image", img_id, *_step_pos(step)]
+
+
+def _steps(entry):
+    animation = entry.get("animation")
+    if not animation or not isinstance(animation, dict):
+        return []
+    steps = animation.get("steps")
+    if steps and isinstance(steps, list):
+        return steps
+    return [animation]
+
+
+def _duration_ms(step):
+    return int(float(step.get("duration", 3)) * 1000)
+
+
+def _asset(entry):
+    """Mirror of the per-entry dispatch in tile_generation._build_image_lambda."""
+    steps = _steps(entry)
+    is_icon_entry = bool(entry.get("icon") and entry["icon"].strip())
+
+    if len(steps) <= 1:
+        step0 = steps[0] if steps else {}
+        if step0.get("icon") is not None:
+            draw = _icon_draw(step0["icon"], step0.get("icon_color", ""), step0.get("icon_size", ""), step0)
+        elif entry.get("icon"):
+            draw = _icon_draw(entry["icon"], entry.get("icon_color", ""), entry.get("icon_size", ""), step0)
+        else:
+            draw = _image_draw(entry["image"], step0)
+        return [["step", _duration_ms(step0), draw]]
+
+    nodes = []
+    for step in steps:
+        step_icon = step.get("icon")
+        step_image = step.get("image")
+        if step_icon is not None and step_icon.strip():
+            draw = _icon_draw(step_icon, step.get("icon_color", ""), step.get("icon_size", ""), step)
+        elif step_image and step_image.strip():
+            draw = _image_draw(step_image, step)
+        elif is_icon_entry:
+            draw = _icon_draw(entry["icon"], entry.get("icon_color", ""), entry.get("icon_size", ""), step)
+        else:
+            draw = _image_draw(entry["image"], step)
+        nodes.append(["step", _duration_ms(step), draw])
+    return nodes
+
+
+def _assets(config):
+    """Asset nodes replacing the display list, or None if no images are set."""
+    images = config.get("display_assets")
+    if not images or not isinstance(images, list):
+        legacy_image = config.get("image")
+        if not legacy_image:
+            return None
+        images = [{"image": legacy_image}]
+
+    entries = []
+    for e in images:
+        if isinstance(e, dict) and (e.get("image") or e.get("icon")):
+            e = dict(e)
+            if not e.get("icon") and e.get("image") == "none":
+                e["image"] = "none_transparent"
+            entries.append(e)
+    if not entries:
+        return None
+
+    nodes = []
+    for entry in entries:
+        cond = None
+        if entry.get("condition"):
+            cond = _condition(entry["condition"])
+            if not cond:
+                continue
+        nodes.append(["asset", cond or [], *_asset(entry)])
+    return nodes
+
+
+# ---------------------------------------------------------------------------
+# Tiles and screens
+# ---------------------------------------------------------------------------
+
+_DRAW_PARAMS = [('x_start', 'int'), ('x_end', 'int'), ('y_start', 'int'), ('y_end', 'int'), ('entities', 'string[]')]
+_TOGGLE_DRAW_PARAMS = [('x_start', 'int'), ('x_end', 'int'), ('y_start', 'int'), ('y_end', 'int'), (['name', 'presentation_name'], 'string'), ('is_on', 'bool')]
+_CYCLE_DRAW_PARAMS = [('x_start', 'int'), ('x_end', 'int'), ('y_start', 'int'), ('y_end', 'int'), ('name', 'string'), (['options', 'entities'], 'string[]')]
+
+
+def _draw_node(config, available_scripts, expected_params):
+    assets = _assets(config)
+    if assets is not None:
+        return ["draw", *assets]
+    return ["draw", *_call_list(config.get("display", []), available_scripts, expected_params)]
+
+
+def _tile_node(tile: dict, available_scripts, screen_id=None):
+    """Mirror of tile_generation.generate_tile_cpp; None for unknown tiles."""
+    for tile_type in TileType:
+        if tile_type.value in tile:
+            kind, config = tile_type.value, tile[tile_type.value]
+            break
+    else:
+        return None
+
+    x = config.get("x", 0)
+    y = config.get("y", 0)
+    where = f"Screen '{screen_id}', Tile at ({x}, {y})"
+    props = []
+
+    if kind in (TileType.HA_ACTION.value, TileType.TITLE.value):
+        draw = _draw_node(config, available_scripts, _DRAW_PARAMS)
+        entities_config = config.get("entities", "")
+        props.append(["entities", *_entity_list(format_entity_value(entities_config))])
+        if kind == TileType.HA_ACTION.value:
+            props.append(["perform", *_call_list(config.get("perform", []), available_scripts, [('entities', 'string[]')])])
+            props.append(["location_perform", *_call_list(
+                config.get("location_perform", []), available_scripts,
+                [('x', 'float'), ('y', 'float'), ('entities', 'string[]')])])
+            display_page = config.get("display_page_if_no_entity")
+            if display_page:
+                items = entities_config if isinstance(entities_config, list) else [entities_config]
+                if not any(isinstance(e, dict) and "dynamic_entity" in e for e in items):
+                    raise ValueError(f"{where}: display_page_if_no_entity requires at least one dynamic_entity")
+                props.append(["page_if_no_entity", display_page])
+        props += _fast_refresh(config)
+
+    elif kind == TileType.MOVE_PAGE.value:
+        draw = _draw_node(config, available_scripts, _DRAW_PARAMS)
+        props.append(["destination", config.get("destination", "")])
+        dynamic_entry = config.get("dynamic_entry")
+        if dynamic_entry:
+            dynamic_entity = dynamic_entry.get("dynamic_entity", "")
+            value = dynamic_entry.get("value", "")
+            if not (dynamic_entity and value):
+                raise ValueError(f"{where}: dynamic_entry must have both 'dynamic_entity' and 'value'")
+            props.append(["dynamic_entry", dynamic_entity, _entity_list(value)])
+
+    elif kind == TileType.FUNCTION.value:
+        draw = _draw_node(config, available_scripts, _DRAW_PARAMS)
+        for key in ("on_press", "on_release"):
+            if config.get(key):
+                props.append([key, _call(config[key], available_scripts, [])])
+
+    elif kind == TileType.TOGGLE_ENTITY.value:
+        draw = _draw_node(config, available_scripts, _TOGGLE_DRAW_PARAMS)
+        dynamic_entity = config.get("dynamic_entity", "")
+        entity = config.get("entity", "")
+        if not dynamic_entity:
+            raise ValueError(f"Screen '{screen_id}', toggle_entity tile at ({x}, {y}) must have 'dynamic_entity' field")
+        if not entity:
+            raise ValueError(f"Screen '{screen_id}', toggle_entity tile at ({x}, {y}) must have 'entity' field")
+        props.append(["identifier", dynamic_entity])
+        props.append(["entities", *_entity_list(entity)])
+        props.append(["presentation_name", config.get("presentation_name", "")])
+        if config.get("initially_chosen", False):
+            props.append(["initially_chosen"])
+
+    else:  # cycle_entity
+        draw = _draw_node(config, available_scripts, _CYCLE_DRAW_PARAMS)
+        dynamic_entity = config.get("dynamic_entity", "")
+        options = config.get("options", [])
+        if not dynamic_entity:
+            raise ValueError(f"Screen '{screen_id}', cycle_entity tile at ({x}, {y}) must have 'dynamic_entity' field")
+        if not options:
+            raise ValueError(f"Screen '{screen_id}', cycle_entity tile at ({x}, {y}) must have 'options' list with at least one item")
+        props.append(["identifier", dynamic_entity])
+        for option in options:
+            if not isinstance(option, dict):
+                raise ValueError(f"Screen '{screen_id}', options must be dicts with 'entity' and 'label' fields at ({x}, {y})")
+            entity, label = option.get("entity", ""), option.get("label", "")
+            if not (entity and label):
+                raise ValueError(f"Screen '{screen_id}', each option item must have both 'entity' and 'label' fields at ({x}, {y})")
+            props.append(["option", label, *_entity_list(entity)])
+        if config.get("reset_on_leave", False):
+            props.append(["reset_on_leave"])
+
+    props += _tile_modifiers(config, screen_id)
+    return ["tile", kind, x, y, draw, *props]
+
+
+def _screen_node(screen: dict, available_scripts):
+    screen_id = str(screen.get("id", ""))
+    node = ["screen", screen_id, ["flags", *(screen.get("flags") or [])]]
+    if screen.get("rows") is not None:
+        node.append(["rows", screen["rows"]])
+    if screen.get("cols") is not None:
+        node.append(["cols", screen["cols"]])
+
+    for entry in (screen.get("background") or []):
+        if not isinstance(entry, dict):
+            continue
+        cond = _condition(entry.get("condition")) if str(entry.get("condition") or "").strip() else None
+        if entry.get("color") and entry["color"] != "none":
+            bg = ["bg", "color", entry["color"]]
+        elif entry.get("image") and entry["image"] != "none":
+            bg = ["bg", "image", entry["image"]]
+        else:
+            continue
+        node.append(bg + [cond] if cond else bg)
+
+    if screen.get("time_color"):
+        node.append(["time_color", str(screen["time_color"]).strip()])
+
+    for tile in screen.get("tiles", []):
+        tile_node = _tile_node(tile, available_scripts, screen_id)
+        if tile_node is not None:
+            node.append(tile_node)
+    return node
+
+
+def serialize_screens(screens, available_scripts=None, available_globals=None) -> str:
+    """Validate *screens* and return them encoded as a tile_ui data blob."""
+    from .validation import validate_tiles_config
+    from .tile_generation import compute_image_variants, apply_image_variants
+
+    variant_id = compute_image_variants(screens)
+    if variant_id:
+        screens = apply_image_variants(screens, variant_id)
+    validate_tiles_config(screens, available_scripts, available_globals)
+
+    root = ["tile_ui", BLOB_VERSION]
+    root += [_screen_node(screen, available_scripts) for screen in screens]
+    return encode(root)
+
+
+# ---------------------------------------------------------------------------
+# C++ registry
+# ---------------------------------------------------------------------------
+
+_KIND_MEMBER = {"i": "i", "f": "f", "b": "b", "s": "s", "v": "v", "c": "c", "F": "font"}
+
+
+def cpp_string_literal(text: str) -> str:
+    """Return *text* as a C++ string literal (octal escapes for non-printables)."""
+    out = []
+    for b in text.encode("utf-8"):
+        ch = chr(b)
+        if ch in '"\\':
+            out.append("\\" + ch)
+        elif 0x20 <= b < 0x7f and ch != "?":
+            out.append(ch)
+        else:
+            out.append(f"\\{b:03o}")
+    return '"' + "".join(out) + '"'
+
+
+def generate_registry_cpp(available_scripts, fonts=(), colors=(), images=()) -> list:
+    """C++ statements registering scripts, fonts, colors and images by name."""
+    lines = []
+    for script_id in sorted(available_scripts or {}):
+        kinds = script_kinds(available_scripts[script_id])
+        if kinds is None:
+            continue
+        args = ", ".join(f"a[{i}].{_KIND_MEMBER[k]}" for i, k in enumerate(kinds))
+        lines.append(
+            f'TileDataRegisterScript("{script_id}", "{kinds}", '
+            f'[](const TileArgs& a) {{ id({script_id}).execute({args}); }});'
+        )
+    for font_id in sorted(set(fonts)):
+        lines.append(f'TileDataRegisterFont("{font_id}", &id({font_id}));')
+    for color_id in sorted(set(colors)):
+        lines.append(f'TileDataRegisterColor("{color_id}", id({color_id}));')
+    image_ids = sorted(set(images))
+    if image_ids:
+        lines.append("#ifdef USE_IMAGE")
+        for image_id in image_ids:
+            lines.append(f'TileDataRegisterImage("{image_id}", &id({image_id}));')
+        lines.append("#endif")
+    return lines
@@ -56,8 +56,10 @@ def compute_image_variants(screens: list) -> dict:
                                 if isinstance(step, dict) and step.get('image') and step['image'] != 'none':
                                     img_sizes.setdefault(step['image'], set()).add((rows, cols))
 
+    # Sorted so the image declarations (and their order in main.cpp) depend only
+    # on which images are used, not on where tiles happen to reference them.
     variant_id: dict = {}  # (img_id, rows, cols) -> variant_id
-    for iid, sizes in img_sizes.items():
+    for iid, sizes in sorted(img_sizes.items()):
         sorted_sizes = sorted(sizes)
         if len(sorted_sizes) == 1:
             r, c = sorted_sizes[0]
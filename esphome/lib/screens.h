@@ -222,3 +222,59 @@ private:
   std::vector<BgEntry> backgrounds_;
 };
 
+// Builds a screen from a tile_ui data blob node:
+// (screen <id> (flags ...) [(rows n)] [(cols n)] [(bg color|image <ref> [cond])]...
+//  [(time_color <ref>)] (tile ...)...)
+TiledScreen* ScreenFromData(const TileNode& node, esphome::display::DisplayPage* display_page) {
+  static const std::map<std::string, ScreenAtt> flag_names = {
+      {"FAST_REFRESH", FAST_REFRESH}, {"TEMPORARY", TEMPORARY}, {"BASE", BASE}, {"OMIT_TIME_WIFI", OMIT_TIME_WIFI}};
+  std::set<ScreenAtt> flags;
+  int screen_rows = id(rows), screen_cols = id(cols);
+  std::vector<Tile*> tiles;
+  for (size_t k = 2; k < node.size(); ++k) {
+    const TileNode& item = node.at(k);
+    if (item.tag() == "flags") {
+      for (size_t f = 1; f < item.size(); ++f) {
+        auto it = flag_names.find(item.str(f));
+        if (it != flag_names.end()) {
+          flags.insert(it->second);
+        }
+      }
+    } else if (item.tag() == "rows") {
+      screen_rows = item.num(1);
+    } else if (item.tag() == "cols") {
+      screen_cols = item.num(1);
+    } else if (item.tag() == "tile") {
+      Tile* tile = TileFromData(item);
+      if (tile != nullptr) {
+        tiles.push_back(tile);
+      }
+    }
+  }
+
+  TiledScreen* screen = new TiledScreen(display_page, flags, screen_rows, screen_cols, tiles);
+  for (size_t k = 2; k < node.size(); ++k) {
+    const TileNode& item = node.at(k);
+    if (item.tag() == "bg") {
+      bool has_cond = item.at(3).is_list;
+      if (item.str(1) == "color") {
+        Color c = TileDataColor(item.str(2));
+        has_cond ? screen->addBgColor(c, TileDataCondition(item.at(3))) : screen->addBgColor(c);
+        continue;
+      }
+#ifdef USE_IMAGE
+      auto it = TileDataImages().find(item.str(2));
+      if (it != TileDataImages().end()) {
+        esphome::image::Image* image = it->second;
+        std::function<void()> draw_fn = [image]() { id(disp).image(0, 0, image); };
+        has_cond ? screen->addBgLambda(draw_fn, TileDataCondition(item.at(3))) : screen->addBgLambda(draw_fn);
+        continue;
+      }
+#endif // USE_IMAGE
+      ESP_LOGW("TileData", "Unknown background image: %s", item.str(2).c_str());
+    } else if (item.tag() == "time_color") {
+      screen->setTimeColor(TileDataColor(item.str(1)));
+    }
+  }
+  return screen;
+}
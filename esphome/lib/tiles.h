@@ -694,4 +694,473 @@ private:
   bool reset_on_leave_ = false;
 };
 
+// ---------------------------------------------------------------------------
+// Data-driven initialization (tile_ui data_driven mode)
+// ---------------------------------------------------------------------------
+// Instead of generated C++ lambdas, tile_ui can serialize the screens into a
+// canonical S-expression blob: atoms are "<len>:<bytes>", lists are "(...)".
+// The helpers below rebuild the tiles from it. Scripts, fonts, colors and
+// images are looked up by name in registries that tile_ui fills once per
+// build, so a different tiles config only needs a different blob.
+
+// One argument of a registered script call. Numeric members are kept in
+// sync so an int argument can feed a float parameter and vice versa.
+struct TileArg {
+  int i = 0;
+  float f = 0.0f;
+  bool b = false;
+  std::string s;
+  std::vector<std::string> v;
+  Color c = Color::BLACK;
+  esphome::display::BaseFont* font = nullptr;
+
+  static TileArg Int(int x) { TileArg a; a.i = x; a.f = x; a.b = x != 0; return a; }
+  static TileArg Float(float x) { TileArg a; a.f = x; a.i = (int)x; a.b = x != 0; return a; }
+  static TileArg Bool(bool x) { TileArg a; a.b = x; a.i = x; a.f = x; return a; }
+  static TileArg Str(const std::string& x) { TileArg a; a.s = x; return a; }
+  static TileArg Vec(const std::vector<std::string>& x) { TileArg a; a.v = x; return a; }
+};
+
+using TileArgs = std::vector<TileArg>;
+using TileDataFunc = std::function<void(const TileArgs&)>;
+using TileDataCond = std::function<bool(std::vector<std::string>)>;
+
+// A registered script: one kind character per parameter (i, f, b, s, v, c
+// for Color, F for font) and a function that executes it.
+struct TileDataScript {
+  std::string kinds;
+  TileDataFunc invoke;
+};
+
+// A parsed blob node: an atom, or a list whose first atom is its tag.
+struct TileNode {
+  bool is_list = false;
+  std::string atom;
+  std::vector<TileNode> items;
+
+  const TileNode& at(size_t idx) const {
+    static const TileNode none;
+    return idx < this->items.size() ? this->items[idx] : none;
+  }
+  const std::string& str(size_t idx) const { return this->at(idx).atom; }
+  const std::string& tag() const { return this->str(0); }
+  int num(size_t idx) const { return atoi(this->str(idx).c_str()); }
+  float real(size_t idx) const { return atof(this->str(idx).c_str()); }
+  size_t size() const { return this->items.size(); }
+};
+
+// Parses one node starting at pos. Returns false on malformed input.
+bool ParseTileNode(const std::string& blob, size_t& pos, TileNode& out) {
+  if (pos >= blob.size()) {
+    return false;
+  }
+  if (blob[pos] == '(') {
+    out.is_list = true;
+    ++pos;
+    while (pos < blob.size() && blob[pos] != ')') {
+      out.items.emplace_back();
+      if (!ParseTileNode(blob, pos, out.items.back())) {
+        return false;
+      }
+    }
+    if (pos >= blob.size()) {
+      return false;
+    }
+    ++pos;
+    return true;
+  }
+  size_t len = 0, start = pos;
+  while (pos < blob.size() && isdigit((unsigned char)blob[pos])) {
+    len = len * 10 + (blob[pos++] - '0');
+  }
+  if (pos == start || pos >= blob.size() || blob[pos] != ':' || pos + 1 + len > blob.size()) {
+    return false;
+  }
+  out.atom = blob.substr(pos + 1, len);
+  pos += 1 + len;
+  return true;
+}
+
+std::map<std::string, TileDataScript>& TileDataScripts() {
+  static std::map<std::string, TileDataScript> scripts;
+  return scripts;
+}
+
+std::map<std::string, esphome::display::BaseFont*>& TileDataFonts() {
+  static std::map<std::string, esphome::display::BaseFont*> fonts;
+  return fonts;
+}
+
+std::map<std::string, Color>& TileDataColors() {
+  static std::map<std::string, Color> colors;
+  return colors;
+}
+
+// Display pages of the data-driven screens, keyed by screen id.
+std::map<std::string, esphome::display::DisplayPage*>& TileDataPages() {
+  static std::map<std::string, esphome::display::DisplayPage*> pages;
+  return pages;
+}
+
+void TileDataRegisterScript(const std::string& name, const std::string& kinds, TileDataFunc invoke) {
+  TileDataScripts()[name] = {kinds, invoke};
+}
+
+void TileDataRegisterFont(const std::string& name, esphome::display::BaseFont* font) {
+  TileDataFonts()[name] = font;
+}
+
+void TileDataRegisterColor(const std::string& name, Color color) {
+  TileDataColors()[name] = color;
+}
+
+#ifdef USE_IMAGE
+std::map<std::string, esphome::image::Image*>& TileDataImages() {
+  static std::map<std::string, esphome::image::Image*> images;
+  return images;
+}
+
+void TileDataRegisterImage(const std::string& name, esphome::image::Image* image) {
+  TileDataImages()[name] = image;
+}
+#endif // USE_IMAGE
+
+// Resolves a color reference: "Color(r, g, b)" or a registered color id.
+Color TileDataColor(const std::string& ref) {
+  int r, g, b;
+  if (sscanf(ref.c_str(), "Color(%d , %d , %d", &r, &g, &b) == 3) {
+    return Color(r, g, b);
+  }
+  if (ref == "Color::WHITE") {
+    return Color::WHITE;
+  }
+  if (ref == "Color::BLACK") {
+    return Color::BLACK;
+  }
+  auto it = TileDataColors().find(ref);
+  if (it == TileDataColors().end()) {
+    ESP_LOGW("TileData", "Unknown color: %s", ref.c_str());
+    return Color::BLACK;
+  }
+  return it->second;
+}
+
+esphome::display::BaseFont* TileDataFont(const std::string& ref) {
+  if (ref.empty()) {
+    return nullptr;
+  }
+  auto it = TileDataFonts().find(ref);
+  if (it == TileDataFonts().end()) {
+    ESP_LOGW("TileData", "Unknown font: %s", ref.c_str());
+    return nullptr;
+  }
+  return it->second;
+}
+
+esphome::display::DisplayPage* TileDataPage(const std::string& screen_id) {
+  auto it = TileDataPages().find(screen_id);
+  if (it == TileDataPages().end()) {
+    ESP_LOGW("TileData", "Unknown screen: %s", screen_id.c_str());
+    return nullptr;
+  }
+  return it->second;
+}
+
+// Converts a literal script argument from the blob to the parameter kind.
+TileArg TileDataLiteral(char kind, const std::string& value) {
+  switch (kind) {
+    case 'i': return TileArg::Int(atoi(value.c_str()));
+    case 'f': return TileArg::Float(atof(value.c_str()));
+    case 'b': return TileArg::Bool(value == "true" || value == "True" || value == "1");
+    case 'c': { TileArg a; a.c = TileDataColor(value); return a; }
+    case 'F': { TileArg a; a.font = TileDataFont(value); return a; }
+    default: return TileArg::Str(value);
+  }
+}
+
+// Builds a script call from a (call <script> <binding>...) node. Each binding
+// is (a <index>) for one of the tile's standard arguments, (l <literal>) or
+// (d) for the parameter's default value.
+TileDataFunc TileDataCall(const TileNode& call) {
+  auto it = TileDataScripts().find(call.str(1));
+  if (it == TileDataScripts().end()) {
+    ESP_LOGW("TileData", "Unknown script: %s", call.str(1).c_str());
+    return [](const TileArgs&) {};
+  }
+  const TileDataScript* script = &it->second;
+  TileArgs fixed(script->kinds.size());
+  std::vector<int> from_args(script->kinds.size(), -1);
+  for (size_t k = 0; k < script->kinds.size(); ++k) {
+    const TileNode& binding = call.at(k + 2);
+    if (binding.tag() == "a") {
+      from_args[k] = binding.num(1);
+    } else if (binding.tag() == "l") {
+      fixed[k] = TileDataLiteral(script->kinds[k], binding.str(1));
+    }
+  }
+  return [script, fixed, from_args](const TileArgs& args) {
+    TileArgs call_args = fixed;
+    for (size_t k = 0; k < from_args.size(); ++k) {
+      if (from_args[k] >= 0 && from_args[k] < (int)args.size()) {
+        call_args[k] = args[from_args[k]];
+      }
+    }
+    script->invoke(call_args);
+  };
+}
+
+// Evaluates a condition node: (s <script>), (not c), (and c...), (or c...).
+bool TileDataEval(const TileNode& cond, const std::vector<std::string>& entities) {
+  const std::string& op = cond.tag();
+  if (op == "s") {
+    auto it = TileDataScripts().find(cond.str(1));
+    if (it == TileDataScripts().end()) {
+      return false;
+    }
+    TileArgs args(it->second.kinds.size());
+    for (size_t k = 0; k < args.size(); ++k) {
+      if (it->second.kinds[k] == 'v') {
+        args[k].v = entities;
+      }
+    }
+    it->second.invoke(args);
+    return id(script_output);
+  }
+  if (op == "not") {
+    return !TileDataEval(cond.at(1), entities);
+  }
+  if (op == "and" || op == "or") {
+    bool is_and = op == "and";
+    for (size_t k = 1; k < cond.size(); ++k) {
+      if (TileDataEval(cond.at(k), entities) != is_and) {
+        return !is_and;
+      }
+    }
+    return is_and;
+  }
+  return false;
+}
+
+TileDataCond TileDataCondition(const TileNode& cond) {
+  return [cond](std::vector<std::string> entities) -> bool { return TileDataEval(cond, entities); };
+}
+
+// Builds one drawing step: (image <id> [pos]) or (icon <text> <color> <font> [pos]),
+// where pos is (pos <from_x> <from_y> <to_x> <to_y>). total_ms > 0 selects the
+// cycle-aligned overloads used by multi-step animations.
+DrawImageFunc TileDataDrawStep(const TileNode& draw, uint32_t dur_ms, uint32_t total_ms, uint32_t start_ms) {
+  const bool is_icon = draw.tag() == "icon";
+  const TileNode& pos = draw.at(is_icon ? 4 : 2);
+  const bool moves = pos.tag() == "pos";
+  float fx = pos.real(1), fy = pos.real(2), tx = pos.real(3), ty = pos.real(4);
+  if (is_icon) {
+    std::string icon = draw.str(1);
+    Color color = TileDataColor(draw.str(2));
+    esphome::display::BaseFont* font = TileDataFont(draw.str(3));
+    if (font == nullptr) {
+      return [](int, int, int, int, std::vector<std::string>) {};
+    }
+    if (!moves) {
+      return make_icon_draw(icon, color, font);
+    }
+    if (total_ms > 0) {
+      return make_icon_draw(icon, color, font, fx, fy, tx, ty, dur_ms, total_ms, start_ms);
+    }
+    return make_icon_draw(icon, color, font, fx, fy, tx, ty, dur_ms);
+  }
+#ifdef USE_IMAGE
+  auto it = TileDataImages().find(draw.str(1));
+  if (it != TileDataImages().end()) {
+    if (!moves) {
+      return make_image_draw(it->second);
+    }
+    if (total_ms > 0) {
+      return make_image_draw(it->second, fx, fy, tx, ty, dur_ms, total_ms, start_ms);
+    }
+    return make_image_draw(it->second, fx, fy, tx, ty, dur_ms);
+  }
+#endif // USE_IMAGE
+  ESP_LOGW("TileData", "Unknown image: %s", draw.str(1).c_str());
+  return [](int, int, int, int, std::vector<std::string>) {};
+}
+
+// Builds a display asset: (asset <condition or ()> (step <dur_ms> <draw>)...).
+// entities_idx is the index of the tile's entity-list argument, or -1.
+TileDataFunc TileDataAsset(const TileNode& asset, int entities_idx) {
+  std::vector<std::pair<uint32_t, DrawImageFunc>> steps;
+  if (asset.size() <= 3) {
+    const TileNode& step = asset.at(2);
+    steps.push_back({0, TileDataDrawStep(step.at(2), step.num(1), 0, 0)});
+  } else {
+    uint32_t total_ms = 0;
+    for (size_t k = 2; k < asset.size(); ++k) {
+      total_ms += asset.at(k).num(1);
+    }
+    uint32_t cumulative = 0;
+    for (size_t k = 2; k < asset.size(); ++k) {
+      const TileNode& step = asset.at(k);
+      uint32_t start = cumulative;
+      cumulative += step.num(1);
+      steps.push_back({cumulative, TileDataDrawStep(step.at(2), step.num(1), total_ms, start)});
+    }
+  }
+  uint32_t total_ms = steps.back().first;
+  const TileNode& cond = asset.at(1);
+  bool has_cond = cond.size() > 0;
+  return [steps, total_ms, cond, has_cond, entities_idx](const TileArgs& args) {
+    std::vector<std::string> entities;
+    if (entities_idx >= 0 && entities_idx < (int)args.size()) {
+      entities = args[entities_idx].v;
+    }
+    if (has_cond && !TileDataEval(cond, entities)) {
+      return;
+    }
+    size_t idx = 0;
+    if (total_ms > 0) {
+      uint32_t t = millis() % total_ms;
+      while (idx + 1 < steps.size() && t >= steps[idx].first) {
+        ++idx;
+      }
+    }
+    steps[idx].second(args[0].i, args[1].i, args[2].i, args[3].i, entities);
+  };
+}
+
+// Builds the generic draw functions of a (draw <call or asset>...) node.
+std::vector<TileDataFunc> TileDataDraws(const TileNode& draw, int entities_idx) {
+  std::vector<TileDataFunc> funcs;
+  for (size_t k = 1; k < draw.size(); ++k) {
+    const TileNode& item = draw.at(k);
+    funcs.push_back(item.tag() == "asset" ? TileDataAsset(item, entities_idx) : TileDataCall(item));
+  }
+  return funcs;
+}
+
+std::vector<std::string> TileDataStrings(const TileNode& node, size_t first) {
+  std::vector<std::string> values;
+  for (size_t k = first; k < node.size(); ++k) {
+    values.push_back(node.str(k));
+  }
+  return values;
+}
+
+// Builds a tile from (tile <type> <x> <y> (draw ...) <property>...).
+// Returns nullptr for unknown tile types.
+Tile* TileFromData(const TileNode& node) {
+  const std::string& type = node.str(1);
+  int x = node.num(2), y = node.num(3);
+  std::map<std::string, const TileNode*> props;
+  for (size_t k = 5; k < node.size(); ++k) {
+    props.emplace(node.at(k).tag(), &node.at(k));
+  }
+  auto prop = [&props](const char* tag) -> const TileNode& {
+    static const TileNode none;
+    auto it = props.find(tag);
+    return it == props.end() ? none : *it->second;
+  };
+
+  Tile* tile = nullptr;
+  if (type == "toggle_entity") {
+    std::vector<std::function<void(int, int, int, int, std::string, bool)>> draws;
+    for (auto& fn : TileDataDraws(node.at(4), -1)) {
+      draws.push_back([fn](int a, int b, int c, int d, std::string name, bool is_on) {
+        fn({TileArg::Int(a), TileArg::Int(b), TileArg::Int(c), TileArg::Int(d), TileArg::Str(name), TileArg::Bool(is_on)});
+      });
+    }
+    tile = new ToggleEntityTile(x, y, draws, prop("identifier").str(1), TileDataStrings(prop("entities"), 1),
+                                prop("presentation_name").str(1), prop("initially_chosen").size() > 0);
+  } else if (type == "cycle_entity") {
+    std::vector<std::function<void(int, int, int, int, std::string, std::vector<std::string>)>> draws;
+    for (auto& fn : TileDataDraws(node.at(4), 5)) {
+      draws.push_back([fn](int a, int b, int c, int d, std::string name, std::vector<std::string> options) {
+        fn({TileArg::Int(a), TileArg::Int(b), TileArg::Int(c), TileArg::Int(d), TileArg::Str(name), TileArg::Vec(options)});
+      });
+    }
+    std::vector<std::pair<std::vector<std::string>, std::string>> options;
+    for (size_t k = 5; k < node.size(); ++k) {
+      if (node.at(k).tag() == "option") {
+        options.push_back({TileDataStrings(node.at(k), 2), node.at(k).str(1)});
+      }
+    }
+    tile = new CycleEntityTile(x, y, draws, prop("identifier").str(1), options, prop("reset_on_leave").size() > 0);
+  } else {
+    std::vector<DrawImageFunc> draws;
+    for (auto& fn : TileDataDraws(node.at(4), 4)) {
+      draws.push_back([fn](int a, int b, int c, int d, std::vector<std::string> entities) {
+        fn({TileArg::Int(a), TileArg::Int(b), TileArg::Int(c), TileArg::Int(d), TileArg::Vec(entities)});
+      });
+    }
+    if (type == "ha_action" || type == "title") {
+      HAActionTile* action_tile;
+      if (type == "title") {
+        action_tile = new TitleTile(x, y, draws, TileDataStrings(prop("entities"), 1));
+      } else {
+        std::vector<std::function<void(std::vector<std::string>)>> perform;
+        for (size_t k = 1; k < prop("perform").size(); ++k) {
+          TileDataFunc fn = TileDataCall(prop("perform").at(k));
+          perform.push_back([fn](std::vector<std::string> entities) { fn({TileArg::Vec(entities)}); });
+        }
+        std::vector<std::function<void(float, float, std::vector<std::string>)>> location_perform;
+        for (size_t k = 1; k < prop("location_perform").size(); ++k) {
+          TileDataFunc fn = TileDataCall(prop("location_perform").at(k));
+          location_perform.push_back([fn](float px, float py, std::vector<std::string> entities) {
+            fn({TileArg::Float(px), TileArg::Float(py), TileArg::Vec(entities)});
+          });
+        }
+        action_tile = new HAActionTile(x, y, draws, perform, location_perform, TileDataStrings(prop("entities"), 1));
+      }
+      tile = action_tile;
+    } else if (type == "move_page") {
+      tile = new MovePageTile(x, y, draws, TileDataPage(prop("destination").str(1)));
+    } else if (type == "function") {
+      std::function<void()> on_press = nullptr, on_release = nullptr;
+      if (prop("on_press").size() > 1) {
+        TileDataFunc fn = TileDataCall(prop("on_press").at(1));
+        on_press = [fn]() { fn({}); };
+      }
+      if (prop("on_release").size() > 1) {
+        TileDataFunc fn = TileDataCall(prop("on_release").at(1));
+        on_release = [fn]() { fn({}); };
+      }
+      tile = new FunctionTile(x, y, draws, on_press, on_release);
+    } else {
+      ESP_LOGW("TileData", "Unknown tile type: %s", type.c_str());
+      return nullptr;
+    }
+  }
+
+  // Modifiers, in the order the generated method chains apply them.
+  for (size_t k = 5; k < node.size(); ++k) {
+    const TileNode& mod = node.at(k);
+    const std::string& tag = mod.tag();
+    bool has_cond = mod.at(2).is_list;
+    if (tag == "page_if_no_entity") {
+      ((HAActionTile*)tile)->setDisplayPageIfNoEntity(TileDataPage(mod.str(1)));
+    } else if (tag == "fast_refresh") {
+      ((HAActionTile*)tile)->setRequiresFastRefreshFunc(
+          mod.size() > 1 ? TileDataCondition(mod.at(1))
+                         : TileDataCond([](std::vector<std::string>) -> bool { return true; }));
+    } else if (tag == "dynamic_entry") {
+      ((MovePageTile*)tile)->setDynamicEntry(mod.str(1), TileDataStrings(mod.at(2), 0));
+    } else if (tag == "fill") {
+      has_cond ? tile->addFillColor(TileDataColor(mod.str(1)), TileDataCondition(mod.at(2)))
+               : tile->addFillColor(TileDataColor(mod.str(1)));
+    } else if (tag == "border_color") {
+      has_cond ? tile->addBorderColor(TileDataColor(mod.str(1)), TileDataCondition(mod.at(2)))
+               : tile->addBorderColor(TileDataColor(mod.str(1)));
+    } else if (tag == "border_width") {
+      has_cond ? tile->addBorderWidth(mod.num(1), TileDataCondition(mod.at(2)))
+               : tile->addBorderWidth(mod.num(1));
+    } else if (tag == "border_radius") {
+      has_cond ? tile->addBorderRadius(mod.num(1), TileDataCondition(mod.at(2)))
+               : tile->addBorderRadius(mod.num(1));
+    } else if (tag == "span") {
+      tile->setSpan(mod.num(1), mod.num(2));
+    } else if (tag == "activation") {
+      tile->setActivationVar(mod.str(1), TileDataStrings(mod.at(2), 0));
+    }
+  }
+  return tile;
+}
+
 #endif // TILES_H
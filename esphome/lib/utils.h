@@ -8,6 +8,7 @@
 #include <vector>
 #include <map>
 #include <sstream>
+#include <fstream>
 #include <type_traits>
 #include <mutex>
 
@@ -63,4 +63,63 @@ private:
 // HEAP ALLOCATION: Use unique_ptr for automatic memory management
 std::unique_ptr<View> view_ptr = nullptr;
 
-inline bool View::initialized = false;
\ No newline at end of file
+inline bool View::initialized = false;
+
+// Returns the tile_ui data blob to initialize from. On the host platform
+// (emulator) $TILE_UI_DATA_FILE, when set and readable, overrides the blob
+// compiled into the program so a new tiles config needs no rebuild.
+std::string TileDataLoadBlob(const char* embedded) {
+#ifdef USE_HOST
+  const char* path = getenv("TILE_UI_DATA_FILE");
+  if (path != nullptr && *path) {
+    std::ifstream file(path, std::ios::binary);
+    std::stringstream contents;
+    contents << file.rdbuf();
+    if (file && !contents.str().empty()) {
+      ESP_LOGI("InitTiles", "Loading tiles from %s", path);
+      return contents.str();
+    }
+    ESP_LOGW("InitTiles", "Could not read %s, using the compiled-in tiles", path);
+  }
+#endif
+  return embedded;
+}
+
+// Builds the view from a tile_ui data blob (data_driven mode). Display pages
+// for the screens are created here; system_pages (e.g. calib) are the pages
+// tile_ui registered at setup and stay first in the display's page list.
+bool InitTilesFromData(const std::string& blob, std::vector<esphome::display::DisplayPage*> system_pages) {
+  TileNode root;
+  size_t pos = 0;
+  if (!ParseTileNode(blob, pos, root) || root.tag() != "tile_ui" || root.str(1) != "1") {
+    ESP_LOGE("InitTiles", "Invalid tile data (%u bytes)", (unsigned) blob.size());
+    return false;
+  }
+
+  // Create every page first so move_page destinations can point forward.
+  std::vector<esphome::display::DisplayPage*> pages = system_pages;
+  for (size_t k = 2; k < root.size(); ++k) {
+    auto* page = new esphome::display::DisplayPage(
+        [](esphome::display::Display& it) { id(_draw_page).execute(); });
+    TileDataPages()[root.at(k).str(1)] = page;
+    pages.push_back(page);
+  }
+  if (!pages.empty()) {
+    ((esphome::display::Display*)&id(disp))->set_pages(pages);
+  }
+
+  view_ptr.reset(new View());
+  for (size_t k = 2; k < root.size(); ++k) {
+    view_ptr->addScreen(ScreenFromData(root.at(k), TileDataPages()[root.at(k).str(1)]));
+  }
+  view_ptr->init();
+  if (view_ptr->getActiveScreen()) {
+    id(rows) = view_ptr->getActiveScreen()->getRows();
+    id(cols) = view_ptr->getActiveScreen()->getCols();
+  }
+  if (view_ptr->getBaseScreen()) {
+    id(disp).show_page(view_ptr->getBaseScreen()->getDisplayPage());
+  }
+  ESP_LOGD("InitTiles", "Tiles initialized");
+  return true;
+}